@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# /// script
+# dependencies = ["pysubs2"]
+# ///
+"""
+Compara el lector/escritor ligero (src/srt.py) con el camino antiguo de pysubs2
+sobre una temporada completa: leer cada .srt, montar el dual y generar el texto final.
+
+Uso:
+    python benchmarks/bench_parser.py [carpeta_o_zip] [repeticiones]
+"""
+import os
+import sys
+import time
+import zipfile
+import statistics
+
+# Para poder importar src/ al ejecutar el script desde cualquier carpeta.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pysubs2
+from src.srt import parse_subtitle, render_srt
+
+DEFAULT_SEASON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "subtitle_out", "Friends", "Season_1")
+
+def load_season(path):
+    """Lee todos los subtítulos de una carpeta o ZIP como [(nombre, bytes)]."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as z:
+            return [(n, z.read(n)) for n in z.namelist() if n.lower().endswith(('.srt', '.sub'))]
+    return [(f, open(os.path.join(path, f), 'rb').read())
+            for f in sorted(os.listdir(path)) if f.lower().endswith(('.srt', '.sub'))]
+
+def run_pysubs2(files):
+    """Camino antiguo: utf-8 y si falla latin-1, árbol SSAFile completo, to_string."""
+    for name, data in files:
+        try: subs = pysubs2.SSAFile.from_string(data.decode("utf-8"))
+        except UnicodeDecodeError: subs = pysubs2.SSAFile.from_string(data.decode("latin-1"))
+        clean = [ev.text.replace("\\N", " ").strip() for ev in subs]
+        for ev, original in zip(subs, clean):
+            if original: ev.text = f"<font color='#ffff00'>{original}</font>\\N{original}"
+        subs.to_string("srt")
+
+def run_lean(files):
+    """Camino nuevo: detección de codificación única, pista compacta, escritura en una pasada."""
+    for name, data in files:
+        track = parse_subtitle(name, data)
+        clean = [t.replace("\n", " ").strip() for t in track.texts]
+        render_srt(track, [f"<font color='#ffff00'>{c}</font>\n{c}" if c else "" for c in clean])
+
+def bench(fn, files, repeat):
+    """Mediana de 'repeat' ejecuciones, en milisegundos."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(files)
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_SEASON
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    files = load_season(path)
+    cues = sum(len(parse_subtitle(n, d)) for n, d in files)
+    print(f"Temporada: {path} ({len(files)} archivos, {cues} líneas, {repeat} repeticiones)")
+
+    old = bench(run_pysubs2, files, repeat)
+    new = bench(run_lean, files, repeat)
+    print(f"pysubs2 : {old:8.1f} ms")
+    print(f"ligero  : {new:8.1f} ms")
+    print(f"mejora  : x{old / new:.1f}")
+
+if __name__ == "__main__":
+    main()
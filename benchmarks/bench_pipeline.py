@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas de la tubería completa, sin red: genera temporadas sintéticas (capítulos,
+líneas por capítulo, frases repetidas y codificaciones configurables) y las pasa por la tubería
+de verdad (planificador, motor, recuperación de lotes, montaje y guardado) contra un backend
+falso con latencia, errores y 429 configurables.
+
+El escenario "languages" traduce a tres idiomas y escribe tres formatos: las peticiones deberían ser
+las mismas que en "base" (cada idioma es una columna más de la misma petición).
+
+Por escenario mide: tiempo total, líneas/s, peticiones a la API (y frases enviadas), reintentos,
+429, errores y memoria máxima. Compara con benchmarks/baseline_pipeline.json y sale con
+código 1 si algo empeora más de la tolerancia (para verlo en la revisión o en CI).
+
+Cada escenario se ejecuta en un proceso nuevo y en una carpeta temporal: caché, manifiesto y
+métricas empiezan de cero y no se toca nada del proyecto.
+
+Uso:
+    python benchmarks/bench_pipeline.py                      # todos los escenarios vs. la referencia
+    python benchmarks/bench_pipeline.py base errors          # solo algunos
+    python benchmarks/bench_pipeline.py --episodes 24 --latency 0.2 --threads 16
+    python benchmarks/bench_pipeline.py --save-baseline      # guarda los resultados como referencia
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import argparse
+import tempfile
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline_pipeline.json")
+
+# Escenarios: lo que no se indique sale de DEFAULTS.
+DEFAULTS = {
+    "seasons": 2, "episodes": 8, "lines": 400, "repeat_rate": 0.3, "encodings": ["utf-8"],
+    "latency": 0.05, "latency_per_line": 0.0005, "error_rate": 0.0, "quota_rate": 0.0,
+    "threads": 8, "cooldown": 0.2, "seed": 1,
+}
+SCENARIOS = {
+    "base": {},
+    "repetitive": {"repeat_rate": 0.7},
+    "errors": {"error_rate": 0.1, "quota_rate": 0.05},
+    "encodings": {"encodings": ["utf-8", "cp1252", "utf-8-sig", "utf-16", "latin-1"]},
+    "long_season": {"seasons": 1, "episodes": 24, "lines": 600},
+    # Idiomas y formatos de salida (por defecto, "es" y "srt", como la tubería).
+    "languages": {"langs": ["es", "pt", "fr"], "formats": ["srt", "ass", "vtt"]},
+}
+# Cuánto puede empeorar cada medida antes de contarlo como regresión (fracción).
+TOLERANCE = {"wall_s": 0.25, "api_calls": 0.10, "api_lines": 0.05, "peak_rss_mb": 0.25}
+
+# --- CORPUS SINTÉTICO ---
+WORDS = ("you", "know", "what", "I", "mean", "we", "have", "to", "go", "now", "she", "said", "never",
+         "again", "coffee", "apartment", "why", "would", "he", "do", "that", "okay", "listen", "this",
+         "is", "not", "about", "us", "really", "think", "so", "come", "on", "guys", "tonight", "wait")
+ACCENTED = ("café", "naïve", "Zoë", "résumé", "fiancée", "jalapeño") # Para que la codificación importe
+
+def make_line(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(2, 9))]
+    if rng.random() < 0.2: words.insert(rng.randrange(len(words)), rng.choice(ACCENTED))
+    text = " ".join(words).capitalize() + rng.choice((".", "?", "!", "..."))
+    if rng.random() < 0.1: text = f"- {text} - {rng.choice(WORDS).capitalize()}." # Dos hablantes
+    if rng.random() < 0.1: text = f"<i>{text}</i>"
+    return text
+
+def make_srt(lines):
+    out = []
+    for i, text in enumerate(lines):
+        start = i * 2500
+        out.append(f"{i + 1}\n{ms(start)} --> {ms(start + 2000)}\n{text}\n")
+    return "\n".join(out)
+
+def ms(t):
+    return f"{t // 3600000:02d}:{t // 60000 % 60:02d}:{t // 1000 % 60:02d},{t % 1000:03d}"
+
+def make_corpus(cfg):
+    """{temporada: [(nombre, bytes)]} con frases comunes (repeat_rate) y el resto únicas."""
+    rng = random.Random(cfg["seed"])
+    common = [make_line(rng) for _ in range(200)]
+    seasons = {}
+    for s in range(1, cfg["seasons"] + 1):
+        members = []
+        for e in range(1, cfg["episodes"] + 1):
+            lines = [rng.choice(common) if rng.random() < cfg["repeat_rate"] else make_line(rng)
+                     for _ in range(cfg["lines"])]
+            encoding = cfg["encodings"][(e - 1) % len(cfg["encodings"])]
+            members.append((f"Synthetic - {s}x{e:02d}.srt", make_srt(lines).encode(encoding, errors="replace")))
+        seasons[s] = members
+    return seasons
+
+# --- ESCENARIO (en un proceso hijo) ---
+def run_scenario(cfg):
+    """Ejecuta la tubería sobre el corpus y devuelve las medidas. Hay que estar ya en la carpeta temporal."""
+    sys.path.insert(0, ROOT)
+    from src.backends import TranslationBackend, BackendResult, QuotaExceeded, set_backend
+    from src.engine import get_engine
+    from src.events import ProgressEvents
+    from src.metrics import METRICS
+    from src.pipeline import SeasonPipeline, _END
+
+    class FakeBackend(TranslationBackend):
+        """Traduce al revés (para que no parezca inglés) con latencia, errores y 429 simulados."""
+        name = "fake"
+
+        def __init__(self):
+            self.attempts = {}
+
+        def _fate(self, texts):
+            # Decisión fija por contenido e intento: no depende del orden en que lleguen los lotes.
+            key = zlib.crc32("\n".join(texts).encode("utf-8"))
+            n = self.attempts[key] = self.attempts.get(key, 0) + 1
+            return random.Random(key * 31 + n + cfg["seed"]).random()
+
+        async def translate(self, texts, insist=False, langs=("es",), limiter=None):
+            await asyncio.sleep(cfg["latency"] + cfg["latency_per_line"] * len(texts))
+            fate = self._fate(texts)
+            if fate < cfg["quota_rate"]: raise QuotaExceeded("429 (simulado)")
+            if fate < cfg["quota_rate"] + cfg["error_rate"]: raise RuntimeError("500 (simulado)")
+            chars = sum(map(len, texts))
+            translations = {lang: [t[::-1] if lang == "es" else f"[{lang}] {t[::-1]}" for t in texts] for lang in langs}
+            return BackendResult(translations, self.name, 0.0, chars // 4, chars * len(langs) // 4)
+
+    class SyntheticPipeline(SeasonPipeline):
+        """La tubería de siempre, pero las temporadas salen del corpus en memoria en vez de la web."""
+        def _download_loop(self):
+            for s_num in self._season_numbers():
+                self.queue.put((s_num, corpus[s_num], []))
+            self.queue.put(_END)
+
+    corpus = make_corpus(cfg)
+    set_backend(FakeBackend())
+    engine = get_engine(cfg["threads"])
+    # Pausas de 429 cortas: queremos medir la tubería, no esperar 20 s.
+    engine.limiter.base_cooldown = engine.limiter.cooldown = cfg["cooldown"]
+    engine.limiter.max_cooldown = cfg["cooldown"] * 4
+
+    events = ProgressEvents()
+    pipeline = SyntheticPipeline(engine, "Synthetic", list(corpus), cfg["threads"], events,
+                                 langs=tuple(cfg.get("langs", ["es"])), formats=tuple(cfg.get("formats", ["srt"])))
+    start = time.perf_counter()
+    done = pipeline.run(on_tick=events.drain, tick=0.05)
+    wall = time.perf_counter() - start
+
+    report = METRICS.report()
+    counters = report["counters"]
+    lines = cfg["seasons"] * cfg["episodes"] * cfg["lines"]
+    return {
+        "wall_s": round(wall, 3),
+        "lines_per_s": round(lines / wall, 1),
+        "api_calls": counters.get("api_calls", 0),
+        "api_retries": counters.get("api_retries", 0),
+        "api_429": counters.get("api_429", 0),
+        "api_errors": counters.get("api_errors", 0),
+        "episodes_written": counters.get("episodes_written", 0),
+        "seasons_done": len(done),
+        "api_lines": counters.get("api_lines", 0), # Frases enviadas (tras quitar repetidas)
+        # ru_maxrss va en KB en Linux (en bytes en macOS).
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+    }
+
+def spawn(cfg):
+    """Lanza un escenario en un proceso y carpeta nuevos y devuelve sus medidas."""
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", json.dumps(cfg)],
+                              cwd=workdir, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"El escenario falló:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+# --- COMPARACIÓN CON LA REFERENCIA ---
+def compare(name, result, baseline):
+    """Lista de regresiones [(medida, referencia, ahora)] frente a la referencia del escenario."""
+    ref = baseline.get(name, {}).get("result")
+    if not ref: return []
+    out = []
+    for metric, tol in TOLERANCE.items():
+        if metric in ref and ref[metric] and result[metric] > ref[metric] * (1 + tol):
+            out.append((metric, ref[metric], result[metric]))
+    # Que no se pierdan capítulos ni temporadas por el camino.
+    for metric in ("episodes_written", "seasons_done"):
+        if result[metric] < ref.get(metric, 0): out.append((metric, ref[metric], result[metric]))
+    return out
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de la tubería con corpus sintético.")
+    parser.add_argument("scenarios", nargs="*", help=f"Escenarios a ejecutar ({', '.join(SCENARIOS)}). Sin nada: todos.")
+    for key, value in DEFAULTS.items():
+        if key == "encodings":
+            parser.add_argument("--encodings", help="Codificaciones separadas por comas (se alternan por capítulo).")
+        else:
+            parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), help=f"(por defecto {value})")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Archivo de referencia.")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda estos resultados como referencia.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child))))
+        return
+
+    overrides = {k: getattr(args, k) for k in DEFAULTS if k != "encodings" and getattr(args, k) is not None}
+    if args.encodings: overrides["encodings"] = args.encodings.split(",")
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown: sys.exit(f"Escenarios desconocidos: {', '.join(unknown)}")
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f: baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = {}
+
+    ok, results = True, {}
+    for name in names:
+        cfg = {**DEFAULTS, **SCENARIOS[name], **overrides}
+        result = spawn(cfg)
+        results[name] = {"config": cfg, "result": result}
+        ref = baseline.get(name, {})
+        # Con otros parámetros que la referencia, compararse no tiene sentido.
+        regressions = compare(name, result, baseline) if ref.get("config") == cfg else []
+        status = "FALLO " if regressions else ("OK    " if ref.get("config") == cfg else "NUEVO ")
+        ok &= not regressions
+        print(f"{status} {name:12s} {result['wall_s']:7.2f} s  {result['lines_per_s']:9.1f} líneas/s  "
+              f"{result['api_calls']:4d} peticiones ({result['api_retries']} reintentos, {result['api_429']} x 429, "
+              f"{result['api_errors']} errores)  {result['peak_rss_mb']:6.1f} MB  "
+              f"{result['api_lines']} frases enviadas  {result['episodes_written']} capítulos")
+        for metric, before, now in regressions:
+            print(f"         {metric}: {before} -> {now}")
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=1)
+        print(f"Referencia guardada en {args.baseline}")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
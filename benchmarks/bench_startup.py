@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Mide el arranque del programa y comprueba que cumple el presupuesto:
+  - "import main" no debe cargar ninguna librería pesada (se cargan al usarse),
+  - "main.py --help" y "main.py --cache-info" (con una caché grande) deben tardar menos de BUDGET_S.
+Se ejecuta en una carpeta temporal para no tocar la caché ni el log reales.
+Sale con código 1 si algo se pasa del presupuesto (sirve para CI).
+
+Uso:
+    python benchmarks/bench_startup.py [entradas_en_caché] [repeticiones]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Segundos máximos para responder a --help / --cache-info.
+BUDGET_S = 1.0
+# Módulos que NO deben cargarse solo por importar main.py.
+HEAVY_MODULES = ("google.generativeai", "cloudscraper", "bs4", "questionary", "rich", "pysubs2", "numpy")
+
+def seed_cache(workdir, entries):
+    """Crea una caché SQLite con 'entries' traducciones en la carpeta de trabajo (mismo esquema que src.cache)."""
+    conn = sqlite3.connect(os.path.join(workdir, "translation_cache.sqlite3"))
+    conn.execute("CREATE TABLE IF NOT EXISTS translations (source TEXT NOT NULL, lang TEXT NOT NULL, "
+                 "target TEXT NOT NULL, PRIMARY KEY (source, lang)) WITHOUT ROWID")
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO translations (source, lang, target) VALUES (?, 'es', ?)",
+                         ((f"line number {i}", f"línea número {i}") for i in range(entries)))
+    conn.close()
+
+def imported_modules(workdir):
+    """Módulos de nivel superior que carga "import main" (según -X importtime)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=workdir, env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True)
+    mods = set()
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            mods.add(line.rsplit("|", 1)[1].strip())
+    return mods
+
+def timed(args, workdir, repeat):
+    """Mediana (s) de ejecutar main.py con los argumentos dados."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, "main.py"), *args], cwd=workdir,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    ok = True
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_cache(workdir, entries)
+
+        heavy = sorted(m for m in imported_modules(workdir) if m.startswith(HEAVY_MODULES))
+        if heavy:
+            ok = False
+            print(f"FALLO  'import main' carga librerías pesadas: {', '.join(heavy)}")
+        else:
+            print("OK     'import main' no carga librerías pesadas")
+
+        for args in (["--help"], ["--cache-info"]):
+            t = timed(args, workdir, repeat)
+            status = "OK    " if t < BUDGET_S else "FALLO "
+            ok &= t < BUDGET_S
+            print(f"{status} main.py {' '.join(args):13s} {t * 1000:7.1f} ms (presupuesto {BUDGET_S * 1000:.0f} ms, "
+                  f"caché de {entries} entradas)")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -1,145 +1,305 @@
 #!/usr/bin/env python3
 # /// script
-# dependencies = ["pysubs2", "google-generativeai", "cloudscraper", "beautifulsoup4", "questionary", "rich"]
+# dependencies = ["pysubs2", "google-generativeai", "cloudscraper", "beautifulsoup4", "questionary", "rich", "numpy"]
 # ///
 
 # Importaciones de librerías estándar de Python
 import os
-import shutil
-import time
-import urllib.parse
-import re
-from concurrent.futures import ThreadPoolExecutor
-
-# Importaciones de librerías externas (instaladas con uv/pip)
-import questionary
-from rich.panel import Panel
-from rich.live import Live
+import sys
+import argparse
 
 # --- IMPORTACIONES DE NUESTROS MÓDULOS (src/) ---
 # Aquí es donde conectamos todas las piezas que hemos separado.
-from src.config import WORK_DIR, OUT_BASE_DIR, GOOGLE_API_KEY
-from src.ui import console, LogManager, create_progress, get_dynamic_layout
-from src.utils import search_series, download_and_extract, save_cache
-from src.subtitle import process_episode
+# Arriba solo lo ligero: las librerías pesadas (questionary, rich, cloudscraper, Gemini...)
+# y la caché se cargan al usarse, para que "--help" o "--cache-info" respondan al instante.
+# (benchmarks/bench_startup.py vigila ese presupuesto de arranque).
+from src.config import (GOOGLE_API_KEY, TRANSLATION_BACKEND, PROGRESS_MAX_FPS, REPORT_FILE, PROMETHEUS_TEXTFILE,
+                        CACHE_DB_FILE, QUEUE_DB_FILE, MAX_SEASONS, TARGET_LANGUAGES, OUTPUT_FORMATS)
+from src.events import ProgressEvents, JsonRenderer
+from src.manifest import flush_all
+from src.normalize import CACHE_STATS
+from src.metrics import METRICS
 
-def main():
-    # 1. Mensaje de Bienvenida (Banner Azul)
-    console.print(Panel("[bold white on blue] SUBSYNC: GEMINI 2.5 FLASH-LITE (MODULAR MOD) [/bold white on blue]"))
-    
-    # Verificación de Seguridad: Si no hay llave, no podemos trabajar.
-    if not GOOGLE_API_KEY: 
-        console.print("[red]Falta apikey.key[/red]")
-        return
+# Salida JSON de esta ejecución (None con interfaz): el aviso de Ctrl+C también va por ahí.
+_json_out = None
+
+def parse_args():
+    """Opciones de línea de comandos (sin ninguna, se pregunta todo como siempre)."""
+    parser = argparse.ArgumentParser(description="Subtítulos duales Inglés/Español.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Sin interfaz: escribe el progreso como eventos JSON (uno por línea) en stdout.")
+    parser.add_argument("--series", help="Serie a buscar (obligatoria con --headless).")
+    parser.add_argument("--pick", type=int, default=1, help="Resultado de la búsqueda a usar (1 = el primero).")
+    parser.add_argument("--seasons", help="Temporadas: '1,3,4' o 'n' para todas.")
+    parser.add_argument("--threads", type=int, help="Peticiones simultáneas a la IA (por defecto 8).")
+    parser.add_argument("--langs", default=",".join(TARGET_LANGUAGES),
+                        help="Idiomas de destino separados por comas, todos en la misma petición (ej: 'es,pt'). "
+                             f"Por defecto {','.join(TARGET_LANGUAGES)}.")
+    parser.add_argument("--formats", default=",".join(OUTPUT_FORMATS),
+                        help="Formatos de salida separados por comas: srt, ass, vtt (ej: 'srt,vtt'). "
+                             f"Por defecto {','.join(OUTPUT_FORMATS)}.")
+    parser.add_argument("--cache-info", action="store_true", help="Muestra cuántas traducciones hay en caché y sale.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="No traduce: estima frases sin caché, peticiones, tokens y tiempo de las temporadas elegidas.")
+    parser.add_argument("--warm-cache", nargs="*", metavar="RUTA",
+                        help="Carga en la caché las traducciones de duales ya generados y pares .en/.es.srt "
+                             "(sin rutas: subtitle_out) y sale.")
+    # Cola de trabajo: repartir un catálogo entre varios procesos o equipos.
+    parser.add_argument("--enqueue", action="store_true",
+                        help="En vez de procesar, apunta las temporadas elegidas en la cola de trabajo.")
+    parser.add_argument("--worker", action="store_true", help="Procesa temporadas de la cola (eventos JSON en stdout).")
+    parser.add_argument("--workers", type=int, help="Lanza N procesos trabajadores en esta máquina.")
+    parser.add_argument("--wait", action="store_true", help="Con --worker/--workers: esperar trabajos nuevos al vaciarse la cola.")
+    parser.add_argument("--queue-status", action="store_true", help="Muestra el estado de la cola de trabajo y sale.")
+    # Demonio: todo caliente en memoria y una API HTTP local (para el servidor multimedia).
+    parser.add_argument("--serve", action="store_true", help="Modo demonio con API HTTP local (eventos JSON en stdout).")
+    parser.add_argument("--port", type=int, help="Puerto de la API del demonio (por defecto 8790).")
+    parser.add_argument("--watch", action="append", metavar="CARPETA",
+                        help="Con --serve (o solo): vigila la carpeta y monta el dual de cada .srt nuevo. Repetible.")
+    args = parser.parse_args()
+    from src.formats import FORMATS
+    args.langs = tuple(dict.fromkeys(l.strip() for l in args.langs.split(",") if l.strip()))
+    args.formats = tuple(dict.fromkeys(f.strip().lower() for f in args.formats.split(",") if f.strip()))
+    unknown = [f for f in args.formats if f not in FORMATS]
+    if unknown: parser.error(f"Formatos desconocidos: {', '.join(unknown)} (válidos: {', '.join(FORMATS)})")
+    if not args.langs or not args.formats: parser.error("--langs y --formats necesitan al menos un valor")
+    return args
 
-    # 2. Interrogatorio al Usuario (Search)
+def parse_seasons(s_in):
+    """'n' / 'all' / '1-n' -> None (todas hasta que no haya más); '1,2' -> [1, 2]."""
+    if s_in.lower() in ['1-n', 'all', 'n']: 
+        return None # None significa "Sigue hasta que no encuentres más"
+    return [int(x) for x in s_in.split(',') if x.strip().isdigit()]
+
+def ask_interactive(args):
+    """Interrogatorio al usuario (lo que no venga ya en la línea de comandos)."""
+    import questionary
+    from src.utils import search_series
     # Preguntamos qué serie quiere buscar.
-    query = questionary.text("Serie:").ask()
-    if not query: return
+    query = args.series or questionary.text("Serie:").ask()
+    if not query: return None
     
     # Buscamos en la web (usando src.utils.search_series)
     results = search_series(query)
-    if not results: return
+    if not results: return None
 
     # Le damos a elegir entre los resultados encontrados.
     choice = questionary.select("Elige:", choices=[r['display'] for r in results]).ask()
     selected = next(r for r in results if r['display'] == choice)
     
-    # 3. Datos de Temporadas y Hilos
-    s_in = questionary.text("Temporada ('n' para todas):").ask()
-    
-    # Lógica para "Todas las temporadas" vs "Lista específica"
-    if s_in.lower() in ['1-n', 'all', 'n']: 
-        s_list = None # None significa "Sigue hasta que no encuentres más"
-    else: 
-        s_list = [int(x) for x in s_in.split(',') if x.strip().isdigit()]
+    # Datos de Temporadas y Hilos
+    s_in = args.seasons or questionary.text("Temporada ('n' para todas):").ask()
     
     # Preguntamos potencia de fuego (hilos paralelos)
-    threads_in = questionary.text("Hilos (Enter = 8):", default="8").ask()
-    try: max_threads = int(threads_in)
-    except: max_threads = 8
-
-    # --- BUCLE PRINCIPAL DE TEMPORADAS ---
-    idx = 0
-    while True:
-        # Calculamos cuál es la siguiente temporada a procesar
-        if s_list is None: 
-            s_num = idx + 1 # Modo automático (1, 2, 3...)
-        else:
-            if idx >= len(s_list): break # Se acabaron las de la lista
-            s_num = s_list[idx]
-        
-        # Límite de seguridad por si acaso (nadie tiene 50 temporadas... excepto Los Simpsons)
-        if s_num > 50: break
-        idx += 1
-
-        # Separador visual en la consola
-        console.rule(f"Temporada {s_num}")
-        
-        # Limpieza: Borramos la carpeta de trabajo anterior para empezar limpitos.
-        if os.path.exists(WORK_DIR): shutil.rmtree(WORK_DIR)
-        os.makedirs(os.path.join(WORK_DIR, "en"), exist_ok=True)
-        
-        # Construimos la URL de descarga de "TVSubtitles.net"
-        # Quitamos años y paréntesis para que cuadre con la URL de la web.
-        clean_name = re.sub(r'\s*\(\d{4}-.*?\)', '', selected['display']).replace("(","").replace(")","").strip()
-        url = f"https://www.tvsubtitles.net/files/seasons/{urllib.parse.quote(clean_name)}%20-%20season%20{s_num}.en.zip"
-        
-        # Descargamos y descomprimimos (src.utils)
-        success = download_and_extract(url)
-        if not success: 
-            # Si falla y estábamos en modo automático, asumimos que se acabaron las temporadas.
-            if s_list is None: break
-            continue # Si era una lista específica, probamos con la siguiente.
-            
-        # Preparamos carpeta de destino
-        out_dir = os.path.join(OUT_BASE_DIR, clean_name.replace(" ","_"), f"Season_{s_num}")
-        os.makedirs(out_dir, exist_ok=True)
-        
-        # Listamos todos los archivos .srt que hemos descomprimido
-        files = sorted([f for f in os.listdir(os.path.join(WORK_DIR, "en")) if f.endswith(('.srt', '.sub'))])
-        
-        # --- PREPARACIÓN DE LA INTERFAZ (UI) ---
-        progress = create_progress()
-        log_mgr = LogManager(max_len=12)
-        
-        # Live Context Manager: Se encarga de repintar la pantalla constantemente sin parpadear.
-        with Live(get_dynamic_layout(progress, log_mgr), refresh_per_second=5) as live:
-            
-            # ThreadPoolExecutor: El motor que ejecuta varias cosas a la vez.
-            with ThreadPoolExecutor(max_workers=max_threads) as executor:
-                futures = []
-                # Lanzamos una tarea (hilo) por cada archivo de subtítulo
-                for f in files:
-                    # Añadimos una barrita a la UI
-                    tid = progress.add_task("Wait", filename=f[:12], total=100)
-                    # Enviamos la tarea al 'pool' de hilos
-                    futures.append(executor.submit(
-                        process_episode, # Función a ejecutar (src.subtitle)
-                        f, os.path.join(WORK_DIR, "en"), out_dir, clean_name, progress, tid, log_mgr
-                    ))
-                
-                # Bucle de espera activa: Mantiene la UI viva mientras los hilos trabajan.
-                while any(f.running() for f in futures):
-                     live.update(get_dynamic_layout(progress, log_mgr))
-                     time.sleep(0.2) # Dormimos un pelín para no quemar la CPU repintando
-                
-                # Aseguramos que todos hayan terminado (y lanzamos excepciones si las hubo)
-                for f in futures: f.result()
-               
-        # Guardamos el caché de traducciones al disco al terminar cada temporada
+    max_threads = args.threads
+    if max_threads is None:
+        threads_in = questionary.text("Hilos (Enter = 8):", default="8").ask()
+        try: max_threads = int(threads_in)
+        except: max_threads = 8
+    return selected, parse_seasons(s_in), max_threads
+
+def resolve_headless(args, events):
+    """Igual que el interrogatorio, pero sin preguntar: todo sale de los argumentos."""
+    if not args.series:
+        events.log("--headless necesita --series", "error")
+        return None
+    from src.utils import search_series
+    results = search_series(args.series)
+    if not results or not 1 <= args.pick <= len(results):
+        events.log(f"Sin resultados para '{args.series}'", "error")
+        return None
+    return results[args.pick - 1], parse_seasons(args.seasons or "n"), args.threads or 8
+
+def enqueue_seasons(clean_name, s_list, log):
+    """Apunta las temporadas en la cola (con 'n', primero se averigua cuántas hay)."""
+    from src.workqueue import WorkQueue
+    from src.worker import discover_seasons
+    seasons = s_list if s_list is not None else discover_seasons(clean_name, MAX_SEASONS)
+    queue = WorkQueue(QUEUE_DB_FILE)
+    for s_num in seasons: queue.enqueue(clean_name, s_num)
+    log(f"{clean_name}: {len(seasons)} temporadas en la cola ({', '.join(map(str, seasons)) or '-'}). "
+        f"Estado: {queue.stats()}")
+    queue.close()
+
+def estimate_run(clean_name, s_list, max_threads, events, out, tick, langs=TARGET_LANGUAGES):
+    """--dry-run: descarga y lee las temporadas, pero solo calcula lo que costaría traducirlas."""
+    from src.estimate import DryRunPipeline
+    pipeline = DryRunPipeline(clean_name, s_list, max_threads, events, langs=langs)
+    if out:
+        est = pipeline.estimate(on_tick=out.pump, tick=tick)
+        events.emit("estimate_done", series=clean_name, concurrency=max_threads,
+                    latency=est["latency"], totals=est["totals"])
+        out.pump()
+        return
+    from src.ui import console, estimate_table, LEVEL_STYLES
+    def on_tick():
+        for ev in events.drain():
+            if ev["event"] == "log" and ev["level"] != "debug":
+                console.print(f"[{LEVEL_STYLES[ev['level']]}]{ev['msg']}[/]")
+    with console.status("Estimando..."):
+        est = pipeline.estimate(on_tick=on_tick, tick=tick)
+        on_tick()
+    console.print(estimate_table(est))
+    console.print("[dim]Por capítulo: como si se tradujera solo. Por temporada: cada frase se pide una vez.[/dim]")
+
+def save_report(path=REPORT_FILE):
+    """Escribe el informe de la ejecución (y el textfile de Prometheus si está configurado)."""
+    report = METRICS.write_report(path, extra={"cache": CACHE_STATS.as_dict()})
+    if PROMETHEUS_TEXTFILE: METRICS.write_prometheus(PROMETHEUS_TEXTFILE, report)
+    return report
+
+def main():
+    global _json_out
+    args = parse_args()
+    args.serve = args.serve or bool(args.watch)
+    args.headless = args.headless or args.worker or args.serve # Ni trabajadores ni demonio dibujan interfaz
+    if args.cache_info:
+        # Operación solo de caché: ni interfaz, ni scraper, ni Gemini.
+        from src.utils import get_cache
+        print(f"{len(get_cache())} traducciones en {CACHE_DB_FILE}")
+        return
+    if args.warm_cache is not None:
+        # Recuperar lo ya pagado (otra máquina, caché perdida...) sin llamar a la IA.
+        from src.utils import get_cache, save_cache
+        from src.warmup import warm_cache
+        res = warm_cache(get_cache(), args.warm_cache)
         save_cache()
-        
-        # Si era una lista de temporadas específica, y ya acabamos esta vuelta... next!
-        if s_list and idx >= len(s_list): break
-        # Si era modo "All" y descargamos bien, el bucle sigue al principio (idx++)
+        print(f"{res['duals']} duales y {res['pairs']} pares EN/ES: {res['lines']} frases, {res['unique']} distintas "
+              f"({res['conflicts']} con varias traducciones). {res['added']} nuevas en {CACHE_DB_FILE}")
+        return
+    if args.queue_status:
+        from src.workqueue import WorkQueue
+        queue = WorkQueue(QUEUE_DB_FILE)
+        print(f"Cola {QUEUE_DB_FILE}: {queue.stats()}")
+        for series, season, attempts, error in queue.failed_jobs():
+            print(f"  FALLIDA {series} T{season} ({attempts} intentos): {error}")
+        return
+    if args.workers:
+        # Varios procesos en esta máquina: cada uno con su GIL, todos con la misma cola y caché.
+        from src.worker import spawn_workers
+        _json_out = JsonRenderer(ProgressEvents()) # Comparte stdout con los eventos de los trabajadores
+        codes = spawn_workers(args.workers, args.threads or 8, os.path.abspath(__file__), wait=args.wait,
+                              langs=args.langs, formats=args.formats)
+        sys.exit(max(codes))
+    events = ProgressEvents()
+    out = JsonRenderer(events) if args.headless else None
+    _json_out = out
 
+    # 1. Mensaje de Bienvenida (Banner Azul)
+    if not args.headless:
+        from rich.panel import Panel
+        from src.ui import console
+        console.print(Panel("[bold white on blue] SUBSYNC: GEMINI 2.5 FLASH-LITE (MODULAR MOD) [/bold white on blue]"))
+    
+    # Verificación de Seguridad: Si no hay llave (y traducimos con Gemini), no podemos trabajar.
+    # (Para solo encolar o estimar no hace falta: traducirán los trabajadores / no se traduce.)
+    if TRANSLATION_BACKEND == "gemini" and not GOOGLE_API_KEY and not args.enqueue and not args.dry_run: 
+        if out:
+            events.log("Falta apikey.key", "error")
+            out.pump()
+        else: console.print("[red]Falta apikey.key[/red]")
+        sys.exit(1)
+
+    if args.worker:
+        # Trabajador de la cola: sin preguntas ni interfaz, todo en eventos JSON.
+        from src.worker import run_worker
+        run_worker(QUEUE_DB_FILE, args.threads or 8, events, out, wait=args.wait, langs=args.langs, formats=args.formats)
+        # Un informe por trabajador (varios pueden compartir carpeta).
+        save_report(REPORT_FILE.replace(".json", f".{os.getpid()}.json"))
+        out.pump()
+        return
+
+    if args.serve:
+        # Demonio: motor, scraper y caché se quedan abiertos entre peticiones.
+        from src.engine import get_engine
+        from src.daemon import Daemon
+        from src.config import DAEMON_PORT
+        threads = args.threads or 8
+        Daemon(get_engine(threads), events, threads, port=args.port or DAEMON_PORT, watch_dirs=args.watch or (),
+               langs=args.langs, formats=args.formats).serve(on_tick=out.pump, tick=1.0 / PROGRESS_MAX_FPS)
+        return
+
+    # 2. Serie, temporadas e hilos (preguntando, o de los argumentos en modo sin pantalla)
+    picked = resolve_headless(args, events) if out else ask_interactive(args)
+    if not picked:
+        if out:
+            out.pump()
+            sys.exit(1)
+        return
+    selected, s_list, max_threads = picked
+    from src.utils import clean_series_name
+
+    # Nombre limpio de la serie (sin años ni paréntesis) para URLs y carpetas.
+    clean_name = clean_series_name(selected['display'])
+
+    if args.enqueue:
+        # El menú de siempre, pero el trabajo lo harán los trabajadores de la cola.
+        enqueue_seasons(clean_name, s_list, (lambda m: events.log(m)) if out else console.print)
+        if out: out.pump()
+        return
+
+    tick = 1.0 / PROGRESS_MAX_FPS
+    if args.dry_run:
+        estimate_run(clean_name, s_list, max_threads, events, out, tick, args.langs)
+        return
+
+    from src.engine import get_engine
+    from src.pipeline import SeasonPipeline
+
+    # Motor de traducción asíncrono: los "hilos" son ahora el objetivo de peticiones
+    # simultáneas a la IA (el limitador lo baja solo si Gemini devuelve 429).
+    engine = get_engine(max_threads)
+
+    # --- TUBERÍA DE TEMPORADAS ---
+    # Una sola tubería para toda la ejecución: mientras se traduce una temporada,
+    # ya se está descargando la siguiente y escribiendo los capítulos de la anterior.
+    # Los hilos solo publican eventos; aquí se pintan (o se escriben como JSON).
+    # Todos los idiomas van en cada petición; cada capítulo se escribe en todos los formatos.
+    pipeline = SeasonPipeline(engine, clean_name, s_list, max_threads, events, langs=args.langs, formats=args.formats)
+
+    if out:
+        done = pipeline.run(on_tick=out.pump, tick=tick)
+        report = save_report()
+        events.emit("run_done", series=clean_name, seasons=done, cache=report["cache"],
+                    api=report.get("api", {}), wall_s=report["wall_s"], report=REPORT_FILE)
+        out.pump()
+        return
+
+    # --- INTERFAZ (UI) ---
+    from rich.live import Live
+    from src.ui import ProgressView
+    view = ProgressView(events)
+    # Live sin refresco automático: solo se repinta cuando la vista lo pide (con tope de fps).
+    with Live(view.render(), auto_refresh=False, console=console) as live:
+        def on_tick():
+            if view.pump(): live.update(view.render(), refresh=True)
+        done = pipeline.run(on_tick=on_tick, tick=tick)
+        view.pump()
+        live.update(view.render(), refresh=True)
+
+    report = save_report()
+    if done: console.print(f"[dim]Temporadas completadas: {', '.join(map(str, done))}[/dim]")
+    console.print(f"[dim]{CACHE_STATS.summary()}[/dim]")
+    api = report.get("api")
+    if api:
+        console.print(f"[dim]API: {api['calls']} peticiones, {api['retries']} reintentos, {api['quota_429']} x 429, "
+                      f"{api['tokens_in'] + api['tokens_out']} tokens. Informe: {REPORT_FILE}[/dim]")
     console.print("[bold green]Listo. Proyecto completado.[/bold green]")
 
 if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        # Si el usuario pulsa Ctrl+C, salimos elegantemente.
-        console.print("\n[bold yellow]Interrupción de usuario detectada. Saliendo...[/bold yellow]")
+        # Si el usuario pulsa Ctrl+C, guardamos el progreso y salimos elegantemente.
+        # Sin pantalla, stdout es NDJSON: el aviso va como un evento más, no como texto suelto.
+        from src.utils import save_cache
+        if _json_out:
+            _json_out.events.emit("interrupted")
+            _json_out.pump()
+        else:
+            from src.ui import console
+            console.print("\n[bold yellow]Interrupción de usuario detectada. Guardando progreso...[/bold yellow]")
+        flush_all()
+        save_cache()
+        save_report()
         os._exit(0)
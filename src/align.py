@@ -0,0 +1,146 @@
+import numpy as np
+
+# Importaciones propias
+from src.config import (ALIGN_RESOLUTION_MS, ALIGN_MAX_OFFSET_MS, ALIGN_FRAMERATE_RATIOS, ALIGN_SPLIT_CANDIDATES,
+                        ALIGN_SPLIT_GAIN, ALIGN_MIN_SCORE, ALIGN_MIN_COVERAGE)
+from src.srt import parse_subtitle
+
+# --- ALINEADOR DE SUBTÍTULOS (sin alass) ---
+# Si la web ya tiene el subtítulo en español de un capítulo, no hace falta traducirlo:
+# basta con encajar sus tiempos con los del inglés y emparejar frase con frase.
+# Cómo se hace (todo con NumPy, sin bucles por milisegundo):
+#   1. Cada pista se "rasteriza" en una señal de 0/1 (¿hay alguien hablando en este instante?)
+#      con una resolución de ALIGN_RESOLUTION_MS.
+#   2. La correlación cruzada (vía FFT) da de una vez la puntuación de TODOS los desfases posibles:
+#      cuánto tiempo de voz coincide si movemos el español X milisegundos.
+#   3. Se prueban varias relaciones de fotogramas (23.976 vs 25 fps...) por si el español
+#      viene de otra versión del vídeo, y un punto de corte (anuncios, intro distinta)
+#      a partir del cual el desfase cambia.
+#   4. Con los tiempos ya corregidos, cada frase en español se asigna a la frase inglesa
+#      donde cae su punto medio. Las inglesas poco cubiertas se quedan sin pareja (se traducen).
+# Es trabajo de CPU puro, así que se ejecuta en un pool de procesos (ver src.pipeline).
+
+def rasterize(starts, ends, length, res=ALIGN_RESOLUTION_MS):
+    """Intervalos (ms) -> señal 0/1 de 'length' muestras (1 = hay subtítulo en pantalla)."""
+    s = np.clip(np.asarray(starts) // res, 0, length).astype(np.int64)
+    e = np.clip(np.asarray(ends) // res, 0, length).astype(np.int64)
+    e = np.maximum(e, s)
+    # Array de diferencias: +1 donde empieza una frase, -1 donde acaba. La suma acumulada da la señal.
+    diff = np.zeros(length + 1, dtype=np.float32)
+    np.add.at(diff, s, 1)
+    np.add.at(diff, e, -1)
+    return np.minimum(np.cumsum(diff[:-1]), 1)
+
+def best_offset(ref, sig, max_lag):
+    """
+    Desfase (en muestras) que hay que SUMAR a 'sig' para que coincida lo más posible con 'ref'.
+    Devuelve (desfase, puntuación = muestras de voz que coinciden).
+    """
+    n = 1 << (len(ref) + len(sig)).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(ref, n) * np.conj(np.fft.rfft(sig, n)), n)
+    lags = np.arange(-max_lag, max_lag + 1)
+    scores = corr[lags % n]
+    i = int(np.argmax(scores))
+    return int(lags[i]), float(scores[i])
+
+class Alignment:
+    """Transformación encontrada: tiempo_es * escala + desfase (con un desfase distinto tras el corte)."""
+    __slots__ = ("scale", "offset", "split", "offset_after", "score")
+
+    def __init__(self, scale, offset, score, split=None, offset_after=None):
+        self.scale = scale
+        self.offset = offset             # ms
+        self.split = split               # tiempo (ms, ya escalado) a partir del cual cambia el desfase
+        self.offset_after = offset_after # ms
+        self.score = score               # fracción de la voz inglesa cubierta por la española (0-1)
+
+    def apply(self, starts, ends):
+        """Aplica la transformación a los tiempos del español (arrays en ms)."""
+        s = np.asarray(starts, dtype=np.float64) * self.scale
+        e = np.asarray(ends, dtype=np.float64) * self.scale
+        shift = np.full(len(s), float(self.offset))
+        if self.split is not None: shift[s >= self.split] = self.offset_after
+        return (s + shift).astype(np.int64), (e + shift).astype(np.int64)
+
+    def as_dict(self):
+        return {"scale": self.scale, "offset_ms": self.offset, "split_ms": self.split,
+                "offset_after_ms": self.offset_after, "score": round(self.score, 4)}
+
+def find_alignment(en_starts, en_ends, es_starts, es_ends, res=ALIGN_RESOLUTION_MS):
+    """Busca la mejor escala, desfase y (si mejora lo bastante) punto de corte."""
+    en_starts, en_ends = np.asarray(en_starts), np.asarray(en_ends)
+    es_starts, es_ends = np.asarray(es_starts, dtype=np.float64), np.asarray(es_ends, dtype=np.float64)
+    max_lag = ALIGN_MAX_OFFSET_MS // res
+    length = int(max(en_ends.max(), es_ends.max() * max(ALIGN_FRAMERATE_RATIOS)) // res) + 2
+    ref = rasterize(en_starts, en_ends, length, res)
+    speech = float(ref.sum()) or 1.0
+
+    # 1. Escala (fps) + desfase global
+    best = None
+    for scale in ALIGN_FRAMERATE_RATIOS:
+        s, e = es_starts * scale, es_ends * scale
+        lag, score = best_offset(ref, rasterize(s, e, length, res), max_lag)
+        if best is None or score > best[2]: best = (scale, lag, score)
+    scale, lag, score = best
+    result = Alignment(scale, lag * res, score / speech)
+
+    # 2. Punto de corte: ¿encaja mejor con un desfase antes y otro después?
+    s, e = es_starts * scale, es_ends * scale
+    n, base = len(s), result.score
+    for q in np.linspace(0, 1, ALIGN_SPLIT_CANDIDATES + 2)[1:-1]:
+        j = int(n * q)
+        if j <= 0 or j >= n: continue
+        lag_a, score_a = best_offset(ref, rasterize(s[:j], e[:j], length, res), max_lag)
+        lag_b, score_b = best_offset(ref, rasterize(s[j:], e[j:], length, res), max_lag)
+        total = (score_a + score_b) / speech
+        # Solo se acepta si mejora claramente al desfase único (y a los cortes ya probados).
+        if lag_a != lag_b and total > base * (1 + ALIGN_SPLIT_GAIN) and total > result.score:
+            result = Alignment(scale, lag_a * res, total, split=float(s[j]), offset_after=lag_b * res)
+    return result
+
+def pair_cues(en_starts, en_ends, es_starts, es_ends, es_texts, min_coverage=ALIGN_MIN_COVERAGE):
+    """
+    Asigna cada frase en español (ya alineada) a la frase inglesa donde cae su punto medio.
+    Devuelve una lista con el texto en español de cada frase inglesa (None = sin pareja).
+    """
+    en_starts, en_ends = np.asarray(en_starts), np.asarray(en_ends)
+    es_starts, es_ends = np.asarray(es_starts), np.asarray(es_ends)
+    order = np.argsort(en_starts, kind="stable")
+    sorted_starts = en_starts[order]
+
+    mids = (es_starts + es_ends) // 2
+    pos = np.searchsorted(sorted_starts, mids, side="right") - 1
+    valid = pos >= 0
+    idx = np.where(valid, order[np.clip(pos, 0, None)], -1)
+    valid &= mids < en_ends[np.clip(idx, 0, None)]
+
+    # Cuánto de cada frase inglesa tapan las españolas que se le asignaron.
+    overlap = np.clip(np.minimum(es_ends, en_ends[np.clip(idx, 0, None)])
+                      - np.maximum(es_starts, en_starts[np.clip(idx, 0, None)]), 0, None)
+    covered = np.bincount(idx[valid], weights=overlap[valid], minlength=len(en_starts))
+    duration = np.maximum(en_ends - en_starts, 1)
+    good = covered / duration >= min_coverage
+
+    paired = [[] for _ in range(len(en_starts))]
+    for j in np.flatnonzero(valid):
+        if good[idx[j]]: paired[idx[j]].append(es_texts[j])
+    return [" ".join(t.replace("\n", " ").strip() for t in texts if t.strip()) or None for texts in paired]
+
+def align_episode(en_starts, en_ends, es_name, es_data):
+    """
+    Tarea para el pool de procesos: lee el subtítulo en español (bytes) y lo empareja con
+    los tiempos del inglés. Devuelve (textos en español por frase inglesa o None, info).
+    Si la alineación no es fiable (otra versión del capítulo, archivo equivocado...) no empareja nada.
+    """
+    track = parse_subtitle(es_name, es_data)
+    if not len(track) or not len(en_starts):
+        return [None] * len(en_starts), {"score": 0.0, "matched": 0}
+    al = find_alignment(en_starts, en_ends, track.starts, track.ends)
+    info = al.as_dict()
+    if al.score < ALIGN_MIN_SCORE:
+        info["matched"] = 0
+        return [None] * len(en_starts), info
+    starts, ends = al.apply(track.starts, track.ends)
+    texts = pair_cues(en_starts, en_ends, starts, ends, track.texts)
+    info["matched"] = sum(t is not None for t in texts)
+    return texts, info
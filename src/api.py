@@ -1,157 +1,272 @@
-import json
-import time
+import asyncio
 import difflib
-import google.generativeai as genai
 import warnings
+from functools import lru_cache
 
 # Elimina las alertas de "deprecated" de google.generativeai
 warnings.simplefilter('ignore')
 
 # Importaciones propias
-from src.config import GOOGLE_API_KEY, logger, api_lock
-from src.utils import TRANSLATION_CACHE, cache_lock
-
-# --- CONFIGURACIÓN DE IA ---
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    
-    # Configuración para que la IA responda SIEMPRE en formato JSON
-    generation_config = genai.types.GenerationConfig(
-        temperature=0.1, # Creatividad baja (0.1) para que sea literal y no invente.
-        response_mime_type="application/json" 
-    )
-    # Modelo Gemini 2.5 Flash Lite (Versión de pago barata y rápida)
-    model = genai.GenerativeModel('gemini-2.5-flash-lite', generation_config=generation_config)
-else:
-    model = None
+from src.config import MAX_QUOTA_RETRIES, MAX_API_ATTEMPTS, SPLIT_SPEAKERS, SPLIT_SENTENCES, DEFAULT_LANGUAGE, TARGET_LANGUAGES, logger
+from src.utils import get_cache, cache_lock
+from src.backends import get_backend, is_quota_error, BadResponse
+from src.normalize import normalize, restore, bare, split_segments
+from src.metrics import METRICS
 
 # --- FUNCIÓN PRINCIPAL DE TRADUCCIÓN ---
-def translate_batch_native(lines):
+def translate_batch_native(lines, langs=TARGET_LANGUAGES):
     """
     Traduce una lista de frases (batch) de golpe usando IA.
-    Envía un bloque JSON y espera un bloque JSON de vuelta.
+    Versión síncrona: manda el lote al motor asíncrono compartido y espera el resultado.
     """
-    # 1. Separar lo que ya tenemos en CACHÉ de lo que hay que pedir nuevo.
-    indices_to_fetch = []
-    texts_to_fetch = []
-    results = [""] * len(lines)
-    
-    for i, text in enumerate(lines):
-        txt_clean = text.strip()
-        if not txt_clean: continue # Si está vacío, saltar
-        
-        # Bloqueamos el caché para leer (seguridad multihilo)
-        with cache_lock:
-            if txt_clean in TRANSLATION_CACHE:
-                # ¡Ya lo tenemos! No gastamos dinero en la API.
-                results[i] = TRANSLATION_CACHE[txt_clean]
-            else:
-                # Hay que pedirlo. Guardamos posición y texto.
-                indices_to_fetch.append(i)
-                texts_to_fetch.append(txt_clean)
-    
+    # Importación diferida: src.engine importa este módulo.
+    from src.engine import get_engine
+    return get_engine().submit(lines, langs).result()
+
+# Memorizado: la misma línea se resuelve varias veces (al planificar, en su lote y al montar,
+# y una vez por idioma) y normalizarla es lo que más cuesta. Una temporada cabe de sobra.
+@lru_cache(maxsize=20000)
+def _line_parts(line):
+    """Trozos de una línea, cada uno como (clave, núcleo, forma). No modificar lo devuelto (es compartido)."""
+    return tuple(normalize(seg) for seg in split_segments(line, SPLIT_SPEAKERS, SPLIT_SENTENCES))
+
+def resolve_from_cache(lines, overlay=None, stats=None, lang=DEFAULT_LANGUAGE):
+    """
+    Intenta resolver líneas con la caché: tal cual, normalizadas o montadas por trozos.
+    overlay: {clave: traducción} recién llegadas de la API (se miran antes que la caché).
+    stats: CacheStats donde apuntar cómo se resolvió cada línea (opcional).
+    lang: idioma de las traducciones a buscar.
+    Devuelve (resueltas {línea: traducción}, faltan {clave: núcleo a traducir}).
+    """
+    overlay = overlay or {}
+    lines = [l for l in dict.fromkeys(t.strip() for t in lines) if l]
+    parts = {l: _line_parts(l) for l in lines}
+    # Los trozos sin núcleo (clave vacía: "-", "<i></i>") ni se buscan ni se piden: se quedan tal cual.
+    keys = {k for ps in parts.values() for k, _, _ in ps if k and k not in overlay}
+    # Las entradas antiguas (línea tal cual) y las claves normalizadas comparten tabla: una línea
+    # que ya es su propia clave ("yeah") no se busca tal cual, su traducción va sin forma ("sí", no "Sí").
+    legacy = {l for l in lines if len(parts[l]) != 1 or parts[l][0][0] != l}
+
+    # Una sola consulta a la caché: las líneas tal cual (entradas antiguas) + las claves normalizadas.
+    with cache_lock, METRICS.stage("cache_lookup"):
+        found = get_cache().get_many(list(legacy) + list(keys), lang)
+
+    resolved, missing = {}, {}
+    exact = normalized = segments = misses = 0
+    for line in lines:
+        if line in legacy and line in found:
+            # ¡Ya lo tenemos tal cual! No gastamos dinero en la API.
+            resolved[line] = found[line]
+            exact += 1
+            continue
+        ps = parts[line]
+        pieces = [overlay.get(k, found.get(k)) if k else "" for k, _, _ in ps]
+        if all(p is not None for p in pieces):
+            resolved[line] = " ".join(restore(p, shape) if k else bare(shape) for p, (k, _, shape) in zip(pieces, ps))
+            if len(ps) > 1: segments += 1
+            else: normalized += 1
+        else:
+            # Hay que pedir los trozos que falten (solo su núcleo, una vez por clave).
+            for p, (k, core, _) in zip(pieces, ps):
+                if p is None: missing.setdefault(k, core)
+            misses += 1
+    if stats: stats.add(exact, normalized, segments, misses)
+    return resolved, missing
+
+def store_translations(by_lang):
+    """Guarda {idioma: {clave: traducción}} en la caché (en disco: desde el bucle, vía asyncio.to_thread)."""
+    with cache_lock:
+        for lang, items in by_lang.items():
+            if items: get_cache().put_many(items, lang)
+
+async def translate_batch_async(lines, limiter, langs=TARGET_LANGUAGES):
+    """
+    Traduce una lista de frases (batch) de golpe usando el backend configurado.
+    Cada petición pide turno al limitador compartido (limiter).
+    Todos los idiomas van en la misma petición. Devuelve {idioma: lista traducida}.
+    """
+    # 1. Separar lo que ya tenemos en CACHÉ (tal cual o normalizado) de lo que hay que pedir nuevo.
+    # Una frase que falte en algún idioma se pide en todos los que falten en el lote
+    # (es una columna más de la misma petición); los idiomas ya completos no se piden.
+    # Las consultas a SQLite van a un hilo aparte: con varios procesos escribiendo, una espera
+    # por el bloqueo de la base no debe parar el bucle (y con él todas las peticiones en vuelo).
+    resolved, missing, wanted = {}, {}, []
+    for lang in langs:
+        resolved[lang], lang_missing = await asyncio.to_thread(resolve_from_cache, lines, lang=lang)
+        if lang_missing: wanted.append(lang)
+        for k, core in lang_missing.items(): missing.setdefault(k, core)
+
     # Si todo estaba en caché, retornamos directo.
-    if not texts_to_fetch: return results
-
-    # 2. Construir el Prompt (Las instrucciones para la IA)
-    # Le decimos explícitamente qué queremos: JSON, Español Neutro, No repetir inglés.
-    prompt = f"""
-    ROLE: You are an expert subtitler and translator specializing in American English to Neutral Spanish (Latin American) localization.
-    TASK: Translate the provided list of English subtitle lines into natural, conversational Neutral Spanish.
-
-    INPUT LIST:
-    {json.dumps(texts_to_fetch)}
-
-    STRICT RULES:
-    1. OUTPUT FORMAT: Return ONLY a JSON object with a single key "translations" containing the list of translated strings.
-    2. ORDER: The order of the output list MUST match the input list exactly (Index 0 to {len(texts_to_fetch)-1}).
-    3. NO ECHO: NEVER copy the English text. If you cannot translate it, provide a best guess based on context. 
-       - Exception: Proper names (Joey, Ross, Chandler) should remain kept, but the surrounding text MUST be Spanish.
-    4. NO HALLUCINATIONS: Do not add extra lines or combine lines.
-    5. TONE: Informal, as used in TV shows. "You" -> "Tú" (unless formal context implies "Usted", but default to "Tú").
-    
-    CRITICAL:
-    - If the input is "Yeah." -> Output "Sí." (NOT "Yeah.")
-    - If the input is "Oh my god." -> Output "Dios mío." (NOT "Oh my god.")
+    if not missing: return {lang: [resolved[lang].get(t.strip(), "") for t in lines] for lang in langs}
+
+    # 2. Elegimos quién traduce (Gemini, servidor HTTP, con o sin cobertura...)
+    backend = get_backend()
+
+    # 3. Pedimos lo que falta. Si el lote falla, se parte en mitades y se salva lo bueno.
+    with METRICS.stage("batch"):
+        fetched = await recover_batch(list(missing.items()), limiter, backend, langs=tuple(wanted))
+
+    out = {}
+    for lang in langs:
+        # 4. Lo que no hubo manera de traducir queda marcado para no romper el programa.
+        got = fetched.get(lang, {})
+        if lang in wanted:
+            for k in missing:
+                got.setdefault(k, "[ERROR API]")
+
+        # 5. Montar cada línea con su forma original (guion, etiquetas, mayúsculas...)
+        done = resolved[lang]
+        rest = [t for t in lines if t.strip() not in done]
+        done.update((await asyncio.to_thread(resolve_from_cache, rest, overlay=got, lang=lang))[0])
+        out[lang] = [done.get(t.strip(), "") for t in lines]
+    return out
+
+def looks_untranslated(source, translation):
     """
+    VERIFICACIÓN "Traducción Vaga", línea a línea:
+    A veces la IA se cansa y devuelve el texto en inglés tal cual.
+    Solo se mira en frases de 3 o más palabras: "Joey!" o "Okay." pueden quedarse igual.
+    """
+    if not isinstance(translation, str) or not translation.strip(): return True
+    if len(source.split()) < 3: return False
+    # difflib nos dice cuán parecidos son los textos (0.0 a 1.0)
+    matcher = difflib.SequenceMatcher(None, source.lower(), translation.lower())
+    # Se mira una vez por línea y por idioma: primero los topes baratos de ratio() (si ni así
+    # pasan de 0.8, el cálculo completo tampoco) y solo si hace falta, el de verdad.
+    return matcher.real_quick_ratio() > 0.8 and matcher.quick_ratio() > 0.8 and \
+        matcher.ratio() > 0.8 # Si son 80% iguales, es que no tradujo.
 
-    translations = []
-    
-    # 3. Intentar la traducción hasta 3 veces por si falla la red
-    for attempt in range(3):
-        try:
-            # OPTIMIZACIÓN: Como usamos la versión de pago, NO usamos sleeps ni locks.
-            # Pedimos a Gemini que genere el contenido.
-            response = model.generate_content(prompt)
-            
-            # Convertimos el texto recibido (string) a objeto Python (dict/list)
-            data = json.loads(response.text)
-            candidates = data.get("translations", [])
-            
-            # VERIFICACIÓN DE SEGURIDAD 1: Longitud
-            # Si enviamos 50 frases, esperaríamos 50 traduccdiones.
-            if len(candidates) != len(texts_to_fetch):
-                logger.warning(f"Descuadre JSON (Esperado {len(texts_to_fetch)}, Recibido {len(candidates)}). Reintentando...")
-                continue
-            
-            # VERIFICACIÓN DE SEGURIDAD 2: "Traducción Vaga"
-            # A veces la IA se cansa y devuelve el texto en inglés. Detectamos si se repite mucho.
-            is_lazy = False
-            if len(candidates) > 0:
-                # Comparamos las 3 primeras frases originales con las traducidas.
-                english_snippet = " ".join(texts_to_fetch[:3]).lower()
-                spanish_snippet = " ".join(candidates[:3]).lower()
-                # difflib nos dice cuán parecidos son los textos (0.0 a 1.0)
-                ratio = difflib.SequenceMatcher(None, english_snippet, spanish_snippet).ratio()
-                if ratio > 0.8: is_lazy = True # Si son 80% iguales, es que no tradujo.
-
-            if is_lazy:
-                logger.warning("Detectada respuesta vaga (inglés repetido). Forzando reintento...")
-                # Le gritamos un poco en el prompt para el siguiente intento.
-                prompt += "\n\nCRITICAL ERROR: You returned English text. YOU MUST TRANSLATE TO SPANISH."
-                continue
- 
-            # Si pasamos las verificaciones, es un éxito.
-            translations = candidates
-            break 
+async def request_translations(texts, limiter, backend, insist=False, langs=(DEFAULT_LANGUAGE,)):
+    """
+    Una petición al backend (con reintentos si falla la red o el servidor).
+    Los 429 no gastan intento: el limitador pausa a todos y volvemos a probar.
+    Devuelve {idioma: lista recibida} (sin validar; {} si la respuesta no se pudo leer)
+    o None si no hubo manera de que respondiera.
+    """
+    errors, quota_hits = 0, 0
+    while errors < MAX_API_ATTEMPTS and quota_hits < MAX_QUOTA_RETRIES:
+        if errors or quota_hits: METRICS.count("api_retries")
+        async with limiter.slot() as slot:
+            try:
+                # Pedimos la traducción (sin bloquear el bucle asyncio).
+                with METRICS.stage("api_call"):
+                    # Con el limitador: la petición de cobertura (si la hay) pide turno en el mismo.
+                    result = await backend.translate(texts, insist=insist, langs=langs, limiter=limiter)
+                record_api_call(texts, result)
+                return result.translations
+            except BadResponse as e:
+                # Respondió, pero no se entiende: como un descuadre (el que llama parte el lote).
+                logger.warning(f"Respuesta ilegible ({len(texts)} líneas): {e}")
+                METRICS.count("api_errors")
+                return {}
+            except Exception as e:
+                # Manejo de Errores de API
+                if is_quota_error(e):
+                    # Error 429 = "Has superado el límite de velocidad".
+                    # El limitador baja la concurrencia y pausa a TODOS (no solo a este lote).
+                    slot.throttled = True
+                    quota_hits += 1
+                    METRICS.count("api_429")
+                    continue
+                logger.error(f"Error Batch JSON: {e}")
+                errors += 1
+                METRICS.count("api_errors")
+    return None
 
-        except Exception as e:
-            # Manejo de Errores de API
-            if "429" in str(e): 
-                # Error 429 = "Has superado el límite de velocidad". Esperamos 20s.
-                logger.warning("Quota limit (429). Waiting 20s...")
-                time.sleep(20)
-                continue
-            logger.error(f"Error Batch JSON: {e}")
-            # Si es otro error, reintentamos el loop.
-            
-    # 4. Asignar los resultados nuevos a la lista final
-    # Si tras 3 intentos falló todo, ponemos "[ERROR API]" para no romper el programa.
-    if not translations:
-        translations = ["[ERROR API]"] * len(texts_to_fetch)
-        # Último recurso: intentar traducir una por una (muy lento, solo para pocos fallos)
-        if len(texts_to_fetch) < 5: 
-             translations = [translate_single_emergency(t) for t in texts_to_fetch]
-
-    # Guardar en memoria caché para futuras ejecuciones
-    for i, idx_global in enumerate(indices_to_fetch):
-        if i < len(translations):
-            final_txt = translations[i]
-            results[idx_global] = final_txt
-            if "[ERROR" not in final_txt:
-                with cache_lock: TRANSLATION_CACHE[texts_to_fetch[i]] = final_txt
-
-    return results
-
-def translate_single_emergency(text):
+def record_api_call(texts, result):
+    """Apunta el coste de una petición que respondió (líneas, caracteres y tokens)."""
+    METRICS.count("api_calls")
+    METRICS.count("api_lines", len(texts))
+    METRICS.count("api_chars_in", sum(len(t) for t in texts))
+    METRICS.count("api_chars_out", sum(len(t) for ts in result.translations.values() for t in ts if isinstance(t, str)))
+    METRICS.count("api_tokens_in", result.input_tokens)
+    METRICS.count("api_tokens_out", result.output_tokens)
+
+async def recover_batch(items, limiter, backend, insist=False, langs=(DEFAULT_LANGUAGE,)):
+    """
+    Traduce items [(clave, núcleo)] a todos los idiomas y devuelve {idioma: {clave: traducción}}.
+    En vez de tirar el lote entero y repetirlo 3 veces:
+    - Si la respuesta viene descuadrada en algún idioma (o ilegible), se parte el lote en dos y se pide cada mitad.
+    - Si no hay respuesta (red, servidor o cuota, ya reintentados), el lote entero se da por perdido:
+      partirlo solo multiplicaría peticiones que fallarían igual.
+    - Si cuadra, se quedan las líneas buenas (y se guardan en caché YA) y solo
+      se vuelven a pedir las que vinieron en inglés (en algún idioma).
+    - Una línea sola que sigue fallando va a la traducción de emergencia.
+    """
+    texts = [core for _, core in items]
+    candidates = await request_translations(texts, limiter, backend, insist, langs)
+    if candidates is None:
+        logger.error(f"Lote de {len(items)} líneas perdido: el backend no respondió.")
+        return {}
+
+    # VERIFICACIÓN DE SEGURIDAD 1: Longitud
+    # Si enviamos 50 frases, esperaríamos 50 traducciones (en cada idioma).
+    if any(len(candidates.get(lang) or ()) != len(texts) for lang in langs):
+        if candidates:
+            received = {lang: len(candidates.get(lang) or ()) for lang in langs}
+            logger.warning(f"Descuadre JSON (Esperado {len(texts)}, Recibido {received}). Partiendo el lote...")
+        if len(items) == 1:
+            singles = await translate_single_languages(texts[0], limiter, backend, langs)
+            return {lang: {items[0][0]: single} for lang, single in singles.items()}
+        mid = len(items) // 2
+        left, right = await asyncio.gather(
+            recover_batch(items[:mid], limiter, backend, insist, langs),
+            recover_batch(items[mid:], limiter, backend, insist, langs),
+        )
+        return {lang: {**left.get(lang, {}), **right.get(lang, {})} for lang in langs}
+
+    # VERIFICACIÓN DE SEGURIDAD 2: "Traducción Vaga", línea a línea
+    good, bad = {lang: {} for lang in langs}, []
+    for i, (key, core) in enumerate(items):
+        row = {lang: candidates[lang][i] for lang in langs}
+        if any(looks_untranslated(core, cand) for cand in row.values()): bad.append((key, core))
+        else:
+            for lang, cand in row.items(): good[lang][key] = cand.strip()
+
+    # Guardar en caché al momento (por CLAVE normalizada: sirve para todas las variantes).
+    await asyncio.to_thread(store_translations, good)
+
+    if bad:
+        if not insist:
+            # Le gritamos un poco en el prompt y pedimos SOLO las líneas malas.
+            logger.warning(f"Detectadas {len(bad)} líneas en inglés de {len(items)}. Reintentando solo esas...")
+            retry = await recover_batch(bad, limiter, backend, insist=True, langs=langs)
+            for lang in langs: good[lang].update(retry.get(lang, {}))
+        else:
+            # Ya insistimos: último recurso, una por una.
+            singles = await asyncio.gather(*(translate_single_languages(core, limiter, backend, langs) for _, core in bad))
+            fresh = {lang: {} for lang in langs}
+            for (key, _), found in zip(bad, singles):
+                for lang, single in found.items():
+                    good[lang][key] = fresh[lang][key] = single
+            await asyncio.to_thread(store_translations, fresh)
+    return good
+
+async def translate_single_languages(text, limiter, backend, langs):
+    """Emergencia de una frase en cada idioma: {idioma: traducción} (sin los que fallen)."""
+    singles = await asyncio.gather(*(translate_single_emergency(text, limiter, backend, lang) for lang in langs))
+    return {lang: single for lang, single in zip(langs, singles) if single}
+
+async def translate_single_emergency(text, limiter, backend, lang=DEFAULT_LANGUAGE):
     """
     Función de emergencia: Traducción simple 1 a 1 sin JSON.
     Se usa cuando el modo batch falla catastróficamente.
+    Devuelve None si tampoco así se pudo traducir.
     """
-    try:
-        # Desactivamos JSON mode para este fallback simple
-        model_txt = genai.GenerativeModel('gemini-2.5-flash-lite') 
-        res = model_txt.generate_content(f"¿Cómo se dice '{text}' en español? Solo la respuesta.")
-        return res.text.strip()
-    except:
-        return text
+    async with limiter.slot() as slot:
+        try:
+            with METRICS.stage("api_call"):
+                single = (await backend.translate_single(text, lang)).strip()
+            METRICS.count("api_calls")
+            METRICS.count("api_single_calls")
+            METRICS.count("api_lines")
+            METRICS.count("api_chars_in", len(text))
+            METRICS.count("api_chars_out", len(single))
+            return single or None
+        except Exception as e:
+            if is_quota_error(e):
+                slot.throttled = True
+                METRICS.count("api_429")
+            else: METRICS.count("api_errors")
+            logger.error(f"Error traducción de emergencia: {e}")
+            return None
@@ -0,0 +1,308 @@
+import json
+import time
+import asyncio
+import urllib.request
+import urllib.error
+from collections import deque
+from dataclasses import dataclass
+
+# Importaciones propias
+from src.config import (GOOGLE_API_KEY, TRANSLATION_BACKEND, HTTP_BACKEND_URL, HTTP_BACKEND_TIMEOUT,
+                        HEDGE_BACKEND, HEDGE_PERCENTILE, LANGUAGES, DEFAULT_LANGUAGE, logger)
+
+# --- INTERFAZ DE LOS "BACKENDS" DE TRADUCCIÓN ---
+# Un backend recibe una lista de frases en inglés y los idiomas a los que traducirlas
+# (todos en la misma petición) y devuelve una lista traducida por idioma.
+# Las comprobaciones (longitud, respuesta vaga, caché, reintentos) las hace src.api,
+# así que cualquier backend solo tiene que cumplir esto:
+#   async def translate(texts, insist=False, langs=("es",), limiter=None) -> BackendResult
+#     (limiter: el limitador compartido, para quien lance peticiones extra por su cuenta,
+#      como la cobertura; los demás lo ignoran)
+#   async def translate_single(text, lang="es") -> str
+# Errores: QuotaExceeded si es un 429, BadResponse si la respuesta no se puede leer;
+# cualquier otra excepción se toma como fallo de red o del servidor.
+
+class QuotaExceeded(Exception):
+    """El servicio respondió 429: hay que frenar (lo gestiona el limitador)."""
+
+class BadResponse(Exception):
+    """La respuesta llegó pero no se puede leer (JSON roto, respuesta bloqueada...): partir el lote puede arreglarlo."""
+
+def is_quota_error(e):
+    """True si la excepción es un 429 (cuota / límite de velocidad superado)."""
+    return isinstance(e, QuotaExceeded) or "429" in str(e) or "ResourceExhausted" in type(e).__name__
+
+@dataclass
+class BackendResult:
+    translations: dict      # {idioma: lista de frases traducidas} (puede venir descuadrada: se valida fuera)
+    backend: str            # Nombre del backend que respondió
+    latency: float          # Segundos que tardó la petición
+    input_tokens: int = 0   # Coste aproximado de la petición
+    output_tokens: int = 0
+
+class TranslationBackend:
+    name = "base"
+
+    async def translate(self, texts, insist=False, langs=(DEFAULT_LANGUAGE,), limiter=None):
+        """insist=True: el intento anterior vino en inglés, hay que insistir en traducir."""
+        raise NotImplementedError
+
+    async def translate_single(self, text, lang=DEFAULT_LANGUAGE):
+        """Traducción de emergencia de una sola frase."""
+        result = await self.translate([text], insist=True, langs=(lang,))
+        found = result.translations.get(lang)
+        return found[0] if found else text
+
+def by_language(data, langs):
+    """
+    Respuesta -> {idioma: lista}. Con un solo idioma vale la lista tal cual (como antes);
+    con varios, un objeto {"es": [...], "pt": [...]}. Los idiomas que no vengan se quedan fuera.
+    """
+    if isinstance(data, list): return {langs[0]: data}
+    if not isinstance(data, dict): return {}
+    return {lang: data[lang] for lang in langs if isinstance(data.get(lang), list)}
+
+def parse_translations(raw, langs):
+    """Texto JSON recibido -> {idioma: lista}. Lanza BadResponse si no es el JSON esperado."""
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise BadResponse(f"JSON ilegible: {e}") from e
+    if not isinstance(data, dict): raise BadResponse(f"JSON inesperado: {type(data).__name__}")
+    return by_language(data.get("translations", []), langs)
+
+def language_name(lang):
+    """Cómo se le nombra un idioma a la IA ("pt" -> "Brazilian Portuguese")."""
+    return LANGUAGES.get(lang, lang)
+
+# --- BACKEND: GOOGLE GEMINI ---
+class GeminiBackend(TranslationBackend):
+    name = "gemini"
+
+    def __init__(self, api_key=GOOGLE_API_KEY, model_name='gemini-2.5-flash-lite'):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.model_name = model_name
+
+        # Configuración para que la IA responda SIEMPRE en formato JSON
+        generation_config = genai.types.GenerationConfig(
+            temperature=0.1, # Creatividad baja (0.1) para que sea literal y no invente.
+            response_mime_type="application/json"
+        )
+        # Modelo Gemini 2.5 Flash Lite (Versión de pago barata y rápida)
+        self.model = genai.GenerativeModel(model_name, generation_config=generation_config)
+
+    def build_prompt(self, texts, insist=False, langs=(DEFAULT_LANGUAGE,)):
+        """Construye el Prompt (las instrucciones para la IA)."""
+        if tuple(langs) != ("es",): return self.build_multi_prompt(texts, insist, langs)
+        # Le decimos explícitamente qué queremos: JSON, Español Neutro, No repetir inglés.
+        prompt = f"""
+    ROLE: You are an expert subtitler and translator specializing in American English to Neutral Spanish (Latin American) localization.
+    TASK: Translate the provided list of English subtitle lines into natural, conversational Neutral Spanish.
+
+    INPUT LIST:
+    {json.dumps(texts)}
+
+    STRICT RULES:
+    1. OUTPUT FORMAT: Return ONLY a JSON object with a single key "translations" containing the list of translated strings.
+    2. ORDER: The order of the output list MUST match the input list exactly (Index 0 to {len(texts)-1}).
+    3. NO ECHO: NEVER copy the English text. If you cannot translate it, provide a best guess based on context.
+       - Exception: Proper names (Joey, Ross, Chandler) should remain kept, but the surrounding text MUST be Spanish.
+    4. NO HALLUCINATIONS: Do not add extra lines or combine lines.
+    5. TONE: Informal, as used in TV shows. "You" -> "Tú" (unless formal context implies "Usted", but default to "Tú").
+
+    CRITICAL:
+    - If the input is "Yeah." -> Output "Sí." (NOT "Yeah.")
+    - If the input is "Oh my god." -> Output "Dios mío." (NOT "Oh my god.")
+    """
+        if insist:
+            # Le gritamos un poco en el prompt si el intento anterior vino en inglés.
+            prompt += "\n\nCRITICAL ERROR: You returned English text. YOU MUST TRANSLATE TO SPANISH."
+        return prompt
+
+    def build_multi_prompt(self, texts, insist, langs):
+        """Varios idiomas (u otro que no es el español): una lista por idioma en la misma respuesta."""
+        targets = ", ".join(f'"{l}" = {language_name(l)}' for l in langs)
+        prompt = f"""
+    ROLE: You are an expert subtitler and translator of American English TV shows.
+    TASK: Translate the provided list of English subtitle lines into each of these languages: {targets}.
+
+    INPUT LIST:
+    {json.dumps(texts)}
+
+    STRICT RULES:
+    1. OUTPUT FORMAT: Return ONLY a JSON object with a single key "translations" whose value is an object
+       with one key per language code ({", ".join(f'"{l}"' for l in langs)}), each containing the list of translated strings.
+    2. ORDER: Every list MUST match the input list exactly (Index 0 to {len(texts)-1}).
+    3. NO ECHO: NEVER copy the English text. Proper names stay as they are, the surrounding text MUST be translated.
+    4. NO HALLUCINATIONS: Do not add extra lines or combine lines.
+    5. TONE: Informal and natural, as used in TV shows.
+    """
+        if "es" in langs:
+            prompt += '\n    SPANISH ("es"): Neutral Latin American Spanish, "You" -> "Tú" by default.'
+        if insist:
+            prompt += "\n\nCRITICAL ERROR: You returned English text. YOU MUST TRANSLATE EVERY LINE."
+        return prompt
+
+    async def translate(self, texts, insist=False, langs=(DEFAULT_LANGUAGE,), limiter=None):
+        start = time.monotonic()
+        try:
+            response = await self.model.generate_content_async(self.build_prompt(texts, insist, langs))
+        except Exception as e:
+            if is_quota_error(e): raise QuotaExceeded(str(e)) from e
+            raise
+        # Convertimos el texto recibido (string) a objeto Python (dict/list).
+        # Si la respuesta vino bloqueada, response.text ya lanza ValueError.
+        try:
+            raw = response.text
+        except ValueError as e:
+            raise BadResponse(str(e)) from e
+        usage = getattr(response, "usage_metadata", None)
+        return BackendResult(
+            translations=parse_translations(raw, langs),
+            backend=self.name,
+            latency=time.monotonic() - start,
+            input_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+            output_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        )
+
+    async def translate_single(self, text, lang=DEFAULT_LANGUAGE):
+        # Desactivamos JSON mode para este fallback simple
+        model_txt = self.genai.GenerativeModel(self.model_name)
+        question = f"¿Cómo se dice '{text}' en español? Solo la respuesta." if lang == "es" else \
+            f"How do you say '{text}' in {language_name(lang)}? Only the answer."
+        try:
+            res = await model_txt.generate_content_async(question)
+        except Exception as e:
+            if is_quota_error(e): raise QuotaExceeded(str(e)) from e
+            raise
+        return res.text.strip()
+
+# --- BACKEND: SERVIDOR HTTP LOCAL ---
+# Para un servidor de traducción propio (o un "doble" local para pruebas).
+# Protocolo: POST JSON {"source": "en", "target": "es", "targets": ["es", "pt"], "lines": [...]}
+#            Respuesta JSON {"translations": [...]} (un idioma: el de "target")
+#                        o  {"translations": {"es": [...], "pt": [...]}}   (429 = cuota superada)
+class HttpBackend(TranslationBackend):
+    name = "http"
+
+    def __init__(self, url=HTTP_BACKEND_URL, timeout=HTTP_BACKEND_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, texts, langs):
+        # "target" (el primero) para los servidores de un solo idioma; "targets" con todos.
+        body = json.dumps({"source": "en", "target": langs[0], "targets": list(langs), "lines": texts}).encode("utf-8")
+        req = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.read().decode("utf-8", errors="replace")
+        except urllib.error.HTTPError as e:
+            if e.code == 429: raise QuotaExceeded(f"HTTP 429 de {self.url}") from e
+            raise
+
+    async def translate(self, texts, insist=False, langs=(DEFAULT_LANGUAGE,), limiter=None):
+        start = time.monotonic()
+        # urllib es bloqueante: lo mandamos a un hilo para no parar el bucle asyncio.
+        raw = await asyncio.to_thread(self._post, texts, langs)
+        translations = parse_translations(raw, langs)
+        return BackendResult(
+            translations=translations,
+            backend=self.name,
+            latency=time.monotonic() - start,
+            input_tokens=sum(len(t) for t in texts) // 4, # Aproximación: 4 caracteres = 1 token
+            output_tokens=sum(len(t) for ts in translations.values() for t in ts if isinstance(t, str)) // 4,
+        )
+
+# --- PETICIONES "DE COBERTURA" (HEDGING) ---
+# Si el backend principal tarda más que casi siempre (percentil 95 de sus latencias),
+# lanzamos la misma petición a un segundo backend y nos quedamos con la que llegue antes.
+# Los lotes lentos "raros" dejan de marcar el tiempo total de cada capítulo.
+class HedgedBackend(TranslationBackend):
+    def __init__(self, primary, secondary, percentile=HEDGE_PERCENTILE, min_samples=20, history=200):
+        self.primary = primary
+        self.secondary = secondary
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=history)
+        self.name = f"{primary.name}+{secondary.name}"
+        self.hedges = 0 # Cuántas veces se lanzó la petición de cobertura
+
+    def hedge_delay(self):
+        """Segundos a esperar antes de lanzar la copia (None = aún no hay datos suficientes)."""
+        if len(self.latencies) < self.min_samples: return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    async def translate(self, texts, insist=False, langs=(DEFAULT_LANGUAGE,), limiter=None):
+        start = time.monotonic()
+        first = asyncio.ensure_future(self.primary.translate(texts, insist, langs))
+        delay = self.hedge_delay()
+        if delay is None:
+            result = await first
+            self.latencies.append(result.latency)
+            return result
+
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            result = first.result()
+            self.latencies.append(result.latency)
+            return result
+
+        # El principal va lento: lanzamos la copia y gana el primero que acabe BIEN.
+        self.hedges += 1
+        second = asyncio.ensure_future(self._hedge(texts, insist, langs, limiter))
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending: other.cancel()
+                    result = task.result()
+                    if task is first: self.latencies.append(result.latency)
+                    # Si gana la copia, el principal habría tardado COMO POCO lo que llevaba:
+                    # sin apuntarlo, solo quedarían las rápidas y el umbral bajaría solo.
+                    elif first in pending: self.latencies.append(time.monotonic() - start)
+                    return result
+                error = task.exception()
+        raise error
+
+    async def _hedge(self, texts, insist, langs, limiter):
+        """La petición de cobertura, con su turno en el limitador (cuenta para la cuota como otra cualquiera)."""
+        if limiter is None: return await self.secondary.translate(texts, insist, langs)
+        async with limiter.slot() as slot:
+            try:
+                return await self.secondary.translate(texts, insist, langs)
+            except Exception as e:
+                if is_quota_error(e): slot.throttled = True
+                raise
+
+    async def translate_single(self, text, lang=DEFAULT_LANGUAGE):
+        return await self.primary.translate_single(text, lang)
+
+# --- FÁBRICA ---
+def make_backend(name):
+    """Crea un backend por su nombre ('gemini' o 'http')."""
+    if name == "gemini": return GeminiBackend()
+    if name == "http": return HttpBackend()
+    raise ValueError(f"Backend de traducción desconocido: {name}")
+
+_backend = None
+
+def get_backend():
+    """Backend configurado (se crea la primera vez; con cobertura si HEDGE_BACKEND está puesto)."""
+    global _backend
+    if _backend is None:
+        backend = make_backend(TRANSLATION_BACKEND)
+        if HEDGE_BACKEND:
+            backend = HedgedBackend(backend, make_backend(HEDGE_BACKEND))
+            logger.info(f"Hedging activado: {backend.name}")
+        _backend = backend
+    return _backend
+
+def set_backend(backend):
+    """Sustituye el backend global (otro servidor, uno falso para pruebas...)."""
+    global _backend
+    _backend = backend
@@ -0,0 +1,198 @@
+import os
+import json
+import sqlite3
+from collections import OrderedDict
+from threading import RLock
+
+# Importaciones propias
+from src.config import SQLITE_WAL, DEFAULT_LANGUAGE
+
+# --- ALMACENES DE CACHÉ ---
+# La caché de traducciones se separa en dos capas:
+#   1. Un "almacén" (store) en disco que guarda TODO y se escribe poco a poco.
+#   2. Una capa LRU en memoria con las frases usadas más recientemente.
+# Cualquier almacén sirve mientras tenga get_many / put_many / count / close.
+# Cada traducción se guarda por (frase, idioma): "Yeah." en español y en portugués son dos entradas.
+
+# SQLite limita el número de "?" por consulta, así que preguntamos por trozos.
+SQL_CHUNK = 500
+
+class MemoryStore:
+    """Almacén en RAM (sin disco). Útil para pruebas y ejecuciones de usar y tirar."""
+    def __init__(self):
+        self.data = {}
+
+    def get_many(self, keys, lang=DEFAULT_LANGUAGE):
+        return {k: self.data[(k, lang)] for k in keys if (k, lang) in self.data}
+
+    def put_many(self, items, lang=DEFAULT_LANGUAGE):
+        self.data.update(((k, lang), v) for k, v in items.items())
+
+    def count(self):
+        return len(self.data)
+
+    def flush(self): pass
+
+    def close(self): pass
+
+class SQLiteStore:
+    """
+    Almacén en un fichero SQLite.
+    Cada lote traducido se guarda al momento (no hace falta reescribir todo el
+    fichero) y las búsquedas no necesitan cargar la caché entera en memoria.
+    """
+    def __init__(self, path):
+        # check_same_thread=False: la conexión se comparte entre hilos,
+        # por eso TranslationCache protege todos los accesos con un lock.
+        # timeout: con varios trabajadores escribiendo a la vez, se espera turno en vez de fallar.
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL: los lectores no bloquean al escritor y un cierre brusco no corrompe el fichero.
+        # (En carpetas de red no funciona: ahí se usa el diario clásico, ver SQLITE_WAL).
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if SQLITE_WAL else 'DELETE'}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        """
+        Crea la tabla, o pasa la de antes (una sola columna de origen, todo en español)
+        a la de ahora (origen + idioma). Se hace una vez y dentro de una transacción:
+        si otro proceso la está pasando a la vez, se espera y ya la encuentra hecha.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(translations)")]
+            if columns and "lang" not in columns:
+                self.conn.execute("ALTER TABLE translations RENAME TO translations_old")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations (source TEXT NOT NULL, lang TEXT NOT NULL, "
+                "target TEXT NOT NULL, PRIMARY KEY (source, lang)) WITHOUT ROWID"
+            )
+            if columns and "lang" not in columns:
+                self.conn.execute("INSERT INTO translations (source, lang, target) "
+                                  "SELECT source, ?, target FROM translations_old", (DEFAULT_LANGUAGE,))
+                self.conn.execute("DROP TABLE translations_old")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def get_many(self, keys, lang=DEFAULT_LANGUAGE):
+        keys = list(keys)
+        found = {}
+        for i in range(0, len(keys), SQL_CHUNK):
+            chunk = keys[i : i + SQL_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT source, target FROM translations WHERE lang = ? AND source IN ({marks})", [lang, *chunk]
+            )
+            found.update(rows)
+        return found
+
+    def put_many(self, items, lang=DEFAULT_LANGUAGE):
+        # Una sola transacción por lote: rápido y atómico.
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations (source, lang, target) VALUES (?, ?, ?)",
+                [(k, lang, v) for k, v in items.items()]
+            )
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def flush(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+# --- CACHÉ CON CAPA LRU ---
+class TranslationCache:
+    """
+    Se comporta como un diccionario (in, [], get) pero por debajo:
+    - consulta primero una LRU en memoria de tamaño limitado,
+    - y si no está, pregunta al almacén en disco.
+    get_many / put_many reciben el idioma (lang); los accesos tipo diccionario son del idioma de siempre.
+    """
+    def __init__(self, store, max_items=50000):
+        self.store = store
+        self.max_items = max_items
+        self.lru = OrderedDict()
+        # Reentrante: quien ya tenga el lock puede llamar a varios métodos seguidos.
+        self.lock = RLock()
+
+    def _remember(self, key, value):
+        """Mete una entrada en la LRU y expulsa la más antigua si se pasa del tope."""
+        self.lru[key] = value
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.max_items:
+            self.lru.popitem(last=False)
+
+    def get_many(self, keys, lang=DEFAULT_LANGUAGE):
+        """Devuelve {clave: traducción} (al idioma lang) solo para las claves que existen."""
+        with self.lock:
+            found, missing = {}, []
+            for k in dict.fromkeys(keys): # dict.fromkeys quita duplicados manteniendo el orden
+                if (k, lang) in self.lru:
+                    self.lru.move_to_end((k, lang))
+                    found[k] = self.lru[(k, lang)]
+                else:
+                    missing.append(k)
+            if missing:
+                for k, v in self.store.get_many(missing, lang).items():
+                    self._remember((k, lang), v)
+                    found[k] = v
+            return found
+
+    def put_many(self, items, lang=DEFAULT_LANGUAGE):
+        """Guarda varias traducciones (al idioma lang) de golpe (se escriben al disco al momento)."""
+        items = dict(items)
+        if not items: return
+        with self.lock:
+            self.store.put_many(items, lang)
+            for k, v in items.items(): self._remember((k, lang), v)
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def __contains__(self, key):
+        return key in self.get_many([key])
+
+    def __getitem__(self, key):
+        found = self.get_many([key])
+        if key not in found: raise KeyError(key)
+        return found[key]
+
+    def __setitem__(self, key, value):
+        self.put_many({key: value})
+
+    def __len__(self):
+        with self.lock:
+            return self.store.count()
+
+    def flush(self):
+        with self.lock:
+            self.store.flush()
+
+    def close(self):
+        with self.lock:
+            self.store.close()
+
+def open_store(backend, path):
+    """Crea el almacén pedido en la configuración ('sqlite' o 'memory')."""
+    if backend == "memory": return MemoryStore()
+    if backend == "sqlite": return SQLiteStore(path)
+    raise ValueError(f"Backend de caché desconocido: {backend}")
+
+# --- IMPORTADOR DEL FORMATO ANTIGUO ---
+def import_json_cache(json_path, cache, chunk=5000):
+    """
+    Copia el antiguo translation_cache.json dentro de la caché nueva.
+    Devuelve cuántas entradas se importaron.
+    """
+    if not os.path.exists(json_path): return 0
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    items = list(data.items())
+    for i in range(0, len(items), chunk):
+        cache.put_many(dict(items[i : i + chunk]))
+    return len(items)
@@ -1,6 +1,6 @@
 import os
 import logging
-from threading import Lock
+from threading import Lock, RLock
 
 # --- CONFIGURACIÓN GLOBAL ---
 # Aquí definimos las constantes y configuraciones que usa todo el programa.
@@ -9,27 +9,197 @@ from threading import Lock
 BASE_DIR = os.getcwd()
 
 # os.path.join une partes de una ruta de forma segura (funciona en Windows, Linux, Mac).
-# Carpeta temporal para descargas y descompresión.
-WORK_DIR = os.path.join(BASE_DIR, "workspace")
-
 # Carpeta donde se guardarán los subtítulos finales generados.
 OUT_BASE_DIR = os.path.join(BASE_DIR, "subtitle_out")
 
 # Archivo que actúa como "memoria" para no traducir lo mismo dos veces.
+# (Formato antiguo en JSON: se importa automáticamente a la base de datos la primera vez).
 CACHE_FILE = os.path.join(BASE_DIR, "translation_cache.json")
 
+# Base de datos SQLite donde se guarda ahora la caché (se escribe lote a lote).
+CACHE_DB_FILE = os.path.join(BASE_DIR, "translation_cache.sqlite3")
+
+# Tipo de almacén de la caché: "sqlite" (disco) o "memory" (solo RAM, se pierde al salir).
+CACHE_BACKEND = "sqlite"
+
+# Cuántas traducciones recientes se mantienen en RAM como acceso rápido.
+CACHE_MEMORY_ITEMS = 50000
+
+# Modo WAL de SQLite (caché y cola). Va más rápido, pero NO funciona en carpetas de red:
+# si varios equipos comparten la carpeta por NFS/SMB, poner SUBSYNC_SQLITE_WAL=0.
+SQLITE_WAL = os.environ.get("SUBSYNC_SQLITE_WAL", "1") != "0"
+
 # Archivo donde se guardarán los errores y avisos del programa.
 LOG_FILE = os.path.join(BASE_DIR, "subsync.log")
 
 # Archivo que contiene tu clave secreta de Google Gemini.
 API_KEY_FILE = os.path.join(BASE_DIR, "apikey.key")
 
+# --- DESCARGAS ---
+# Web de donde se bajan los subtítulos (se puede apuntar a un servidor local para pruebas).
+TVSUBTITLES_BASE_URL = os.environ.get("SUBSYNC_BASE_URL", "https://www.tvsubtitles.net").rstrip("/")
+# Caché HTTP en disco para búsquedas y ZIP (con revalidación ETag / Last-Modified).
+HTTP_CACHE_ENABLED = True
+HTTP_CACHE_DIR = os.path.join(BASE_DIR, ".http_cache")
+# Tiempo durante el que una respuesta se usa sin preguntar (después se revalida).
+HTTP_CACHE_TTL = 24 * 3600
+# Tiempo durante el que se recuerda un 404 ("esa temporada no existe").
+HTTP_CACHE_NEGATIVE_TTL = 6 * 3600
+HTTP_TIMEOUT = 60
+# Temporadas que se sondean/descargan a la vez (sobre la misma sesión del scraper).
+SEASON_PROBE_WORKERS = 4
+# Los ZIP de temporada se leen en memoria. Si uno pasa de este tamaño,
+# se vuelca a un temporal anónimo del sistema (nunca a una carpeta de trabajo fija).
+ZIP_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+
+# --- TUBERÍA DE TEMPORADAS ---
+# Temporadas ya descargadas esperando turno (cola limitada = memoria plana).
+PIPELINE_QUEUE_SIZE = 1
+# Temporadas que pueden estar traduciéndose/escribiéndose a la vez.
+PIPELINE_MAX_ACTIVE_SEASONS = 2
+# Límite de seguridad por si acaso (nadie tiene 50 temporadas... excepto Los Simpsons)
+MAX_SEASONS = 50
+
+# --- COLA DE TRABAJO (varios procesos / equipos) ---
+# Base de datos con las temporadas pendientes de procesar.
+QUEUE_DB_FILE = os.environ.get("SUBSYNC_QUEUE_DB", os.path.join(BASE_DIR, "subsync_queue.sqlite3"))
+# Segundos que un trabajador "alquila" una temporada (se renueva mientras sigue vivo).
+QUEUE_LEASE_SECONDS = 600
+# Intentos por temporada antes de darla por fallida.
+QUEUE_MAX_ATTEMPTS = 3
+# Cada cuánto mira la cola un trabajador en espera (--wait).
+QUEUE_POLL_SECONDS = 5
+
+# --- REANUDACIÓN ---
+# Manifiesto por serie (dentro de subtitle_out/<Serie>/) con lo que ya está hecho.
+MANIFEST_NAME = ".subsync_manifest.json"
+
+# --- LOTES DE TRADUCCIÓN ---
+# En vez de mandar siempre 50 líneas, llenamos cada petición hasta un
+# "presupuesto" de caracteres (aprox. 4 caracteres = 1 token).
+# Así las líneas cortas ("Hi.", "Yeah.") viajan juntas en lotes grandes
+# y las largas no provocan respuestas enormes que la IA corta o descuadra.
+BATCH_MAX_CHARS = 3000
+BATCH_MAX_LINES = 120
+# Los lotes de una temporada se reparten a partes iguales en "rondas" completas de peticiones
+# simultáneas (que ninguna se quede parada esperando a un lote rezagado), pero sin bajar de este tamaño.
+BATCH_MIN_CHARS = 400
+
+# --- IDIOMAS Y FORMATOS DE SALIDA ---
+# Idiomas a los que se traduce: todos van en la MISMA petición (una columna más por idioma),
+# y la caché guarda cada frase por (frase, idioma).
+# Nombre con el que se le pide cada idioma a la IA (un código que no esté aquí se manda tal cual).
+LANGUAGES = {
+    "es": "Neutral Spanish (Latin American)",
+    "pt": "Brazilian Portuguese",
+    "fr": "French",
+    "it": "Italian",
+    "de": "German",
+}
+# El idioma de siempre: sus duales conservan el nombre de antes (Serie_S01E02_Dual.srt)
+# y las traducciones guardadas antes de haber varios idiomas son suyas.
+DEFAULT_LANGUAGE = "es"
+TARGET_LANGUAGES = tuple(l.strip() for l in os.environ.get("SUBSYNC_LANGS", DEFAULT_LANGUAGE).split(",") if l.strip())
+# Formatos a escribir de cada capítulo: "srt" (dual con <font>), "ass" (con estilos) y "vtt" (WebVTT).
+OUTPUT_FORMATS = tuple(f.strip() for f in os.environ.get("SUBSYNC_FORMATS", "srt").split(",") if f.strip())
+
+# --- ESTIMACIÓN (--dry-run) ---
+# Sin un informe anterior (subsync_report.json) con latencias reales, se suponen estos valores.
+DRY_RUN_CALL_SECONDS = 6.0
+CHARS_PER_TOKEN = 4
+
+# --- LÍMITES DE LA API ---
+# Peticiones simultáneas a la IA si el usuario no dice otra cosa (el "Hilos" del menú).
+DEFAULT_CONCURRENCY = 8
+# Pausa global tras un error 429 (cuota). Se duplica si se repite, hasta el máximo.
+QUOTA_COOLDOWN = 20
+QUOTA_COOLDOWN_MAX = 120
+# Tope opcional de peticiones por minuto (0 = sin tope, solo se frena con los 429).
+MAX_REQUESTS_PER_MINUTE = 0
+# Cuántos 429 seguidos aguantamos en un mismo lote antes de darlo por perdido.
+MAX_QUOTA_RETRIES = 10
+# Intentos de un lote ante errores de red o del servidor (no 429) antes de darlo por perdido.
+# Ese lote no se parte: con el servidor caído, mitades más pequeñas fallarían igual.
+MAX_API_ATTEMPTS = 3
+
+# --- BACKENDS DE TRADUCCIÓN ---
+# Quién traduce: "gemini" (Google) o "http" (un servidor propio/local que hable JSON).
+TRANSLATION_BACKEND = os.environ.get("SUBSYNC_BACKEND", "gemini")
+# Dirección del servidor para el backend "http".
+HTTP_BACKEND_URL = os.environ.get("SUBSYNC_HTTP_BACKEND_URL", "http://127.0.0.1:8765/translate")
+HTTP_BACKEND_TIMEOUT = 120
+# Backend de cobertura (hedging): si el principal tarda más que el percentil indicado
+# de sus latencias, se lanza la misma petición a este otro y gana el más rápido.
+# Vacío = desactivado.
+HEDGE_BACKEND = os.environ.get("SUBSYNC_HEDGE_BACKEND", "")
+HEDGE_PERCENTILE = 0.95
+
+# --- NORMALIZACIÓN DE LA CACHÉ ---
+# Partir las líneas de dos hablantes ("- Hi. - Hey.") y cachear cada parte por separado.
+SPLIT_SPEAKERS = True
+# Partir también frases sueltas ("Hi. How are you?"). Sube los aciertos pero
+# la IA traduce con menos contexto, así que va desactivado por defecto.
+SPLIT_SENTENCES = False
+
+# --- ALINEACIÓN CON SUBTÍTULOS EN ESPAÑOL ---
+# Si la web tiene el ZIP en español de la temporada, se alinean sus tiempos con los del
+# inglés y solo se traduce lo que no encaje (en vez de traducirlo todo).
+ALIGN_ENABLED = True
+# Idioma de ese ZIP: lo emparejado solo sirve para este idioma (el resto se traduce igual).
+ALIGN_LANGUAGE = "es"
+# Procesos para alinear (es cálculo puro: usa varios núcleos).
+ALIGN_WORKERS = max(1, min(4, os.cpu_count() or 1))
+# Resolución de la señal "hay subtítulo / no hay" (ms por muestra).
+ALIGN_RESOLUTION_MS = 50
+# Desfase máximo que se busca (hacia delante o hacia atrás).
+ALIGN_MAX_OFFSET_MS = 120000
+# Relaciones de velocidad a probar (mismo vídeo, 23.976<->25 fps, 24<->25 fps...).
+ALIGN_FRAMERATE_RATIOS = (1.0, 25 / 23.976, 23.976 / 25, 25 / 24, 24 / 25, 24 / 23.976, 23.976 / 24)
+# Puntos de corte a probar (el desfase cambia a mitad de capítulo: anuncios, intro distinta...).
+ALIGN_SPLIT_CANDIDATES = 9
+# Un corte solo se acepta si mejora la coincidencia en este porcentaje.
+ALIGN_SPLIT_GAIN = 0.05
+# Fracción mínima de la voz en inglés que debe cubrir el español para fiarse de la alineación.
+ALIGN_MIN_SCORE = 0.5
+# Fracción mínima de una frase inglesa tapada por las españolas para emparejarlas.
+ALIGN_MIN_COVERAGE = 0.5
+
+# --- DEMONIO (--serve / --watch) ---
+# API HTTP local (solo escucha en esta máquina salvo que se cambie el host).
+DAEMON_HOST = os.environ.get("SUBSYNC_DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.environ.get("SUBSYNC_DAEMON_PORT", "8790"))
+# Duales de los .srt subidos por la API (una carpeta por huella del archivo: repetir es gratis).
+DAEMON_UPLOAD_DIR = os.path.join(OUT_BASE_DIR, "_uploads")
+# Tamaño máximo de un .srt subido.
+DAEMON_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Cada cuántos segundos se revisan las carpetas vigiladas (--watch).
+WATCH_INTERVAL = 10
+
+# --- PRECALENTADO DE LA CACHÉ (--warm-cache) ---
+# Procesos para leer duales y pares EN/ES ya existentes y cargarlos en la caché.
+WARMUP_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+# --- PROGRESO ---
+# Capítulos "en curso" que se muestran a la vez (el resto se resume en "y N más").
+PROGRESS_TOP_EPISODES = 6
+# Máximo de repintados por segundo de la interfaz (los hilos nunca esperan por ella).
+PROGRESS_MAX_FPS = 4
+
+# --- MÉTRICAS ---
+# Informe de la ejecución (tiempos por etapa, coste de la API, aciertos de caché).
+REPORT_FILE = os.path.join(BASE_DIR, "subsync_report.json")
+# Si se indica, también se exportan las métricas para Prometheus (textfile collector).
+PROMETHEUS_TEXTFILE = os.environ.get("SUBSYNC_PROM_TEXTFILE", "")
+
 # --- CONFIGURACIÓN DE LOGS ---
 # Esto configura el sistema de registro de Python.
 # filename: dónde se guarda.
 # level: qué importancia mínima registrar (INFO = información general).
 # format: cómo se ve cada línea (fecha + mensaje).
-logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s %(message)s', filemode='w')
+# filemode: "w" empieza el log de cero en cada ejecución. Los trabajadores (--workers) lo abren
+# con "a" (SUBSYNC_LOG_MODE=a): si no, cada uno que arranca borraría lo que escriben los demás.
+LOG_FILEMODE = os.environ.get("SUBSYNC_LOG_MODE", "w")
+logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format='%(asctime)s %(message)s', filemode=LOG_FILEMODE)
 
 # Creamos un objeto 'logger' que usaremos para escribir en el log.
 logger = logging.getLogger()
@@ -37,7 +207,7 @@ logger = logging.getLogger()
 # --- CERROJOS (LOCKS) ---
 # Los locks sirven para evitar que dos hilos (procesos paralelos) escriban
 # en el mismo archivo o variable memoria a la vez y lo corrompan.
-cache_lock = Lock() # Protege el archivo de caché
+cache_lock = RLock() # Protege la caché (reentrante: se puede volver a pedir desde el mismo hilo)
 api_lock = Lock()   # Protege llamadas a la API (si fuera necesario limitar)
 
 # Función para leer la API Key desde el archivo
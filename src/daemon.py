@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# Importaciones propias
+from src.config import (DAEMON_HOST, DAEMON_PORT, DAEMON_UPLOAD_DIR, DAEMON_MAX_UPLOAD_BYTES, WATCH_INTERVAL,
+                        MAX_SEASONS, TARGET_LANGUAGES, OUTPUT_FORMATS, logger)
+from src.utils import search_series, clean_series_name, get_cache, save_cache
+from src.subtitle import load_episode, process_episode, output_variant
+from src.planner import collect_pending_lines, pack_batches, submit_batches
+from src.manifest import content_hash
+from src.normalize import cache_key, CACHE_STATS
+from src.metrics import METRICS
+
+# --- MODO DEMONIO ---
+# Cada main.py paga el arranque, la sesión del scraper, el motor y abrir la caché, y luego pregunta
+# con menús. Para usarlo desde el servidor multimedia, el demonio lo mantiene todo vivo y atiende:
+#   POST /translate?name=X.srt[&series=Serie]  cuerpo = el .srt en inglés -> responde el dual
+#                                              (primer idioma y formato; el resto queda junto a él en disco)
+#   POST /series  {"series": "Friends", "seasons": "1,2" | "n", "pick": 1} -> trabajos de temporada
+#   GET  /jobs, /jobs/<id>                      estado de los trabajos
+#   GET  /health, /stats                        vivo / métricas de la ejecución
+# Con --watch, además revisa carpetas y monta el dual de cada .srt nuevo que aparezca.
+# Peticiones repetidas no se repiten: el mismo archivo (misma huella) o la misma temporada en
+# marcha se espera en vez de lanzarse otra vez, y las frases ya en vuelo no se piden dos veces.
+
+# Tipo de la respuesta de /translate según el formato del dual.
+CONTENT_TYPES = {".srt": "application/x-subrip", ".ass": "text/x-ssa", ".vtt": "text/vtt"}
+
+class Coalescer:
+    """Si llega una petición igual a otra que está en marcha, espera su resultado en vez de repetirla."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {} # {clave: Future}
+
+    def run(self, key, fn):
+        with self.lock:
+            fut = self.inflight.get(key)
+            owner = fut is None
+            if owner: fut = self.inflight[key] = Future()
+        if not owner:
+            METRICS.count("daemon_coalesced")
+            return fut.result()
+        try:
+            fut.set_result(fn())
+        except Exception as e:
+            fut.set_exception(e)
+        finally:
+            with self.lock: del self.inflight[key]
+        return fut.result()
+
+class DaemonJob:
+    """Una temporada pedida por la API (se procesan de una en una, en orden de llegada)."""
+    def __init__(self, job_id, series, season):
+        self.id = job_id
+        self.series = series
+        self.season = season
+        self.state = "pending" # pending -> running -> done / failed
+        self.error = None
+        self.updated = time.time()
+
+    def as_dict(self):
+        return {"id": self.id, "series": self.series, "season": self.season, "state": self.state,
+                "error": self.error, "updated": self.updated}
+
+class Daemon:
+    def __init__(self, engine, events, threads, host=DAEMON_HOST, port=DAEMON_PORT, watch_dirs=(),
+                 langs=TARGET_LANGUAGES, formats=OUTPUT_FORMATS):
+        self.engine = engine
+        self.events = events
+        self.threads = threads
+        self.langs, self.formats = tuple(langs), tuple(formats)
+        self.host, self.port = host, port
+        self.watch_dirs = list(watch_dirs)
+        self.started = time.time()
+        self.coalescer = Coalescer()
+        self.lock = threading.Lock()
+        self.inflight = {} # {clave normalizada: future}: frases que ya pidió otra petición
+        self.jobs = {}     # {id: DaemonJob}
+        self.open_jobs = {} # {(serie, temporada): DaemonJob} pendientes o en marcha
+        self.job_queue = queue.Queue()
+        self.stop = threading.Event()
+
+    # --- TRADUCCIÓN DE UN CAPÍTULO SUELTO ---
+    def _translate(self, episodes):
+        """Traduce lo que falte de estos capítulos y devuelve {idioma: {clave normalizada: traducción}}."""
+        pending = collect_pending_lines(episodes, self.langs)
+        with self.lock:
+            # Igual que en la tubería: lo que ya pidió otra petición no se vuelve a pedir.
+            borrowed = {self.inflight[cache_key(t)] for t in pending if cache_key(t) in self.inflight}
+            own = submit_batches(self.engine, pack_batches([t for t in pending if cache_key(t) not in self.inflight],
+                                                           workers=self.threads), self.langs)
+            for fut, batch in own.items():
+                for t in batch: self.inflight[cache_key(t)] = fut
+        translations = {}
+        try:
+            for fut, batch in own.items():
+                for lang, texts in fut.result().items():
+                    translations.setdefault(lang, {}).update(zip(map(cache_key, batch), texts))
+            for fut in borrowed: fut.result() # Sus frases ya están en la caché al terminar
+        finally:
+            with self.lock:
+                for fut, batch in own.items():
+                    for t in batch:
+                        if self.inflight.get(cache_key(t)) is fut: del self.inflight[cache_key(t)]
+        return translations
+
+    def primary_output(self, out_path):
+        """El archivo que se devuelve de un dual (X_Dual.srt): el del primer idioma y formato."""
+        return output_variant(out_path, self.langs[0], self.formats[0])
+
+    def dual_for_file(self, name, data, out_path, series="Upload"):
+        """
+        Monta los duales (idiomas y formatos del demonio) de un subtítulo en inglés (bytes) junto a out_path.
+        Devuelve la ruta del principal o lanza ValueError.
+        """
+        ep = load_episode(name, data)
+        if not ep or not any(ep["lines"]): raise ValueError(f"No se pudo leer {name}")
+        translations = self._translate([ep])
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        written = process_episode(ep, os.path.dirname(out_path), series, translations, self.events, None, out_path,
+                                  langs=self.langs, formats=self.formats)
+        if not written: raise ValueError(f"No se pudo montar el dual de {name}")
+        save_cache()
+        return written
+
+    def translate_upload(self, name, data, series="Upload"):
+        """Dual de un .srt subido. El mismo archivo otra vez (o a la vez) no cuesta nada."""
+        digest = content_hash(data)
+        out_path = os.path.join(DAEMON_UPLOAD_DIR, digest[:16], os.path.splitext(os.path.basename(name))[0] + "_Dual.srt")
+        if os.path.exists(self.primary_output(out_path)):
+            METRICS.count("daemon_upload_hits")
+            return self.primary_output(out_path)
+        return self.coalescer.run(("file", out_path), lambda: self.dual_for_file(name, data, out_path, series))
+
+    # --- TEMPORADAS COMPLETAS ---
+    def submit_series(self, query, seasons=None, pick=1):
+        """
+        Apunta temporadas de una serie (None = todas las que existan).
+        Las que ya están pendientes o en marcha no se duplican: se devuelve el trabajo existente.
+        """
+        results = search_series(query)
+        if not results or not 1 <= pick <= len(results): raise LookupError(f"Sin resultados para '{query}'")
+        series = clean_series_name(results[pick - 1]["display"])
+        if seasons is None:
+            from src.worker import discover_seasons
+            seasons = discover_seasons(series, MAX_SEASONS)
+        out = []
+        with self.lock:
+            for s_num in seasons:
+                job = self.open_jobs.get((series, s_num))
+                if job is None:
+                    job = DaemonJob(len(self.jobs) + 1, series, s_num)
+                    self.jobs[job.id] = self.open_jobs[(series, s_num)] = job
+                    self.job_queue.put(job)
+                else:
+                    METRICS.count("daemon_coalesced")
+                out.append(job.as_dict())
+        return out
+
+    def _job_loop(self):
+        from src.pipeline import SeasonPipeline
+        while not self.stop.is_set():
+            try: job = self.job_queue.get(timeout=1)
+            except queue.Empty: continue
+            job.state, job.updated = "running", time.time()
+            try:
+                done = SeasonPipeline(self.engine, job.series, [job.season], self.threads, self.events,
+                                      langs=self.langs, formats=self.formats).run()
+                job.state = "done" if job.season in done else "failed"
+                if job.state == "failed": job.error = "temporada no disponible o sin terminar"
+            except Exception as e:
+                logger.error(f"Error en {job.series} T{job.season}: {e}")
+                job.state, job.error = "failed", str(e)
+            job.updated = time.time()
+            with self.lock: self.open_jobs.pop((job.series, job.season), None)
+            self.events.emit("job_done" if job.state == "done" else "job_failed", **job.as_dict())
+
+    # --- CARPETAS VIGILADAS ---
+    @staticmethod
+    def _wants_dual(name):
+        """Subtítulos en inglés de la biblioteca (ni duales ya hechos, en ningún idioma, ni los que están en español)."""
+        low = name.lower()
+        return low.endswith((".srt", ".sub")) and "_dual." not in low and \
+            not any(f".{tag}." in low for tag in ("es", "spa", "spanish"))
+
+    def _watch_loop(self):
+        sizes = {}    # {ruta: (tamaño, fecha)} de la vuelta anterior: se procesa cuando deja de cambiar
+        failed = {}   # {ruta: (tamaño, fecha)} que fallaron (no se reintentan hasta que cambien)
+        while True:
+            for root_dir in self.watch_dirs:
+                for folder, _, files in os.walk(root_dir):
+                    for name in files:
+                        if not self._wants_dual(name): continue
+                        path = os.path.join(folder, name)
+                        out_path = re.sub(r"\.(en|eng|english)$", "", os.path.splitext(path)[0], flags=re.I) + "_Dual.srt"
+                        try:
+                            st = os.stat(path)
+                            done = self.primary_output(out_path)
+                            if os.path.exists(done) and os.stat(done).st_mtime >= st.st_mtime: continue
+                        except OSError:
+                            continue
+                        sig = (st.st_size, st.st_mtime)
+                        # Si aún se está copiando (cambió desde la última vuelta), esperamos a la siguiente.
+                        if sizes.get(path) != sig or failed.get(path) == sig:
+                            sizes[path] = sig
+                            continue
+                        try:
+                            with open(path, "rb") as f: data = f.read()
+                            self.coalescer.run(("file", out_path), lambda: self.dual_for_file(name, data, out_path))
+                            self.events.log(f"Vigilancia: {out_path}", "success")
+                        except Exception as e:
+                            failed[path] = sig
+                            self.events.log(f"Vigilancia: no se pudo procesar {path}: {e}", "error")
+            if self.stop.wait(WATCH_INTERVAL): return
+
+    # --- API HTTP ---
+    def stats(self):
+        report = METRICS.report(extra={"cache": CACHE_STATS.as_dict()})
+        with self.lock:
+            report["jobs"] = {state: sum(1 for j in self.jobs.values() if j.state == state)
+                              for state in ("pending", "running", "done", "failed")}
+        return report
+
+    def make_handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logger.info("API " + fmt % args)
+
+            def reply(self, status, body, content_type="application/json; charset=utf-8"):
+                if not isinstance(body, bytes): body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > DAEMON_MAX_UPLOAD_BYTES: raise ValueError("Archivo demasiado grande")
+                return self.rfile.read(length)
+
+            def do_GET(self):
+                path = urlparse(self.path).path.rstrip("/")
+                if path == "/health":
+                    return self.reply(200, {"ok": True, "uptime_s": round(time.time() - daemon.started, 1),
+                                            "cache": len(get_cache())})
+                if path == "/stats": return self.reply(200, daemon.stats())
+                if path == "/jobs":
+                    with daemon.lock: return self.reply(200, [j.as_dict() for j in daemon.jobs.values()])
+                if path.startswith("/jobs/") and path[6:].isdigit():
+                    job = daemon.jobs.get(int(path[6:]))
+                    if job: return self.reply(200, job.as_dict())
+                self.reply(404, {"error": "no encontrado"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    if url.path == "/translate":
+                        name = params.get("name", "upload.srt")
+                        out_path = daemon.translate_upload(name, self.body(), params.get("series", "Upload"))
+                        with open(out_path, "rb") as f:
+                            content_type = CONTENT_TYPES.get(os.path.splitext(out_path)[1], "text/plain")
+                            return self.reply(200, f.read(), f"{content_type}; charset=utf-8")
+                    if url.path == "/series":
+                        req = json.loads(self.body() or b"{}")
+                        seasons = str(req.get("seasons", "n"))
+                        seasons = None if seasons.lower() in ("n", "all", "1-n") else \
+                            [int(x) for x in seasons.split(",") if x.strip().isdigit()]
+                        return self.reply(202, daemon.submit_series(req["series"], seasons, int(req.get("pick", 1))))
+                    self.reply(404, {"error": "no encontrado"})
+                except (ValueError, KeyError, LookupError) as e:
+                    self.reply(400, {"error": str(e)})
+                except Exception as e:
+                    logger.error(f"Error en la API: {e}")
+                    self.reply(500, {"error": str(e)})
+
+        return Handler
+
+    def serve(self, on_tick=None, tick=0.25):
+        """Arranca la API, el procesador de temporadas y la vigilancia. Bloquea hasta Ctrl+C."""
+        get_cache() # La caché se abre ya, no en la primera petición
+        server = ThreadingHTTPServer((self.host, self.port), self.make_handler())
+        server.daemon_threads = True
+        threads = [threading.Thread(target=server.serve_forever, name="daemon-api", daemon=True),
+                   threading.Thread(target=self._job_loop, name="daemon-jobs", daemon=True)]
+        if self.watch_dirs: threads.append(threading.Thread(target=self._watch_loop, name="daemon-watch", daemon=True))
+        for t in threads: t.start()
+        self.events.emit("daemon_started", host=self.host, port=server.server_address[1], watch=self.watch_dirs)
+        try:
+            while True:
+                (on_tick or (lambda: None))()
+                time.sleep(tick)
+        finally:
+            self.stop.set()
+            server.shutdown()
+            save_cache()
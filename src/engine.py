@@ -0,0 +1,147 @@
+import asyncio
+import time
+from threading import Thread, Lock
+
+# Importaciones propias
+from src.config import (DEFAULT_CONCURRENCY, QUOTA_COOLDOWN, QUOTA_COOLDOWN_MAX, MAX_REQUESTS_PER_MINUTE,
+                        TARGET_LANGUAGES, logger)
+
+# --- LIMITADOR ADAPTATIVO (AIMD) ---
+# AIMD = "Additive Increase, Multiplicative Decrease" (lo mismo que hace TCP):
+#   - Cada petición que sale bien sube un poquito el límite de peticiones simultáneas.
+#   - Un 429 (cuota superada) lo parte por la mitad y pausa a TODOS a la vez.
+# Así no hay 8 hilos durmiendo 20s cada uno por su cuenta y luego volviendo en estampida.
+class AdaptiveLimiter:
+    def __init__(self, target, min_limit=1, cooldown=QUOTA_COOLDOWN, max_cooldown=QUOTA_COOLDOWN_MAX, rpm=MAX_REQUESTS_PER_MINUTE):
+        # target: el número de "Hilos" que pidió el usuario, ahora es el máximo de peticiones en vuelo.
+        self.target = max(1, target)
+        self.min_limit = min_limit
+        self.limit = float(self.target)
+        self.in_flight = 0
+        # Pausa global tras un 429 (crece si se repiten seguidos).
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.paused_until = 0.0
+        # Cada bajada abre una "época": los 429 de peticiones que salieron antes son del mismo
+        # atasco y no vuelven a bajar el límite ni a alargar la pausa.
+        self.epoch = 0
+        # Cubo de fichas opcional: como mucho 'rpm' peticiones por minuto (0 = sin tope).
+        self.rpm = rpm
+        self.tokens = float(rpm)
+        self.last_refill = time.monotonic()
+        self.cond = asyncio.Condition()
+
+    def _refill(self):
+        """Rellena el cubo de fichas según el tiempo pasado."""
+        now = time.monotonic()
+        self.tokens = min(self.rpm, self.tokens + (now - self.last_refill) * self.rpm / 60)
+        self.last_refill = now
+
+    def _wait_time(self):
+        """Segundos que hay que esperar antes de poder lanzar otra petición (0 = ya)."""
+        wait = self.paused_until - time.monotonic()
+        if self.rpm:
+            self._refill()
+            if self.tokens < 1:
+                wait = max(wait, (1 - self.tokens) * 60 / self.rpm)
+        return max(0.0, wait)
+
+    async def acquire(self):
+        """Espera turno: respeta la pausa global, el cubo de fichas y el límite AIMD."""
+        async with self.cond:
+            while True:
+                wait = self._wait_time()
+                if wait > 0:
+                    # wait_for con timeout: despertamos al acabar la pausa o si alguien avisa antes.
+                    try: await asyncio.wait_for(self.cond.wait(), timeout=wait)
+                    except asyncio.TimeoutError: pass
+                    continue
+                if self.in_flight < int(self.limit):
+                    break
+                await self.cond.wait()
+            self.in_flight += 1
+            if self.rpm: self.tokens -= 1
+            return self.epoch
+
+    async def release(self, throttled=False, epoch=None):
+        """Devuelve el turno e informa de cómo fue la petición (epoch: la que devolvió acquire)."""
+        async with self.cond:
+            self.in_flight -= 1
+            if throttled and epoch is not None and epoch != self.epoch:
+                # 429 de una petición lanzada antes de la última bajada: ese atasco ya se contó.
+                pass
+            elif throttled:
+                # Bajada multiplicativa + pausa global para todos (una vez por atasco).
+                self.epoch += 1
+                self.limit = max(self.min_limit, self.limit / 2)
+                self.paused_until = max(self.paused_until, time.monotonic() + self.cooldown)
+                logger.warning(f"Quota limit (429). Límite -> {int(self.limit)} en vuelo, pausa global de {self.cooldown:.0f}s")
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            else:
+                # Subida aditiva: +1 en el límite por cada "ronda" completa de éxitos.
+                self.limit = min(self.target, self.limit + 1 / self.limit)
+                self.cooldown = self.base_cooldown
+            self.cond.notify_all()
+
+    def slot(self):
+        """Uso: async with limiter.slot() as s: ... ; s.throttled = True si hubo 429."""
+        return _LimiterSlot(self)
+
+class _LimiterSlot:
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.throttled = False
+        self.epoch = None
+
+    async def __aenter__(self):
+        self.epoch = await self.limiter.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.limiter.release(throttled=self.throttled, epoch=self.epoch)
+
+# --- MOTOR DE TRADUCCIÓN ---
+# Un bucle asyncio vive en su propio hilo durante toda la ejecución.
+# Cualquier hilo puede mandarle lotes con submit() y recibe un Future normal.
+class TranslationEngine:
+    def __init__(self, concurrency):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="translation-engine", daemon=True)
+        self.thread.start()
+        # El limitador se crea dentro del bucle para que sus primitivas asyncio sean de él.
+        self.limiter = asyncio.run_coroutine_threadsafe(self._make_limiter(concurrency), self.loop).result()
+
+    async def _make_limiter(self, concurrency):
+        return AdaptiveLimiter(concurrency)
+
+    def submit(self, lines, langs=TARGET_LANGUAGES):
+        """Encola un lote y devuelve un concurrent.futures.Future con {idioma: lista traducida}."""
+        # Importación diferida: src.api también usa el motor (evita importación circular).
+        from src.api import translate_batch_async
+        return asyncio.run_coroutine_threadsafe(translate_batch_async(lines, self.limiter, langs), self.loop)
+
+    def set_concurrency(self, concurrency):
+        """Cambia el objetivo de peticiones simultáneas (el número de 'Hilos')."""
+        def _apply():
+            self.limiter.target = max(1, concurrency)
+            self.limiter.limit = min(self.limiter.limit, self.limiter.target)
+        self.loop.call_soon_threadsafe(_apply)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+# Motor compartido por todo el programa (se crea la primera vez que se pide).
+_engine = None
+_engine_lock = Lock()
+
+def get_engine(concurrency=None):
+    """Devuelve el motor global; si se indica concurrencia, la ajusta."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = TranslationEngine(concurrency or DEFAULT_CONCURRENCY)
+        elif concurrency:
+            _engine.set_concurrency(concurrency)
+        return _engine
@@ -0,0 +1,131 @@
+import json
+import heapq
+
+# Importaciones propias
+from src.config import (REPORT_FILE, MAX_REQUESTS_PER_MINUTE, DRY_RUN_CALL_SECONDS, CHARS_PER_TOKEN,
+                        TARGET_LANGUAGES, ALIGN_LANGUAGE)
+from src.pipeline import SeasonPipeline
+from src.planner import pack_batches, longest_first
+from src.api import resolve_from_cache
+
+# --- ESTIMACIÓN SIN TRADUCIR (--dry-run) ---
+# Antes de lanzar 10 temporadas conviene saber cuánto hay ya en caché y cuánto va a costar.
+# Se usa la misma tubería (descarga, lectura, capítulos ya terminados, alineación con el español),
+# pero en vez de mandar los lotes al motor, se cuentan: frases sin caché, peticiones que saldrían
+# (pack_batches, igual que en la ejecución real), tokens y tiempo.
+# El tiempo se calcula repartiendo los lotes entre las peticiones simultáneas, con la latencia
+# de la última ejecución (subsync_report.json) si la hay.
+
+class LatencyModel:
+    """Cuánto tarda y cuánto cuesta una petición (por defecto, o según un informe anterior)."""
+    def __init__(self, call_s=DRY_RUN_CALL_SECONDS, chars_per_call=None,
+                 tokens_in_per_char=1 / CHARS_PER_TOKEN, tokens_out_per_char=1 / CHARS_PER_TOKEN, source=None):
+        self.call_s = call_s
+        self.chars_per_call = chars_per_call # Tamaño medio de las peticiones medidas
+        self.tokens_in_per_char = tokens_in_per_char
+        self.tokens_out_per_char = tokens_out_per_char
+        self.source = source
+
+    @classmethod
+    def from_report(cls, path=REPORT_FILE):
+        """Latencia mediana y tokens por carácter de la última ejecución con peticiones a la API."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        stage, api = report.get("stages", {}).get("api_call"), report.get("api")
+        if not stage or not api or not api.get("chars_in"): return cls()
+        chars = api["chars_in"]
+        # Si el backend no devuelve tokens (0), nos quedamos con la aproximación por caracteres.
+        return cls(call_s=stage["p50_s"], chars_per_call=chars / api["calls"],
+                   tokens_in_per_char=api["tokens_in"] / chars or 1 / CHARS_PER_TOKEN,
+                   tokens_out_per_char=api["tokens_out"] / chars or 1 / CHARS_PER_TOKEN, source=path)
+
+    def batch_seconds(self, chars):
+        """Duración de un lote: la mediana medida, escalada por su tamaño frente al medio."""
+        if not self.chars_per_call: return self.call_s
+        return self.call_s * max(0.25, chars / self.chars_per_call)
+
+def simulate_wall(durations, concurrency, rpm=MAX_REQUESTS_PER_MINUTE):
+    """
+    Tiempo total si los lotes (en orden) se reparten entre 'concurrency' peticiones simultáneas:
+    cada lote entra en el primer hueco que quede libre, como en el motor.
+    """
+    if not durations: return 0.0
+    slots = [0.0] * max(1, concurrency)
+    for d in durations:
+        heapq.heappush(slots, heapq.heappop(slots) + d)
+    wall = max(slots)
+    if rpm: wall = max(wall, len(durations) / rpm * 60) # Con tope por minuto, puede mandar él
+    return wall
+
+class DryRunPipeline(SeasonPipeline):
+    """La tubería de siempre, pero cada temporada se estima en vez de traducirse y escribirse."""
+    dry_run = True # Ni carpetas ni manifiesto nuevos: solo se mira lo que ya hay
+
+    def __init__(self, series_name, seasons, concurrency, events, model=None, langs=TARGET_LANGUAGES):
+        super().__init__(None, series_name, seasons, 1, events, langs=langs)
+        self.concurrency = concurrency
+        self.model = model or LatencyModel.from_report()
+        self.planned = set()  # Claves que ya pediría una temporada anterior (entonces estarán en caché)
+        self.durations = []   # Duración estimada de todos los lotes, en el orden en que saldrían
+        self.estimates = []   # Una entrada por temporada
+
+    def _cost(self, cores, n=1):
+        """Peticiones, caracteres, tokens y tiempo de traducir estas frases (ya normalizadas) a n idiomas."""
+        batches = longest_first(pack_batches(cores, workers=self.concurrency)) # Igual que la tubería
+        chars = [sum(len(t) for t in b) for b in batches]
+        # Cada idioma es una lista más en la misma respuesta: crece la salida (y lo que tarda), no las peticiones.
+        durations = [self.model.batch_seconds(c * n) for c in chars]
+        return {
+            "new_lines": len(cores), "batches": len(batches), "chars": sum(chars),
+            "tokens_in": round(sum(chars) * self.model.tokens_in_per_char),
+            "tokens_out": round(sum(chars) * n * self.model.tokens_out_per_char),
+            "wall_s": round(simulate_wall(durations, self.concurrency), 1),
+        }, durations
+
+    def _start_season(self, s_num, members, es_members=()):
+        episodes, skipped = self._load_season(s_num, members, es_members)
+        rows, season_missing, season_langs = [], {}, set()
+        for ep in episodes:
+            aligned = ep.get("aligned", {})
+            # Como en el planificador: una frase que falte en algún idioma se pide en los idiomas que falten.
+            missing, uncached, langs = {}, set(), set()
+            for lang in self.langs:
+                lines = [t for i, t in enumerate(ep["lines"]) if t and (lang != ALIGN_LANGUAGE or i not in aligned)]
+                resolved, lang_missing = resolve_from_cache(lines, lang=lang)
+                uncached.update(t for t in lines if t not in resolved)
+                if any(k not in self.planned for k in lang_missing): langs.add(lang)
+                for k, core in lang_missing.items(): missing.setdefault(k, core)
+            new = {k: core for k, core in missing.items() if k not in self.planned}
+            season_langs |= langs
+            cost, _ = self._cost(list(new.values()), len(langs)) # Como si el capítulo se tradujera solo
+            rows.append({"episode": ep["file"], "lines": sum(1 for t in ep["lines"] if t), "aligned": len(aligned),
+                         "uncached": len(uncached), **cost})
+            for k, core in new.items(): season_missing.setdefault(k, core)
+
+        # La temporada de verdad pide cada frase una sola vez (planificador de temporada).
+        cost, durations = self._cost(list(season_missing.values()), len(season_langs))
+        self.planned.update(season_missing)
+        self.durations.extend(durations)
+        estimate = {"season": s_num, "episodes": rows, "skipped": skipped,
+                    "lines": sum(r["lines"] for r in rows), "aligned": sum(r["aligned"] for r in rows),
+                    "uncached": sum(r["uncached"] for r in rows), **cost}
+        self.estimates.append(estimate)
+        self.events.emit("estimate_season", **estimate)
+        self.active.release() # No hay nada que esperar: la siguiente temporada puede entrar ya
+
+    def estimate(self, on_tick=None, tick=0.2):
+        """Recorre las temporadas y devuelve el resumen {series, concurrency, latency, seasons, totals}."""
+        self.run(on_tick=on_tick, tick=tick)
+        seasons = sorted(self.estimates, key=lambda e: e["season"])
+        totals = {k: sum(e[k] for e in seasons)
+                  for k in ("lines", "aligned", "uncached", "new_lines", "batches", "chars", "tokens_in", "tokens_out")}
+        # Las temporadas se solapan en la tubería y comparten motor: el total no es la suma de tiempos.
+        totals["wall_s"] = round(simulate_wall(self.durations, self.concurrency), 1)
+        return {
+            "series": self.series_name, "concurrency": self.concurrency, "langs": list(self.langs),
+            "latency": {"call_s": round(self.model.call_s, 3), "source": self.model.source or "por defecto"},
+            "seasons": seasons, "totals": totals,
+        }
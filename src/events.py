@@ -0,0 +1,64 @@
+import sys
+import json
+import time
+import queue
+
+# --- EVENTOS DE PROGRESO ---
+# Antes cada hilo tocaba directamente la interfaz (barras de Rich, lista de logs con lock)
+# y el hilo principal la reconstruía entera cada 0.2 s, compitiendo con los trabajadores.
+# Ahora los trabajadores solo PUBLICAN eventos en una cola (meter un dict, sin locks propios)
+# y quien pinta (la interfaz Rich o el modo sin pantalla en JSON) los recoge a su ritmo.
+#
+# Eventos (todos llevan "event" y "ts"):
+#   season_started    season, episodes, lines, new_lines, batches, total
+#   batch_done        season, lines, errors
+#   season_translated season
+#   episode_started   season, episode
+#   episode_done      season, episode, output (el principal), outputs (todos: idiomas x formatos)
+#   episode_failed    season, episode, error
+#   season_done       season
+#   log               level ("debug", "info", "success", "warning", "error"), msg
+#   run_done          seasons, cache (y lo que añada quien cierre la ejecución)
+#   interrupted       (Ctrl+C: se guarda el progreso y se sale)
+#   estimate_season   season, episodes (detalle por capítulo), lines, uncached, new_lines, batches, tokens... (--dry-run)
+#   estimate_done     totals, latency, concurrency (--dry-run)
+#   daemon_started    host, port, watch (--serve)
+#   job_done / job_failed  id, series, season, state, error (temporadas pedidas al demonio)
+#   job_lost          worker, series, season (--worker: el alquiler caducó, la temporada no se marca)
+
+class ProgressEvents:
+    def __init__(self):
+        # SimpleQueue: put() no se bloquea nunca y es seguro entre hilos.
+        self.queue = queue.SimpleQueue()
+
+    def emit(self, event, **fields):
+        """Publica un evento (se puede llamar desde cualquier hilo)."""
+        self.queue.put({"event": event, "ts": round(time.time(), 3), **fields})
+
+    def log(self, msg, level="info"):
+        """Mensaje para el panel de logs (o una línea "log" en modo JSON)."""
+        self.emit("log", level=level, msg=msg)
+
+    def drain(self, limit=10000):
+        """Saca los eventos pendientes (como mucho 'limit' de golpe)."""
+        out = []
+        try:
+            while len(out) < limit:
+                out.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return out
+
+# --- MODO SIN PANTALLA (cron, automatizaciones) ---
+class JsonRenderer:
+    """Escribe cada evento como una línea JSON (NDJSON) en la salida indicada."""
+    def __init__(self, events, stream=None):
+        self.events = events
+        self.stream = stream or sys.stdout
+
+    def pump(self):
+        batch = self.events.drain()
+        for ev in batch:
+            self.stream.write(json.dumps(ev, ensure_ascii=False) + "\n")
+        if batch: self.stream.flush()
+        return bool(batch)
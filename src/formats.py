@@ -0,0 +1,95 @@
+import re
+
+# Importaciones propias
+from src.srt import render_srt, format_time
+
+# --- FORMATOS DE SALIDA DEL DUAL ---
+# Del mismo capítulo ya leído (una sola pasada de lectura) y de sus traducciones se puede
+# escribir el dual en varios formatos. En todos: original arriba en amarillo, traducción debajo.
+#   "srt": el de siempre, con <font color> (lo entiende casi cualquier reproductor).
+#   "ass": Advanced SubStation, con dos estilos (Original y Traduccion) que se pueden retocar en el reproductor.
+#   "vtt": WebVTT (navegadores, Jellyfin/Plex web), con el color en un bloque STYLE.
+
+# Extensión de cada formato.
+FORMATS = {"srt": "srt", "ass": "ass", "vtt": "vtt"}
+
+# Etiquetas HTML de las líneas (<i>, <font>...): cada formato se queda con las que entiende.
+_TAG_RE = re.compile(r"</?([a-zA-Z]+)[^>]*>")
+_AMP_RE = re.compile(r"&(?!#?\w+;)")
+
+# --- SRT ---
+def render_dual_srt(track, originals, translations):
+    """Dual SRT: "<font color='#ffff00'>Original</font>\\nTraducción"."""
+    texts = [f"<font color='#ffff00'>{o}</font>\n{t}" if o else "" for o, t in zip(originals, translations)]
+    return render_srt(track, texts)
+
+# --- WEBVTT ---
+VTT_HEADER = """WEBVTT
+
+STYLE
+::cue(.original) { color: #ffff00; }
+"""
+
+def _vtt_text(text):
+    """WebVTT: se quedan <i>, <b> y <u>; los '&' sueltos se escapan."""
+    text = _TAG_RE.sub(lambda m: m.group(0) if m.group(1).lower() in ("i", "b", "u") else "", text)
+    return _AMP_RE.sub("&amp;", text)
+
+def render_dual_vtt(track, originals, translations):
+    """Dual WebVTT: el original va en una clase "original" (amarilla por el bloque STYLE)."""
+    out = [VTT_HEADER]
+    for start, end, original, translation in zip(track.starts, track.ends, originals, translations):
+        if not original: continue
+        out.append(f"{format_time(start).replace(',', '.')} --> {format_time(end).replace(',', '.')}\n"
+                   f"<c.original>{_vtt_text(original)}</c>\n{_vtt_text(translation)}\n")
+    return "\n".join(out)
+
+# --- ASS ---
+# Colores en &HAABBGGRR (amarillo = &H0000FFFF). El original más pequeño, encima de la traducción.
+ASS_HEADER = """[Script Info]
+; Generado por SubSync Dual
+ScriptType: v4.00+
+PlayResX: 384
+PlayResY: 288
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Traduccion,Arial,18,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,1.5,0.5,2,10,10,12,1
+Style: Original,Arial,15,&H0000FFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,1.5,0.5,2,10,10,12,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+def _ass_time(ms):
+    """Milisegundos -> "H:MM:SS.cc" (centésimas)."""
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h}:{m:02d}:{s:02d}.{ms // 10:02d}"
+
+def _ass_text(text):
+    """Etiquetas <i>/<b>/<u> -> {\\i1}...{\\i0}; las demás fuera; saltos de línea -> \\N."""
+    def tag(m):
+        name = m.group(1).lower()
+        if name not in ("i", "b", "u"): return ""
+        return f"{{\\{name}{0 if m.group(0).startswith('</') else 1}}}"
+    return _TAG_RE.sub(tag, text).replace("\n", "\\N")
+
+def render_dual_ass(track, originals, translations):
+    """Dual ASS: una línea por frase, el original con el estilo Original y la traducción con el suyo."""
+    out = [ASS_HEADER]
+    for start, end, original, translation in zip(track.starts, track.ends, originals, translations):
+        if not original: continue
+        out.append(f"Dialogue: 0,{_ass_time(start)},{_ass_time(end)},Traduccion,,0,0,0,,"
+                   f"{{\\rOriginal}}{_ass_text(original)}\\N{{\\r}}{_ass_text(translation)}\n")
+    return "".join(out)
+
+RENDERERS = {"srt": render_dual_srt, "ass": render_dual_ass, "vtt": render_dual_vtt}
+
+def write_dual(path, fmt, track, originals, translations):
+    """Guarda el dual en el formato pedido (fmt: "srt", "ass" o "vtt") en utf-8."""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(RENDERERS[fmt](track, originals, translations))
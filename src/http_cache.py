@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+# Importaciones propias
+from src.config import HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_NEGATIVE_TTL, HTTP_TIMEOUT
+from src.metrics import METRICS
+
+# --- CACHÉ HTTP EN DISCO ---
+# Las búsquedas y los ZIP de temporada casi nunca cambian, pero antes se pedían enteros en cada ejecución.
+# Ahora cada respuesta se guarda en HTTP_CACHE_DIR (cuerpo + un pequeño JSON con sus cabeceras):
+#   - Si es reciente (menos de HTTP_CACHE_TTL), se usa tal cual, sin tocar la red.
+#   - Si caducó, se revalida con If-None-Match / If-Modified-Since: un 304 cuesta unos bytes.
+#   - Los 404 también se recuerdan (menos tiempo): "esa temporada no existe" no cambia cada minuto.
+# El cuerpo se escribe a disco en streaming, así que un ZIP grande no pasa entero por la RAM.
+
+class CachedResponse:
+    """Respuesta HTTP (desde la red o desde la caché). El cuerpo vive en un archivo."""
+    __slots__ = ("status", "path", "from_cache")
+
+    def __init__(self, status, path=None, from_cache=False):
+        self.status = status
+        self.path = path
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return self.status == 200 and self.path is not None
+
+    def open(self):
+        return open(self.path, "rb")
+
+    def read(self):
+        with self.open() as f:
+            return f.read()
+
+class HttpCache:
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, negative_ttl=HTTP_CACHE_NEGATIVE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, method, url, data=None):
+        """Nombre de archivo estable para una petición (método + URL + formulario)."""
+        raw = json.dumps([method, url, sorted((data or {}).items())], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def _paths(self, key):
+        base = os.path.join(self.directory, key)
+        return base + ".body", base + ".json"
+
+    def _load_meta(self, meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, meta_path, meta):
+        tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def invalidate(self, url, method="GET", data=None):
+        """Olvida una respuesta (p. ej. un "ZIP" que resultó no serlo)."""
+        for path in self._paths(self.key(method, url, data)):
+            try: os.remove(path)
+            except FileNotFoundError: pass
+
+    def fetch(self, session, url, method="GET", data=None):
+        """
+        Pide una URL con la sesión indicada (cloudscraper/requests) pasando por la caché.
+        Devuelve un CachedResponse (status 200 con archivo, o el código de error).
+        """
+        body_path, meta_path = self._paths(self.key(method, url, data))
+        meta = self._load_meta(meta_path)
+        now = time.time()
+        has_body = meta is not None and meta.get("status") == 200 and os.path.exists(body_path)
+
+        # 1. Respuesta reciente: ni siquiera preguntamos.
+        if meta is not None and (has_body or meta.get("status") != 200):
+            ttl = self.ttl if has_body else self.negative_ttl
+            if now - meta.get("fetched", 0) < ttl:
+                METRICS.count("http_cache_hits")
+                return CachedResponse(meta["status"], body_path if has_body else None, from_cache=True)
+
+        # 2. Caducada (o nueva): petición condicional si tenemos con qué.
+        headers = {}
+        if has_body:
+            if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+        METRICS.count("http_requests")
+        resp = session.request(method, url, data=data, headers=headers, stream=True, timeout=HTTP_TIMEOUT)
+        try:
+            if resp.status_code == 304 and headers:
+                # No ha cambiado: renovamos la fecha y servimos lo que ya teníamos.
+                meta["fetched"] = now
+                self._save_meta(meta_path, meta)
+                METRICS.count("http_cache_revalidated")
+                return CachedResponse(200, body_path, from_cache=True)
+
+            if resp.status_code != 200:
+                # Los "no existe" se recuerdan un rato; los errores del servidor no.
+                if resp.status_code in (404, 410):
+                    self._save_meta(meta_path, {"url": url, "method": method, "status": resp.status_code, "fetched": now})
+                return CachedResponse(resp.status_code)
+
+            # 3. Respuesta nueva: cuerpo a disco en streaming (temporal + renombrado atómico).
+            tmp = f"{body_path}.{threading.get_ident()}.tmp"
+            size = 0
+            with open(tmp, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp, body_path)
+            METRICS.count("download_bytes", size)
+            self._save_meta(meta_path, {
+                "url": url, "method": method, "status": 200, "fetched": now, "size": size,
+                "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            })
+            return CachedResponse(200, body_path)
+        finally:
+            resp.close()
+
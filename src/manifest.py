@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+from threading import Lock
+try:
+    import fcntl # Bloqueo de archivos entre procesos (no existe en Windows)
+except ImportError:
+    fcntl = None
+
+# Importaciones propias
+from src.config import MANIFEST_NAME, logger
+
+# --- MANIFIESTO DE EJECUCIÓN ---
+# Un pequeño JSON por serie (subtitle_out/<Serie>/.subsync_manifest.json) que apunta
+# la huella (hash) de cada .srt original y si su dual ya está terminado.
+# Al relanzar, los capítulos sin cambios y ya terminados se saltan. Lo que ya se tradujo
+# de los demás no hace falta apuntarlo aquí: está en la caché en disco y no se vuelve a pedir.
+# Varios trabajadores (src.worker) pueden llevar temporadas distintas de la misma serie:
+# al volcar, cada uno mezcla SUS cambios con lo que haya en disco (bajo un bloqueo de archivo).
+
+# Manifiestos abiertos, para poder volcarlos todos si el usuario pulsa Ctrl+C.
+_open_manifests = []
+_open_lock = Lock()
+
+def content_hash(data):
+    """Huella SHA-256 de los bytes de un subtítulo."""
+    return hashlib.sha256(data).hexdigest()
+
+class RunManifest:
+    def __init__(self, series_dir, read_only=False):
+        # read_only: solo se consulta (--dry-run): ni se crea la carpeta ni se vuelca nada.
+        self.read_only = read_only
+        if not read_only: os.makedirs(series_dir, exist_ok=True)
+        self.path = os.path.join(series_dir, MANIFEST_NAME)
+        self.lock = Lock()
+        self.touched_episodes = set() # Claves de capítulo cambiadas por este proceso
+        self.data = self._read()
+        if not read_only:
+            with _open_lock: _open_manifests.append(self)
+
+    def _read(self):
+        data = {"episodes": {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data.update(json.load(f))
+            except Exception as e:
+                logger.warning(f"Manifiesto ilegible, se empieza de cero: {e}")
+        return data
+
+    # --- CAPÍTULOS ---
+    def is_finished(self, season, f_en, digest):
+        """True si el capítulo ya se terminó con este mismo original y su dual sigue en disco."""
+        with self.lock:
+            entry = self.data["episodes"].get(f"S{season}/{f_en}")
+        return bool(entry and entry.get("done") and entry.get("hash") == digest
+                    and os.path.exists(entry.get("output", "")))
+
+    def mark_episode(self, season, f_en, digest, output):
+        """Apunta un capítulo como terminado (se vuelca al disco al momento)."""
+        with self.lock:
+            self.data["episodes"][f"S{season}/{f_en}"] = {"hash": digest, "output": output, "done": True}
+            self.touched_episodes.add(f"S{season}/{f_en}")
+        self.flush()
+
+    # --- DISCO ---
+    def flush(self):
+        """
+        Escribe el manifiesto de forma atómica (temporal + renombrado), mezclando
+        nuestros cambios con los que otros procesos hayan volcado mientras tanto.
+        """
+        if self.read_only: return
+        with self.lock, open(self.path + ".lock", 'w') as lock_file:
+            if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+            merged = self._read()
+            for key in self.touched_episodes:
+                merged["episodes"][key] = self.data["episodes"][key]
+            merged.pop("batches", None) # Puntos de control por lote de versiones anteriores (ya no se usan)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+            self.data = merged
+
+    def close(self):
+        """Lo quita de los abiertos (la ejecución que lo usaba terminó; cada capítulo ya se volcó al marcarlo)."""
+        with _open_lock:
+            if self in _open_manifests: _open_manifests.remove(self)
+
+def flush_all():
+    """Vuelca todos los manifiestos abiertos (se llama al interrumpir la ejecución)."""
+    with _open_lock:
+        manifests = list(_open_manifests)
+    for m in manifests:
+        try: m.flush()
+        except Exception as e: logger.error(f"No se pudo guardar el manifiesto {m.path}: {e}")
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import random
+from contextlib import contextmanager
+from threading import Lock
+
+# --- MÉTRICAS DE LA EJECUCIÓN ---
+# Para saber en qué se va el tiempo (y el dinero) en vez de adivinarlo.
+# Cada etapa se cronometra con METRICS.stage("nombre") y los contadores se suman con METRICS.count().
+# Al terminar se escribe un informe JSON con percentiles por etapa, coste de la API y aciertos de caché,
+# y opcionalmente un "textfile" de Prometheus (para el node_exporter).
+#
+# Etapas que se miden:
+#   download      descarga del ZIP de una temporada
+#   unzip         lectura de los subtítulos del ZIP
+#   parse         lectura de un capítulo
+#   cache_lookup  consulta a la caché (por lote o por temporada)
+#   api_call      cada petición al backend (lote o frase suelta)
+#   batch         un lote completo, con reintentos y recuperación
+#   assemble      montaje del dual de un capítulo
+#   save          escritura del .srt
+#   cache_save    volcado de la caché al disco
+
+PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+# Muestras que se guardan por etapa para los percentiles. Cuenta, suma y máximo van aparte
+# y son exactos: en modo demonio (--serve) el proceso no acaba y las listas no pueden crecer sin fin.
+SAMPLE_SIZE = 2048
+
+def percentile(ordered, p):
+    """Percentil p (0-1) de una lista YA ordenada (por el rango más cercano)."""
+    if not ordered: return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+class StageTimes:
+    """Duraciones de una etapa: cuenta, suma y máximo, más una muestra fija al azar (reservoir) para percentiles."""
+    __slots__ = ("count", "total", "max", "sample")
+
+    def __init__(self):
+        self.count, self.total, self.max = 0, 0.0, 0.0
+        self.sample = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.sample) < SAMPLE_SIZE: self.sample.append(seconds)
+        else:
+            # Cada duración vista tiene la misma probabilidad de quedarse en la muestra.
+            i = random.randrange(self.count)
+            if i < SAMPLE_SIZE: self.sample[i] = seconds
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.started = time.time()
+        self.timings = {}  # {etapa: StageTimes}
+        self.counters = {} # {nombre: total}
+
+    def observe(self, stage, seconds):
+        """Apunta una duración para una etapa."""
+        with self.lock:
+            times = self.timings.get(stage)
+            if times is None: times = self.timings[stage] = StageTimes()
+            times.add(seconds)
+
+    def count(self, name, n=1):
+        """Suma n a un contador (llamadas, reintentos, 429, caracteres, tokens...)."""
+        if not n: return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def stage(self, name):
+        """Cronometra un bloque: with METRICS.stage("parse"): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def report(self, extra=None):
+        """Resumen de la ejecución como diccionario (listo para JSON)."""
+        with self.lock:
+            timings = {k: (t.count, t.total, t.max, sorted(t.sample)) for k, t in self.timings.items()}
+            counters = dict(self.counters)
+        stages = {}
+        for name, (count, total, top, sample) in timings.items():
+            stages[name] = {
+                "count": count,
+                "total_s": round(total, 4),
+                "mean_s": round(total / count, 4),
+                **{f"p{int(p * 100)}_s": round(percentile(sample, p), 4) for p in PERCENTILES},
+                "max_s": round(top, 4),
+            }
+        report = {
+            "started": self.started,
+            "wall_s": round(time.time() - self.started, 3),
+            "stages": stages,
+            "counters": counters,
+        }
+        calls = counters.get("api_calls", 0)
+        if calls:
+            report["api"] = {
+                "calls": calls,
+                "retries": counters.get("api_retries", 0),
+                "quota_429": counters.get("api_429", 0),
+                "errors": counters.get("api_errors", 0),
+                "lines_per_call": round(counters.get("api_lines", 0) / calls, 2),
+                "chars_in": counters.get("api_chars_in", 0),
+                "chars_out": counters.get("api_chars_out", 0),
+                "tokens_in": counters.get("api_tokens_in", 0),
+                "tokens_out": counters.get("api_tokens_out", 0),
+            }
+        if extra: report.update(extra)
+        return report
+
+    def write_report(self, path, extra=None):
+        """Escribe el informe JSON (de forma atómica) y lo devuelve."""
+        report = self.report(extra)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        return report
+
+    def write_prometheus(self, path, report=None, prefix="subsync"):
+        """
+        Exporta el informe en formato texto de Prometheus (para el textfile collector).
+        Las etapas salen como resumen (cuantiles + suma + cuenta) y los contadores tal cual.
+        """
+        report = report or self.report()
+        out = [f"# TYPE {prefix}_stage_seconds summary"]
+        for name, s in report["stages"].items():
+            for p in PERCENTILES:
+                out.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{p}"}} {s[f"p{int(p * 100)}_s"]}')
+            out.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {s["total_s"]}')
+            out.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        for name, value in sorted(report["counters"].items()):
+            out.append(f"# TYPE {prefix}_{name}_total counter")
+            out.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(report.get("cache", {}).items()):
+            if isinstance(value, (int, float)):
+                out.append(f"# TYPE {prefix}_cache_{name} gauge")
+                out.append(f"{prefix}_cache_{name} {value}")
+        out.append(f"# TYPE {prefix}_run_wall_seconds gauge")
+        out.append(f"{prefix}_run_wall_seconds {report['wall_s']}")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, path)
+
+# Métricas globales de la ejecución.
+METRICS = RunMetrics()
@@ -0,0 +1,157 @@
+import re
+from threading import Lock
+
+# --- NORMALIZACIÓN DE FRASES PARA LA CACHÉ ---
+# "Yeah.", "yeah", "- Yeah." y "<i>Yeah.</i>" son la MISMA frase para traducir.
+# Antes cada variante era un fallo de caché (y una línea más pagada a la API).
+# Ahora cada frase se separa en:
+#   - su "núcleo" (lo que se traduce): "Yeah"
+#   - su clave de caché: "yeah"
+#   - su "forma" (lo que se le quitó): etiquetas, guion de diálogo, mayúsculas, punto final.
+# La traducción del núcleo se guarda una vez y se le vuelve a poner la forma de cada variante.
+
+# Etiquetas que envuelven la frase entera: <i>...</i>, <font ...>...</font>, {\i1}...{\i0}
+_OPEN_TAGS_RE = re.compile(r'^(?:\s*(?:<[a-zA-Z][^>]*>|\{\\[^}]*\}))+')
+_CLOSE_TAGS_RE = re.compile(r'(?:(?:</[a-zA-Z]+>|\{\\[^}]*\})\s*)+$')
+# Guion de diálogo al principio: "- Hola" / "-Hola"
+_DASH_RE = re.compile(r'^-+\s*')
+# Puntuación final "neutra" que no cambia el sentido (? y ! sí lo cambian: se quedan en el núcleo)
+_END_PUNCT_RE = re.compile(r'[.,;:…]+$')
+_SPACES_RE = re.compile(r'\s+')
+# Cortes entre hablantes: "- Hi. - Hey." (un guion tras un final de frase)
+_SPEAKER_SPLIT_RE = re.compile(r'(?<=[.!?…"\'])\s+(?=-\s*\S)')
+# Cortes entre frases: "Hi. How are you?" (mayúscula tras final de frase)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?…])\s+(?=[¿¡"]?[A-ZÁÉÍÓÚÑ])')
+# Para contar como "TODO MAYÚSCULAS" hacen falta 4 letras o 2 palabras: "OK.", "TV" o "NO"
+# son siglas o interjecciones, y su traducción no debe salir gritada ("ESTÁ BIEN.").
+_UPPER_MIN_LETTERS = 4
+
+class Shape:
+    """Lo que se le quitó a una frase para llegar a su núcleo (para volver a ponérselo)."""
+    __slots__ = ("open_tags", "close_tags", "end", "case")
+
+    def __init__(self, open_tags="", close_tags="", end="", case=None):
+        self.open_tags = open_tags # Etiquetas y guiones de diálogo del principio, en su orden
+        self.close_tags = close_tags
+        self.end = end
+        self.case = case # "upper" (TODO MAYÚSCULAS), "lower" (empieza en minúscula), "cap" o None
+
+def _letters(text):
+    return [c for c in text if c.isalpha()]
+
+def normalize(text):
+    """
+    Devuelve (clave, núcleo, forma) de una frase.
+    clave: para buscar en caché. núcleo: lo que se manda traducir. forma: para restaurar.
+    """
+    core = _SPACES_RE.sub(" ", text).strip()
+    shape = Shape()
+
+    # Se quita capa a capa hasta que no cambie: "- <i>Hi.</i>" o "- - Hi" dejan el mismo núcleo
+    # que "Hi", y el núcleo normalizado otra vez da la misma clave (la caché se busca por ella
+    # y el planificador manda a traducir núcleos, que vuelven a pasar por aquí).
+    while True:
+        before = core
+        m = _OPEN_TAGS_RE.match(core)
+        if m:
+            shape.open_tags, core = shape.open_tags + m.group(0).strip(), core[m.end():]
+        m = _CLOSE_TAGS_RE.search(core)
+        if m:
+            shape.close_tags, core = m.group(0).strip() + shape.close_tags, core[:m.start()]
+        m = _DASH_RE.match(core)
+        if m:
+            # El guion va en la forma como una etiqueta más (en su sitio, aunque haya varias capas).
+            shape.open_tags, core = shape.open_tags + "- ", core[m.end():]
+        core = core.strip()
+        m = _END_PUNCT_RE.search(core)
+        if m and m.start() > 0:
+            shape.end, core = m.group(0) + shape.end, core[:m.start()].rstrip()
+        if core == before: break
+
+    letters = _letters(core)
+    if len(letters) > 1 and all(c.isupper() for c in letters) and \
+            (len(letters) >= _UPPER_MIN_LETTERS or len(core.split()) > 1): shape.case = "upper"
+    elif letters and letters[0].islower(): shape.case = "lower"
+    elif letters: shape.case = "cap"
+
+    return core.lower(), core, shape
+
+def cache_key(text):
+    """Solo la clave de caché de una frase."""
+    return normalize(text)[0]
+
+def _set_first_letter(text, upper):
+    """Pone en mayúscula/minúscula la primera letra (saltando ¿ ¡ comillas...)."""
+    for i, c in enumerate(text):
+        if c.isalpha():
+            return text[:i] + (c.upper() if upper else c.lower()) + text[i + 1:]
+    return text
+
+def restore(translation, shape):
+    """Vuelve a ponerle a una traducción la forma de la frase original."""
+    if not translation or translation.startswith("[ERROR"): return translation
+    out = translation.strip()
+    if shape.case == "upper": out = out.upper()
+    elif shape.case == "lower": out = _set_first_letter(out, False)
+    elif shape.case == "cap": out = _set_first_letter(out, True)
+    # La puntuación final "neutra" la decide la frase original (aunque sea ninguna).
+    out = _END_PUNCT_RE.sub("", out).rstrip() + shape.end
+    return f"{shape.open_tags}{out}{shape.close_tags}"
+
+def bare(shape):
+    """Una frase sin núcleo ("-", "<i></i>") se queda como estaba: no hay nada que traducir."""
+    return f"{shape.open_tags}{shape.end}{shape.close_tags}".strip()
+
+def split_segments(text, speakers=True, sentences=False):
+    """
+    Parte una línea en trozos que se cachean por separado:
+    - speakers: "- Hi. - Hey." -> ["- Hi.", "- Hey."]
+    - sentences: "Hi. How are you?" -> ["Hi.", "How are you?"]
+    Se vuelven a unir con un espacio.
+    """
+    parts = [text]
+    if speakers: parts = [p for part in parts for p in _SPEAKER_SPLIT_RE.split(part)]
+    if sentences: parts = [p for part in parts for p in _SENTENCE_SPLIT_RE.split(part)]
+    return [p for p in parts if p.strip()]
+
+# --- ESTADÍSTICAS DE ACIERTOS ---
+class CacheStats:
+    """Cuenta cómo se resolvió cada línea: exacta, por normalización, por trozos o fallo."""
+    def __init__(self):
+        self.lock = Lock()
+        self.exact = 0       # Estaba tal cual en caché
+        self.normalized = 0  # Estaba otra variante (mayúsculas, guion, etiquetas...)
+        self.segments = 0    # Se montó a partir de trozos cacheados
+        self.misses = 0      # Hubo que pedir algo a la API
+
+    def add(self, exact=0, normalized=0, segments=0, misses=0):
+        with self.lock:
+            self.exact += exact
+            self.normalized += normalized
+            self.segments += segments
+            self.misses += misses
+
+    def total(self):
+        return self.exact + self.normalized + self.segments + self.misses
+
+    def hit_rate(self):
+        total = self.total()
+        return (total - self.misses) / total if total else 0.0
+
+    def as_dict(self):
+        """Los contadores y el porcentaje de aciertos (para el informe de la ejecución)."""
+        with self.lock:
+            return {"exact": self.exact, "normalized": self.normalized, "segments": self.segments,
+                    "misses": self.misses, "hit_rate": round(self.hit_rate(), 4)}
+
+    def summary(self):
+        """Texto corto para mostrar al final de la ejecución."""
+        with self.lock:
+            total = self.total()
+            if not total: return "Caché: sin consultas"
+            return (f"Caché: {self.hit_rate():.0%} aciertos de {total} líneas únicas "
+                    f"(exactas {self.exact}, normalizadas {self.normalized}, por trozos {self.segments}, "
+                    f"nuevas {self.misses})")
+
+# Estadísticas globales de la ejecución.
+CACHE_STATS = CacheStats()
@@ -0,0 +1,351 @@
+import os
+import queue
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+
+# Importaciones propias
+from src.config import (OUT_BASE_DIR, PIPELINE_QUEUE_SIZE, PIPELINE_MAX_ACTIVE_SEASONS, MAX_SEASONS,
+                        ALIGN_ENABLED, ALIGN_LANGUAGE, ALIGN_WORKERS, SEASON_PROBE_WORKERS,
+                        DEFAULT_LANGUAGE, TARGET_LANGUAGES, OUTPUT_FORMATS, logger)
+from src.utils import download_season, prefetch_season, season_url, save_cache
+from src.subtitle import load_episode, process_episode, episode_tag
+from src.planner import collect_pending_lines, pack_batches, submit_batches
+from src.manifest import RunManifest, content_hash
+from src.normalize import cache_key
+from src.metrics import METRICS
+
+# --- TUBERÍA DE TEMPORADAS ---
+# Antes: descargar T1 -> traducir T1 -> escribir T1 -> (esperar al último hilo) -> descargar T2...
+# Ahora hay tres etapas que trabajan a la vez durante toda la ejecución:
+#   1. Un hilo descargador que va bajando temporadas y las deja en una cola LIMITADA.
+#      Las siguientes temporadas se sondean en paralelo (a la caché HTTP en disco, no a la RAM),
+#      así que en modo "todas" no se espera a descubrirlas una a una.
+#   2. El coordinador, que saca temporadas de la cola, las planifica y manda sus lotes al motor.
+#   3. Un pool de hilos (uno para toda la ejecución) que monta y guarda los duales.
+# La cola y el tope de temporadas activas mantienen la memoria plana aunque la serie tenga 10 temporadas.
+
+# Marca de "no hay más temporadas" en la cola.
+_END = None
+
+class SeasonJob:
+    """Estado de una temporada mientras atraviesa la tubería."""
+    def __init__(self, s_num, episodes, out_dir):
+        self.s_num = s_num
+        self.episodes = episodes
+        self.out_dir = out_dir
+        self.translations = {}  # {idioma: {clave normalizada: traducción}}
+        self.futures = {}       # {future: lote} de los que depende esta temporada
+        self.remaining = 0      # Lotes que faltan por llegar
+        self.pending_writes = 0 # Capítulos que faltan por guardar
+
+class SeasonPipeline:
+    # Sin efectos en disco (--dry-run): el manifiesto solo se lee.
+    dry_run = False
+
+    def __init__(self, engine, series_name, seasons, max_threads, events,
+                 queue_size=PIPELINE_QUEUE_SIZE, max_active=PIPELINE_MAX_ACTIVE_SEASONS,
+                 langs=TARGET_LANGUAGES, formats=OUTPUT_FORMATS):
+        # seasons: lista de números o None para "todas hasta que falle una descarga"
+        self.engine = engine
+        self.series_name = series_name
+        self.seasons = seasons
+        self.events = events # Cola de eventos de progreso (la interfaz los pinta a su ritmo)
+        self.max_threads = max_threads # Peticiones simultáneas: los lotes se reparten en rondas de este tamaño
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.active = threading.Semaphore(max_active)
+        self.writers = ThreadPoolExecutor(max_workers=max_threads)
+        self.lock = threading.Lock()
+        # Frases que ya van en algún lote en vuelo: {clave normalizada: future}.
+        # Si la temporada siguiente las necesita, espera ese lote en vez de pedirlas otra vez.
+        self.inflight = {}
+        self.inflight_batches = {} # {future: lote} de los lotes en vuelo
+        self.open_jobs = 0
+        self.downloads_over = False
+        self.all_done = threading.Event()
+        self.finished = []
+        self.tick_fn = lambda: None
+        # Idiomas (todos en cada petición) y formatos a escribir de cada capítulo.
+        self.langs = tuple(langs)
+        self.formats = tuple(formats)
+        # Pool de procesos para alinear con el español (se crea la primera vez que hace falta).
+        # Si no se traduce al español, emparejar con él no ahorra nada.
+        self.align = ALIGN_ENABLED and ALIGN_LANGUAGE in self.langs
+        self.aligners = None
+        # Manifiesto de la serie: qué capítulos y lotes ya están hechos (para reanudar).
+        self.manifest = RunManifest(os.path.join(OUT_BASE_DIR, series_name.replace(" ","_")), read_only=self.dry_run)
+
+    # --- ETAPA 1: DESCARGA ---
+    def _season_numbers(self):
+        """Números de temporada a intentar (lista del usuario o 1, 2, 3... hasta MAX_SEASONS)."""
+        if self.seasons is None: return range(1, MAX_SEASONS + 1)
+        return [s for s in self.seasons if s <= MAX_SEASONS]
+
+    def _probe_season(self, s_num):
+        """Baja a la caché HTTP los ZIP de una temporada (inglés y, si se alinea, español)."""
+        try:
+            prefetch_season(season_url(self.series_name, s_num))
+            if self.align: prefetch_season(season_url(self.series_name, s_num, ALIGN_LANGUAGE))
+        except Exception as e:
+            logger.warning(f"Sondeo de la temporada {s_num} fallido: {e}") # Se reintenta al leerla
+
+    def _download_loop(self):
+        probes = ThreadPoolExecutor(max_workers=SEASON_PROBE_WORKERS, thread_name_prefix="season-probe")
+        numbers = iter(self._season_numbers())
+        window = deque() # [(temporada, sondeo)] en orden, como mucho SEASON_PROBE_WORKERS por delante
+
+        def refill():
+            while len(window) < SEASON_PROBE_WORKERS:
+                s_num = next(numbers, None)
+                if s_num is None: return
+                window.append((s_num, probes.submit(self._probe_season, s_num)))
+
+        try:
+            refill()
+            while window:
+                s_num, probe = window.popleft()
+                probe.result() # Cuando termina, el ZIP (si existe) ya está en la caché HTTP
+                self.events.log(f"Descargando temporada {s_num}...", "debug")
+                members = download_season(season_url(self.series_name, s_num))
+                if not members:
+                    # Si falla y estábamos en modo automático, asumimos que se acabaron las temporadas.
+                    if self.seasons is None: break
+                    self.events.log(f"Temporada {s_num} no disponible", "warning")
+                    refill()
+                    continue # Si era una lista específica, probamos con la siguiente.
+                # Si existe la temporada en español, sus frases nos ahorran traducir.
+                es_members = download_season(season_url(self.series_name, s_num, ALIGN_LANGUAGE)) if self.align else None
+                # put() se bloquea si la cola está llena: así no descargamos de más.
+                self.queue.put((s_num, members, es_members or []))
+                refill()
+        except Exception as e:
+            logger.error(f"Error descargando: {e}")
+        finally:
+            probes.shutdown(wait=False, cancel_futures=True)
+            self.queue.put(_END)
+
+    # --- ETAPA 2: ALINEACIÓN, PLANIFICACIÓN Y TRADUCCIÓN ---
+    def _align_season(self, s_num, episodes, es_members):
+        """
+        Empareja cada capítulo con su subtítulo en español (mismo S01E02 / 1x02) y lo alinea
+        en el pool de procesos. Deja en ep["aligned"] {índice de línea: texto en español}.
+        """
+        es_by_tag = {episode_tag(name): (name, data) for name, data in es_members}
+        pairs = [(ep, es_by_tag[episode_tag(ep["file"])]) for ep in episodes if episode_tag(ep["file"]) in es_by_tag]
+        if not pairs: return
+        if self.aligners is None:
+            try:
+                from src.align import align_episode # NumPy solo hace falta si hay algo que alinear
+            except ImportError as e:
+                self.events.log(f"Alineación desactivada (falta NumPy): {e}", "warning")
+                self.align = False
+                return
+            self.align_episode = align_episode
+            # "spawn" y no fork: a estas alturas el proceso ya tiene el hilo del motor, el descargador
+            # y los escritores, y un hijo copiado a mitad de un lock (log, SQLite, caché) se quedaría colgado.
+            # Los hijos vuelven a importar la configuración: que añadan al log en vez de vaciarlo.
+            os.environ["SUBSYNC_LOG_MODE"] = "a"
+            self.aligners = ProcessPoolExecutor(max_workers=ALIGN_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+        with METRICS.stage("align"):
+            futures = {self.aligners.submit(self.align_episode, list(ep["track"].starts), list(ep["track"].ends),
+                                            name, data): ep for ep, (name, data) in pairs}
+            pending = set(futures)
+            while pending: # Esperamos sin dejar de refrescar la interfaz.
+                _, pending = wait(pending, timeout=0.2)
+                self.tick_fn()
+
+        matched = total = 0
+        for fut, ep in futures.items():
+            try:
+                texts, info = fut.result()
+            except Exception as e:
+                logger.error(f"Error alineando {ep['file']}: {e}")
+                continue
+            ep["aligned"] = {i: t for i, t in enumerate(texts) if t and ep["lines"][i]}
+            matched += len(ep["aligned"])
+            total += sum(1 for t in ep["lines"] if t)
+            logger.info(f"Alineado {ep['file']}: {info}")
+        METRICS.count("aligned_lines", matched)
+        if total:
+            self.events.log(f"T{s_num}: {len(pairs)} capítulos con subtítulo en español, "
+                            f"{matched}/{total} líneas emparejadas ({matched / total:.0%})")
+
+    def _load_season(self, s_num, members, es_members=()):
+        """
+        Lee los capítulos de una temporada (saltando los ya terminados) y los alinea con el español.
+        Devuelve (capítulos, cuántos se saltaron).
+        """
+        # Leemos los capítulos (de memoria). Los que ya se terminaron en otra ejecución
+        # con el mismo original (misma huella) y las mismas salidas ni siquiera se parsean.
+        episodes, skipped = [], 0
+        for name, data in sorted(members):
+            digest = content_hash(data) + self._outputs_tag()
+            if self.manifest.is_finished(s_num, name, digest):
+                skipped += 1
+                continue
+            ep = load_episode(name, data)
+            if ep:
+                ep["hash"] = digest
+                episodes.append(ep)
+        METRICS.count("episodes_skipped", skipped)
+        if skipped:
+            self.events.log(f"T{s_num}: {skipped} capítulos sin cambios, ya terminados (se saltan)", "debug")
+
+        if self.align and es_members: self._align_season(s_num, episodes, es_members)
+        return episodes, skipped
+
+    def _outputs_tag(self):
+        """
+        Se añade a la huella de cada capítulo en el manifiesto: si se piden otros idiomas o formatos,
+        los capítulos ya terminados se vuelven a montar. Con lo de siempre (español, SRT) va vacío
+        y los manifiestos de antes siguen valiendo.
+        """
+        if self.langs == (DEFAULT_LANGUAGE,) and self.formats == ("srt",): return ""
+        return f":{','.join(self.langs)}:{','.join(self.formats)}"
+
+    def _start_season(self, s_num, members, es_members=()):
+        # Preparamos carpeta de destino
+        out_dir = os.path.join(OUT_BASE_DIR, self.series_name.replace(" ","_"), f"Season_{s_num}")
+        os.makedirs(out_dir, exist_ok=True)
+        episodes, _ = self._load_season(s_num, members, es_members)
+
+        job = SeasonJob(s_num, episodes, out_dir)
+        pending = collect_pending_lines(episodes, self.langs)
+
+        with self.lock:
+            # Lo que ya está pidiendo otra temporada no se vuelve a pedir: nos "colgamos" de su lote.
+            borrowed = {self.inflight[cache_key(t)] for t in pending if cache_key(t) in self.inflight}
+            new_lines = [t for t in pending if cache_key(t) not in self.inflight]
+            batches = pack_batches(new_lines, workers=self.max_threads)
+            own = submit_batches(self.engine, batches, self.langs)
+            for fut, batch in own.items():
+                self.inflight_batches[fut] = batch
+                for t in batch: self.inflight[cache_key(t)] = fut
+            job.futures = dict(own)
+            for fut in borrowed: job.futures[fut] = self.inflight_batches[fut]
+            job.remaining = len(job.futures)
+            self.open_jobs += 1
+
+        total_lines = sum(len(ep["lines"]) for ep in episodes)
+        self.events.log(f"T{s_num}: {len(episodes)} capítulos, {total_lines} líneas, "
+                        f"{len(new_lines)} nuevas -> {len(batches)} peticiones")
+        self.events.emit("season_started", season=s_num, episodes=len(episodes), lines=total_lines,
+                         new_lines=len(new_lines), batches=len(batches),
+                         total=sum(len(b) for b in job.futures.values()))
+
+        if not job.futures:
+            self._write_season(job)
+            return
+        # Cuando cada lote llegue, se apunta aquí (se ejecuta en el hilo del motor).
+        for fut in list(job.futures):
+            fut.add_done_callback(lambda f, job=job: self._on_batch_done(job, f))
+
+    def _on_batch_done(self, job, fut):
+        batch = job.futures[fut]
+        errors = len(batch)
+        try:
+            result = fut.result()
+            # Guardamos por idioma y clave normalizada: el montaje le devuelve a cada línea su forma.
+            for lang, texts in result.items():
+                job.translations.setdefault(lang, {}).update(zip(map(cache_key, batch), texts))
+            errors = sum(any("[ERROR" in t for t in row) for row in zip(*result.values()))
+        except Exception as e:
+            logger.error(f"Error en lote de T{job.s_num}: {e}")
+        self.events.emit("batch_done", season=job.s_num, lines=len(batch), errors=errors)
+        with self.lock:
+            if self.inflight_batches.pop(fut, None) is not None:
+                for t in batch:
+                    if self.inflight.get(cache_key(t)) is fut: del self.inflight[cache_key(t)]
+            job.remaining -= 1
+            ready = job.remaining == 0
+        if ready: self._write_season(job)
+
+    # --- ETAPA 3: MONTAJE Y GUARDADO ---
+    def _write_season(self, job):
+        self.events.emit("season_translated", season=job.s_num, episodes=len(job.episodes))
+        job.pending_writes = len(job.episodes)
+        if not job.episodes:
+            self._finish_season(job)
+            return
+        # Los capítulos más largos (más líneas que montar) entran primero: el último en
+        # terminar es uno corto y la temporada no se queda esperando a un doble episodio.
+        for ep in sorted(job.episodes, key=lambda ep: len(ep["lines"]), reverse=True):
+            fut = self.writers.submit(process_episode, ep, job.out_dir, self.series_name,
+                                      job.translations, self.events, job.s_num,
+                                      langs=self.langs, formats=self.formats)
+            fut.add_done_callback(lambda f, job=job, ep=ep: self._on_episode_written(job, ep, f))
+
+    def _on_episode_written(self, job, ep, fut):
+        out_path = None
+        try:
+            out_path = fut.result()
+            METRICS.count("episodes_written" if out_path else "episodes_failed")
+            if out_path:
+                # Capítulo terminado: si se relanza, se salta mientras el original no cambie.
+                self.manifest.mark_episode(job.s_num, ep["file"], ep["hash"], out_path)
+        except Exception as e:
+            if not out_path: METRICS.count("episodes_failed")
+            logger.error(f"Error guardando {ep['file']} (T{job.s_num}): {e}")
+        finally:
+            # Pase lo que pase, el capítulo deja de estar pendiente: si no, run() esperaría para siempre.
+            with self.lock:
+                job.pending_writes -= 1
+                done = job.pending_writes == 0
+            if done: self._finish_season(job)
+
+    def _finish_season(self, job):
+        try:
+            # Guardamos el caché de traducciones al disco al terminar cada temporada
+            save_cache()
+        except Exception as e:
+            logger.error(f"Error cerrando temporada {job.s_num}: {e}")
+        self.events.log(f"Temporada {job.s_num} completada", "success")
+        self.events.emit("season_done", season=job.s_num)
+        # Soltamos memoria de la temporada y dejamos entrar a la siguiente.
+        job.episodes, job.translations = [], {}
+        with self.lock:
+            self.finished.append(job.s_num)
+            self.open_jobs -= 1
+            if self.open_jobs == 0 and self.downloads_over: self.all_done.set()
+        self.active.release()
+
+    # --- COORDINADOR ---
+    def run(self, on_tick=None, tick=0.2):
+        """
+        Ejecuta la tubería completa. on_tick() se llama cada 'tick' segundos
+        mientras se espera (para que la interfaz recoja los eventos).
+        Devuelve la lista de temporadas completadas.
+        """
+        downloader = threading.Thread(target=self._download_loop, name="season-downloader", daemon=True)
+        downloader.start()
+        tick_fn = self.tick_fn = on_tick or (lambda: None)
+
+        while True:
+            try: item = self.queue.get(timeout=tick)
+            except queue.Empty:
+                tick_fn()
+                continue
+            if item is _END: break
+            # Tope de temporadas a la vez (se libera al terminar de escribir una).
+            while not self.active.acquire(timeout=tick): tick_fn()
+            try:
+                self._start_season(*item)
+            except Exception as e:
+                logger.error(f"Error preparando temporada {item[0]}: {e}")
+                self.events.log(f"ERROR temporada {item[0]}: {e}", "error")
+                self.active.release()
+
+        with self.lock:
+            self.downloads_over = True
+            if self.open_jobs == 0: self.all_done.set()
+        while not self.all_done.wait(timeout=tick): tick_fn()
+        self.writers.shutdown(wait=True)
+        if self.aligners: self.aligners.shutdown(wait=True)
+        # Terminado: el manifiesto deja de estar abierto (el demonio y los trabajadores crean
+        # una tubería por trabajo y si no se irían acumulando). Con Ctrl+C no se llega aquí
+        # y flush_all lo sigue volcando.
+        self.manifest.close()
+        tick_fn()
+        return sorted(self.finished)
@@ -0,0 +1,80 @@
+from src.config import BATCH_MAX_CHARS, BATCH_MAX_LINES, BATCH_MIN_CHARS, TARGET_LANGUAGES, ALIGN_LANGUAGE
+from src.api import resolve_from_cache
+from src.normalize import CACHE_STATS
+
+# --- PLANIFICADOR DE TEMPORADA ---
+# En lugar de traducir cada capítulo por su cuenta (y pedir "Yeah." 24 veces),
+# primero leemos TODA la temporada, juntamos las frases únicas que no están
+# en caché y las traducimos una sola vez. Luego cada capítulo monta su dual
+# a partir de ese resultado compartido.
+
+def collect_pending_lines(episodes, langs=TARGET_LANGUAGES):
+    """
+    Devuelve la lista de frases únicas (sin repetir) de toda la temporada
+    que todavía no están en la caché en alguno de los idiomas, en orden de aparición.
+    Ya vienen normalizadas: "Yeah.", "- yeah" y "<i>Yeah.</i>" se piden una sola vez.
+    Las líneas que ya tienen pareja en el subtítulo en español (ep["aligned"]) no se piden en español.
+    """
+    missing = {}
+    for n, lang in enumerate(langs):
+        # Una sola consulta a la caché por idioma para toda la temporada (en vez de una por línea).
+        lines = [text for ep in episodes for i, text in enumerate(ep["lines"])
+                 if lang != ALIGN_LANGUAGE or i not in ep.get("aligned", ())]
+        # Los aciertos se cuentan con el primer idioma (si no, cada línea contaría varias veces).
+        _, lang_missing = resolve_from_cache(lines, stats=CACHE_STATS if n == 0 else None, lang=lang)
+        for k, core in lang_missing.items(): missing.setdefault(k, core)
+    return list(missing.values())
+
+def _line_cost(text):
+    # +4 por las comillas, la coma y el espacio que añade json.dumps
+    return len(text) + 4
+
+def batch_cost(batch):
+    """Caracteres que ocupa un lote en la petición (lo que más pesa en lo que tarda)."""
+    return sum(map(_line_cost, batch))
+
+def pack_batches(lines, max_chars=BATCH_MAX_CHARS, max_lines=BATCH_MAX_LINES, workers=1):
+    """
+    Agrupa las frases en lotes que no superen el presupuesto de caracteres
+    ni el máximo de líneas. Una frase más larga que el presupuesto va sola.
+    workers: peticiones simultáneas. El presupuesto se ajusta para que los lotes salgan
+    parecidos y en rondas completas: 9 lotes llenos con 8 peticiones serían dos rondas
+    (la segunda con 7 paradas), 16 lotes algo menores son dos rondas sin huecos,
+    y una temporada pequeña se parte en 8 en vez de ir entera en una sola petición.
+    """
+    if workers > 1 and lines:
+        costs = list(map(_line_cost, lines))
+        total = sum(costs)
+        rounds = -(-total // max_chars) # Lotes llenos que harían falta (redondeo hacia arriba)
+        rounds = -(-rounds // workers) * workers
+        # + la frase más larga: cada lote cerrado pasa de total/rounds, así que no sobra un lote de cola.
+        max_chars = min(max_chars, max(BATCH_MIN_CHARS, -(-total // rounds) + max(costs)))
+
+    batches = []
+    current, size = [], 0
+    for text in lines:
+        cost = _line_cost(text)
+        if current and (size + cost > max_chars or len(current) >= max_lines):
+            batches.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += cost
+    if current: batches.append(current)
+    return batches
+
+def longest_first(batches):
+    """
+    Orden de salida: los lotes más largos primero. El motor atiende por orden de llegada y cada
+    petición que queda libre coge el siguiente lote pendiente (de esta temporada o de otra), así
+    que lo que queda para el final son los lotes cortos y nadie espera solo a uno largo.
+    """
+    return sorted(batches, key=batch_cost, reverse=True)
+
+def submit_batches(engine, batches, langs=TARGET_LANGUAGES):
+    """
+    Manda todos los lotes del plan al motor de traducción a la vez (los más largos primero).
+    El motor decide cuántos van en paralelo (limitador adaptativo).
+    Cada lote pide todos los idiomas en la misma petición.
+    Devuelve {future: lote} para ir recogiendo según terminen.
+    """
+    return {engine.submit(batch, langs): batch for batch in longest_first(batches)}
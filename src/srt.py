@@ -0,0 +1,144 @@
+import re
+import codecs
+from array import array
+
+# --- LECTOR / ESCRITOR LIGERO DE SUBTÍTULOS ---
+# pysubs2 es muy completo, pero para lo que hacemos aquí (leer texto y tiempos,
+# y escribir un .srt dual) construir todo su árbol de objetos sobra.
+# Este módulo:
+#   - detecta la codificación UNA vez mirando los bytes (sin leer el archivo dos veces),
+#   - guarda los tiempos en arrays compactos (milisegundos) y los textos en una lista,
+#   - escribe el dual de una sola pasada.
+
+# FPS por defecto de los .sub (MicroDVD), que cuentan en fotogramas en vez de milisegundos.
+MICRODVD_FPS = 23.976
+
+# "00:01:02,345 --> 00:01:04,000" (también acepta punto y horas de un dígito)
+_TIME_RE = re.compile(
+    r'(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})\s*-->\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{1,3})'
+)
+# Una o más líneas en blanco (con posibles espacios) separan los bloques SRT.
+_BLOCK_SEP_RE = re.compile(r'\n[ \t]*\n')
+# "{100}{250}Texto|Segunda línea"
+_MICRODVD_RE = re.compile(r'^\{(\d+)\}\{(\d+)\}(.*)$')
+
+class SubtitleTrack:
+    """Pista de subtítulos: tiempos en arrays de enteros (ms) + lista de textos."""
+    __slots__ = ("starts", "ends", "texts")
+
+    def __init__(self):
+        self.starts = array('l')
+        self.ends = array('l')
+        self.texts = []  # Cada texto puede tener varias líneas separadas por "\n"
+
+    def append(self, start, end, text):
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+# --- CODIFICACIÓN ---
+def detect_encoding(raw):
+    """
+    Adivina la codificación mirando los bytes una sola vez:
+    1. Marca BOM (utf-8 / utf-16).
+    2. Si decodifica como utf-8 sin errores, es utf-8.
+    3. Si tiene bytes 0x80-0x9F (comillas “” y guiones de Windows), cp1252.
+    4. Si no, latin-1 (siempre decodifica).
+    """
+    if raw.startswith(codecs.BOM_UTF8): return "utf-8-sig"
+    if raw.startswith(codecs.BOM_UTF16_LE) or raw.startswith(codecs.BOM_UTF16_BE): return "utf-16"
+    try:
+        raw.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    if any(0x80 <= b <= 0x9F for b in raw[:65536]):
+        try:
+            raw.decode("cp1252")
+            return "cp1252"
+        except UnicodeDecodeError:
+            pass
+    return "latin-1"
+
+def decode_subtitle(raw):
+    """Bytes -> texto, con la codificación detectada y saltos de línea normalizados."""
+    text = raw.decode(detect_encoding(raw))
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+# --- LECTURA ---
+def parse_srt(text):
+    """Parsea texto SRT en una SubtitleTrack (una sola pasada, bloque a bloque)."""
+    track = SubtitleTrack()
+    # Los bloques van separados por líneas en blanco: índice, tiempos y texto.
+    # Pero el texto de una frase también puede llevar una línea en blanco: un trozo solo
+    # empieza frase nueva si arranca con los tiempos (o con el índice y los tiempos).
+    for block in _BLOCK_SEP_RE.split(text):
+        lines = block.strip().split("\n")
+        # Los tiempos suelen estar en la 2ª línea (tras el índice), pero hay archivos sin índice.
+        for i, line in enumerate(lines[:3]):
+            m = _TIME_RE.search(line)
+            if m: break
+        else:
+            m = None
+        if not m or (i and not lines[i - 1].strip().isdigit()):
+            # Sin cabecera: es la continuación de la frase anterior (o basura antes de la primera).
+            body = "\n".join(l.strip() for l in lines if l.strip())
+            if body and track.texts: track.texts[-1] = f"{track.texts[-1]}\n{body}" if track.texts[-1] else body
+            continue
+        g = m.groups()
+        start = ((int(g[0]) * 60 + int(g[1])) * 60 + int(g[2])) * 1000 + int(g[3].ljust(3, "0"))
+        end = ((int(g[4]) * 60 + int(g[5])) * 60 + int(g[6])) * 1000 + int(g[7].ljust(3, "0"))
+        track.append(start, end, "\n".join(l.strip() for l in lines[i + 1:] if l.strip()))
+    return track
+
+def parse_microdvd(text, fps=MICRODVD_FPS):
+    """Parsea un .sub MicroDVD ({inicio}{fin}texto, en fotogramas)."""
+    track = SubtitleTrack()
+    for line in text.split("\n"):
+        m = _MICRODVD_RE.match(line.strip())
+        if not m: continue
+        start_f, end_f, body = int(m.group(1)), int(m.group(2)), m.group(3)
+        # Quitamos códigos de estilo tipo {y:i} y convertimos "|" en salto de línea.
+        body = re.sub(r'\{[^}]*\}', '', body).replace("|", "\n")
+        track.append(round(start_f * 1000 / fps), round(end_f * 1000 / fps), body.strip())
+    return track
+
+def parse_subtitle(name, data):
+    """
+    Bytes (del ZIP o del disco) -> SubtitleTrack.
+    Los .sub se prueban como MicroDVD; el resto como SRT.
+    """
+    text = decode_subtitle(data)
+    if name.lower().endswith(".sub") and _MICRODVD_RE.match(text.lstrip().split("\n", 1)[0]):
+        return parse_microdvd(text)
+    return parse_srt(text)
+
+# --- ESCRITURA ---
+def format_time(ms):
+    """Milisegundos -> "HH:MM:SS,mmm"."""
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+def render_srt(track, texts=None):
+    """
+    Genera el texto SRT completo de una pasada.
+    texts: textos a escribir en lugar de los de la pista (misma longitud). Los vacíos se omiten.
+    """
+    texts = track.texts if texts is None else texts
+    out = []
+    n = 0
+    for start, end, text in zip(track.starts, track.ends, texts):
+        if not text: continue
+        n += 1
+        out.append(f"{n}\n{format_time(start)} --> {format_time(end)}\n{text}\n")
+    return "\n".join(out)
+
+def write_srt(path, track, texts=None):
+    """Guarda la pista (o los textos indicados) como .srt en utf-8."""
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(render_srt(track, texts))
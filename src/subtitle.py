@@ -1,79 +1,107 @@
 import os
 import re
-import pysubs2
-from src.config import logger
-from src.api import translate_batch_native
+from src.config import DEFAULT_LANGUAGE, TARGET_LANGUAGES, OUTPUT_FORMATS, ALIGN_LANGUAGE, logger
+from src.metrics import METRICS
+from src.api import resolve_from_cache
+from src.srt import SubtitleTrack, parse_subtitle, decode_subtitle
+from src.formats import FORMATS, write_dual
 
-def process_episode(f_en, en_dir, out_dir, series_name, progress, task_id, log_mgr):
+def track_from_pysubs2(text):
+    """Plan B: deja que pysubs2 lea formatos raros y lo pasa a nuestra pista compacta."""
+    import pysubs2 # Importación diferida: casi nunca hace falta
+    track = SubtitleTrack()
+    for ev in pysubs2.SSAFile.from_string(text):
+        track.append(ev.start, ev.end, ev.plaintext)
+    return track
+
+def load_episode(f_en, data):
     """
-    Procesa un único capítulo: Carga, Traduce por bloques, Guarda.
-    Se ejecuta en un hilo separado por cada capítulo.
+    Carga un capítulo desde sus bytes (tal cual vienen del ZIP) y extrae sus líneas limpias.
+    Devuelve un diccionario {file, track, lines} o None si no se pudo leer.
     """
     try:
-        log_mgr.add(f"[cyan]Iniciando: {f_en}[/cyan]")
-        
-        # Ruta completa del archivo en inglés
-        path_en = os.path.join(en_dir, f_en)
-        
-        # Intentamos cargar el archivo .srt.
-        # A veces vienen en codificación utf-8 (moderno) y otras en latin-1 (antiguo).
-        try: subs = pysubs2.load(path_en, encoding="utf-8")
-        except: 
-            try: subs = pysubs2.load(path_en, encoding="latin-1")
-            except: return # Si falla todo, nos rendimos con este archivo.
+        with METRICS.stage("parse"):
+            # Lector ligero: detecta la codificación una vez y parsea en una pasada.
+            track = parse_subtitle(f_en, data)
+            # Si no sacó nada de un archivo con contenido, probamos con pysubs2 (formatos raros).
+            if not len(track) and data.strip():
+                track = track_from_pysubs2(decode_subtitle(data))
+    except Exception:
+        logger.warning(f"No se pudo leer {f_en}")
+        return None # Si falla, nos rendimos con este archivo.
+
+    # Extraemos solo el texto limpio (los saltos de línea pasan a ser espacios)
+    clean_lines = [t.replace("\n", " ").strip() for t in track.texts]
+    return {"file": f_en, "track": track, "lines": clean_lines}
+
+def episode_tag(f_en):
+    """Detecta el número de episodio (S04E07 o 4x07) del nombre del archivo."""
+    tag_match = re.search(r'(S\d+E\d+|\d+x\d+)', f_en, re.IGNORECASE)
+    return tag_match.group(1).upper() if tag_match else f_en[:10]
+
+def output_path(out_dir, series_name, f_en):
+    """Ruta del dual final de un capítulo (Serie_S04E07_Dual.srt)."""
+    return os.path.join(out_dir, f"{series_name}_{episode_tag(f_en)}_Dual.srt")
+
+def output_variant(path, lang, fmt):
+    """
+    Ruta de cada idioma y formato a partir de la del dual de siempre (X_Dual.srt):
+    el español conserva el nombre (X_Dual.srt, X_Dual.ass) y el resto lleva el idioma (X_Dual.pt.srt).
+    """
+    stem = os.path.splitext(path)[0]
+    return f"{stem}{'' if lang == DEFAULT_LANGUAGE else '.' + lang}.{FORMATS[fmt]}"
+
+def process_episode(episode, out_dir, series_name, translations, events, season, out_path=None,
+                    langs=TARGET_LANGUAGES, formats=OUTPUT_FORMATS):
+    """
+    Monta y guarda los duales de un capítulo ya cargado: uno por idioma y formato, todos de la
+    misma lectura (en out_path, o con el nombre de siempre en out_dir; ver output_variant).
+    Las traducciones vienen del planificador de temporada (translations, {idioma: {clave: traducción}}),
+    así que aquí ya no se llama a la API: solo se busca y se escribe.
+    Las líneas emparejadas con el subtítulo en español (episode["aligned"]) usan ese texto.
+    El progreso se publica como eventos (episode_started / episode_done / episode_failed).
+    Devuelve la ruta del primero guardado (primer idioma y formato), o None si falló.
+    """
+    f_en = episode["file"]
+    events.emit("episode_started", season=season, episode=f_en)
+    try:
+        track, clean_lines = episode["track"], episode["lines"]
+        aligned = episode.get("aligned", {})
+        # Usamos el número de episodio (S04E07) para nombrar los nuevos archivos.
+        tag = episode_tag(f_en)
+        base_path = out_path or output_path(out_dir, series_name, f_en)
+        outputs = []
+
+        for lang in langs:
+            # El texto emparejado solo vale para su idioma; en los demás esas líneas se traducen.
+            lang_aligned = aligned if lang == ALIGN_LANGUAGE else {}
+
+            # Resolvemos todas las líneas de una vez: lo traducido en esta temporada
+            # (translations, por clave normalizada) y lo que ya estaba en caché.
+            resolved, _ = resolve_from_cache([t for i, t in enumerate(clean_lines) if i not in lang_aligned],
+                                             overlay=translations.get(lang), lang=lang)
 
-        # Extraemos solo el texto limpio (quitando cosas raras como \N que es salto de línea)
-        clean_lines = [line.text.replace("\\N", " ").strip() for line in subs]
-        
-        # Preparamos la barra de progreso de este archivo
-        progress.update(task_id, description="[cyan]Traduciendo (JSON Nativo)...", total=len(subs))
-        
-        # === BUCLE DE TRADUCCIÓN POR LOTES ===
-        # En vez de ir 1 a 1, vamos de 50 en 50 para ser más rápidos.
-        BATCH_SIZE = 50
-        all_translations = []
-        
-        for i in range(0, len(clean_lines), BATCH_SIZE):
-            # Cogemos un trozo de 50 líneas
-            batch = clean_lines[i : i + BATCH_SIZE]
-            
-            # Escribimos en el log cada 5 bloques (para no saturar visualmente)
-            if i % (BATCH_SIZE * 5) == 0:
-                 log_mgr.add(f"[dim]Proc {f_en[:10]}... Batch {i//BATCH_SIZE}[/dim]")
-                 
-            # ¡MAGIA! Llamamos a la API para traducir esas 50 líneas.
-            translated_batch = translate_batch_native(batch)
-            all_translations.extend(translated_batch)
-            
-            # Avanzamos la barra de progreso
-            progress.advance(task_id, len(batch))
+            # === MONTAJE DEL DUAL ===
+            # El texto "de verdad" si lo hay; si no, la traducción (o avisamos si falta).
+            with METRICS.stage("assemble"):
+                texts = [lang_aligned.get(i) or resolved.get(original, "[Falta]") if original else ""
+                         for i, original in enumerate(clean_lines)]
 
-        # === MONTAJE DEL DUAL DUAL ===
-        # Ahora unimos el Inglés original (arriba) con el Español traducido (abajo).
-        for i, line in enumerate(subs):
-            original = clean_lines[i]
-            if not original: continue # Si la línea estaba vacía, pasamos.
-            
-            # Recuperamos la traducción correspondiente (o avisamos si falta).
-            spanish = all_translations[i] if i < len(all_translations) else "[Falta]"
-            
-            # Formato SRS Dual: Original en amarillo + Salto de línea + Traducción en blanco.
-            line.text = f"<font color='#ffff00'>{original}</font>\\N{spanish}"
+            # === GUARDADO ===
+            # Original arriba + traducción abajo, en cada formato pedido (una sola pasada de escritura cada uno).
+            for fmt in formats:
+                path = output_variant(base_path, lang, fmt)
+                with METRICS.stage("save"):
+                    write_dual(path, fmt, track, clean_lines, texts)
+                outputs.append(path)
 
-        # === GUARDADO ===
-        # Detectamos el número de episodio (S04E07) del nombre del archivo para nombrar el nuevo.
-        tag_match = re.search(r'(S\d+E\d+|\d+x\d+)', f_en, re.IGNORECASE)
-        tag = tag_match.group(1).upper() if tag_match else f_en[:10]
-        
-        # Guardamos el archivo final.
-        subs.save(os.path.join(out_dir, f"{series_name}_{tag}_Dual.srt"), encoding="utf-8")
-        
-        # Marcamos la tarea como completada en verde.
-        progress.update(task_id, description=f"[green]✓ {tag}")
-        log_mgr.add(f"[bold green]Terminado: {tag}[/bold green]")
+        # Avisamos de que el capítulo está terminado.
+        events.emit("episode_done", season=season, episode=f_en, output=outputs[0], outputs=outputs)
+        events.log(f"Terminado: {tag}", "success")
+        return outputs[0]
 
     except Exception as e:
-        # Si algo explota, lo apuntamos en el log rojo.
+        # Si algo explota, lo apuntamos en el log y lo avisamos como evento (sale en rojo).
         logger.error(f"Error {f_en}: {e}")
-        progress.update(task_id, description="[red]Error")
-        log_mgr.add(f"[bold red]ERROR {f_en}: {e}[/bold red]")
+        events.emit("episode_failed", season=season, episode=f_en, error=str(e))
+        return None
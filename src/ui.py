@@ -1,10 +1,12 @@
 from rich.console import Console, Group
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
-from rich.live import Live
 from rich.panel import Panel
+import time
 from collections import deque
 from threading import Lock
 
+from src.config import PROGRESS_TOP_EPISODES, PROGRESS_MAX_FPS
+
 # Creamos la consola "Rich", que permite texto con colores y formato avanzado.
 console = Console()
 
@@ -30,19 +32,6 @@ class LogManager:
         with self.lock:
             return "\n".join(self.logs)
 
-# --- FUNCIÓN: get_dynamic_layout ---
-# Esta función construye lo que se ve en pantalla en cada refresco.
-def get_dynamic_layout(progress, log_mgr):
-    """
-    Crea un GRUPO visual que contiene:
-    1. La barra de progreso (arriba).
-    2. El panel de logs (abajo).
-    """
-    return Group(
-        progress,
-        Panel(log_mgr.get_text(), title="Real-time Logs", height=14, border_style="blue")
-    )
-
 # --- CONFIGURACIÓN DE PROGRESO ---
 # Configuración de las barras de carga de Rich.
 # SpinnerColumn: El circulito que gira.
@@ -55,3 +44,117 @@ def create_progress():
         BarColumn(), 
         TextColumn("{task.description}")
     )
+
+# Color de cada nivel de log (los eventos llegan sin formato, el color lo pone la interfaz).
+LEVEL_STYLES = {"debug": "dim", "info": "cyan", "success": "bold green", "warning": "yellow", "error": "bold red"}
+
+# --- CLASE: ProgressView ---
+# La interfaz ya no la tocan los hilos: estos publican eventos (src.events) y esta
+# clase los recoge desde el hilo principal, los resume y pinta como mucho 'max_fps' veces por segundo.
+# En vez de una barra por capítulo (cientos en una serie larga) se muestra:
+#   - una barra por temporada (primero líneas traducidas, luego capítulos montados),
+#   - los 'top_n' capítulos que más tiempo llevan montándose (y cuántos más hay),
+#   - el panel de logs de siempre.
+class ProgressView:
+    def __init__(self, events, top_n=PROGRESS_TOP_EPISODES, max_fps=PROGRESS_MAX_FPS, log_len=12):
+        self.events = events
+        self.top_n = top_n
+        self.min_interval = 1.0 / max_fps
+        self.progress = create_progress()
+        self.log_mgr = LogManager(max_len=log_len)
+        self.seasons = {}  # {temporada: id de su barra}
+        self.active = {}   # {(temporada, capítulo): momento en que empezó a montarse}
+        self.written = 0
+        self.failed = 0
+        self.open_seasons = 0
+        self.dirty = True
+        self.last_render = 0.0
+
+    def apply(self, ev):
+        """Actualiza el resumen con un evento."""
+        kind, season = ev["event"], ev.get("season")
+        if kind == "season_started":
+            self.seasons[season] = self.progress.add_task(
+                "Traduciendo...", filename=f"Temporada {season}", total=max(1, ev["total"]))
+            self.open_seasons += 1
+        elif kind == "batch_done":
+            self.progress.advance(self.seasons[season], ev["lines"])
+        elif kind == "season_translated":
+            self.progress.update(self.seasons[season], description="[cyan]Montando duales...",
+                                 total=max(1, ev.get("episodes", 0)), completed=0)
+        elif kind == "episode_started":
+            self.active[(season, ev["episode"])] = ev["ts"]
+        elif kind in ("episode_done", "episode_failed"):
+            self.active.pop((season, ev["episode"]), None)
+            self.progress.advance(self.seasons[season], 1)
+            if kind == "episode_done": self.written += 1
+            else:
+                self.failed += 1
+                self.log_mgr.add(f"[bold red]ERROR {ev['episode']}: {ev['error']}[/bold red]")
+        elif kind == "season_done":
+            self.progress.update(self.seasons[season], description="[green]✓ Completada",
+                                 total=1, completed=1)
+            self.open_seasons -= 1
+        elif kind == "log":
+            style = LEVEL_STYLES.get(ev.get("level"), "")
+            self.log_mgr.add(f"[{style}]{ev['msg']}[/{style}]" if style else ev["msg"])
+        self.dirty = True
+
+    def pump(self):
+        """
+        Aplica los eventos pendientes. Devuelve True si toca repintar:
+        hubo cambios (o hay trabajo en marcha, para que giren los spinners)
+        y ya pasó el intervalo mínimo entre fotogramas.
+        """
+        for ev in self.events.drain():
+            self.apply(ev)
+        now = time.monotonic()
+        if now - self.last_render < self.min_interval: return False
+        if not (self.dirty or self.open_seasons): return False
+        self.last_render, self.dirty = now, False
+        return True
+
+    def render(self):
+        """
+        Crea un GRUPO visual que contiene:
+        1. Las barras de temporada (arriba).
+        2. Los capítulos en curso (resumidos).
+        3. El panel de logs (abajo).
+        """
+        now = time.time()
+        oldest = sorted(self.active.items(), key=lambda kv: kv[1])[:self.top_n]
+        lines = [f"[blue]T{s}[/blue] {ep[:40]} [dim]{now - t:.1f}s[/dim]" for (s, ep), t in oldest]
+        if len(self.active) > self.top_n: lines.append(f"[dim]... y {len(self.active) - self.top_n} más[/dim]")
+        status = f"Escritos: {self.written}" + (f"  [red]Errores: {self.failed}[/red]" if self.failed else "")
+        return Group(
+            self.progress,
+            Panel("\n".join(lines) or "[dim]-[/dim]", title=f"Capítulos en curso ({status})", border_style="cyan"),
+            Panel(self.log_mgr.get_text(), title="Real-time Logs", height=14, border_style="blue")
+        )
+
+# --- TABLA DE ESTIMACIÓN (--dry-run) ---
+def _duration(seconds):
+    """123.4 -> '2m 03s'"""
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {secs:02d}s"
+
+def estimate_table(est):
+    """Tabla con lo que costaría la ejecución: una fila por capítulo, otra por temporada y el total."""
+    from rich.table import Table
+    table = Table(title=f"Estimación: {est['series']} -> {', '.join(est['langs'])} ({est['concurrency']} peticiones a la vez, "
+                        f"latencia {est['latency']['call_s']} s de {est['latency']['source']})")
+    for col in ("Capítulo", "Líneas", "Alineadas", "Sin caché", "Nuevas", "Peticiones", "Tokens", "Tiempo"):
+        table.add_column(col, justify="left" if col == "Capítulo" else "right")
+
+    def row(name, r, style=None):
+        table.add_row(name, str(r["lines"]), str(r["aligned"]), str(r["uncached"]), str(r["new_lines"]),
+                      str(r["batches"]), str(r["tokens_in"] + r["tokens_out"]), _duration(r["wall_s"]), style=style)
+
+    for season in est["seasons"]:
+        for ep in season["episodes"]: row(f"  {ep['episode']}", ep, "dim")
+        skipped = f" (+{season['skipped']} ya hechos)" if season["skipped"] else ""
+        row(f"Temporada {season['season']}{skipped}", season, "bold")
+        table.add_section()
+    row("TOTAL", est["totals"], "bold green")
+    return table
@@ -1,43 +1,90 @@
 import os
-import json
-import shutil
 import zipfile
+import tempfile
 import re
 import urllib.parse
-from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 # Importaciones propias
-from src.config import CACHE_FILE, WORK_DIR, cache_lock, logger
-import cloudscraper
-from bs4 import BeautifulSoup
+from src.config import (CACHE_FILE, CACHE_DB_FILE, CACHE_BACKEND, CACHE_MEMORY_ITEMS, ZIP_SPOOL_MAX_BYTES,
+                        TVSUBTITLES_BASE_URL, HTTP_CACHE_ENABLED, cache_lock, logger)
+from src.cache import TranslationCache, open_store, import_json_cache
+from src.metrics import METRICS
 
 # --- CACHÉ DE TRADUCCIONES ---
-# Cargamos el archivo JSON en memoria para no pedirle a la IA lo que ya tradujo antes.
-TRANSLATION_CACHE = {}
-if os.path.exists(CACHE_FILE):
-    try:
-        with open(CACHE_FILE, 'r') as f:
-            TRANSLATION_CACHE = json.load(f)
-    except:
-        pass # Si falla al leer, empezamos con caché vacía.
+# Caché en disco (SQLite) con una capa LRU en memoria delante.
+# No se abre al importar el módulo sino la primera vez que alguien la usa:
+# así "--help" o el menú inicial no esperan a la base de datos (ni a importar el JSON antiguo).
+_cache = None
 
-def save_cache():
-    """Guarda la memoria RAM (TRANSLATION_CACHE) en el disco duro (json)."""
+def get_cache():
+    """Devuelve la caché de traducciones (la abre la primera vez)."""
+    global _cache
     with cache_lock:
-        with open(CACHE_FILE, 'w') as f:
-            json.dump(TRANSLATION_CACHE, f, ensure_ascii=False)
+        if _cache is None:
+            cache = TranslationCache(open_store(CACHE_BACKEND, CACHE_DB_FILE), max_items=CACHE_MEMORY_ITEMS)
+            # Si es la primera vez y existe el JSON antiguo, lo importamos una sola vez.
+            if len(cache) == 0 and os.path.exists(CACHE_FILE):
+                try:
+                    imported = import_json_cache(CACHE_FILE, cache)
+                    logger.info(f"Importadas {imported} traducciones desde {CACHE_FILE}")
+                except Exception as e:
+                    logger.error(f"No se pudo importar la caché JSON: {e}") # Si falla al leer, empezamos con caché vacía.
+            _cache = cache
+        return _cache
+
+def save_cache():
+    """
+    Asegura que la caché está en disco.
+    Las traducciones ya se escriben al momento, así que esto solo confirma lo pendiente.
+    """
+    if _cache is None: return # Nunca se abrió: no hay nada que guardar.
+    with cache_lock, METRICS.stage("cache_save"):
+        _cache.flush()
 
 # --- SCRAPER (Buscador de Subtítulos) ---
 # Usamos cloudscraper para saltarnos la protección de Cloudflare de la web.
-scraper = cloudscraper.create_scraper(browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True})
+# Importarlo (con requests, urllib3...) y crear la sesión cuesta: se hace al primer uso.
+scraper = None
+_scraper_lock = Lock()
+
+def get_scraper():
+    """Sesión compartida de cloudscraper (se crea la primera vez)."""
+    global scraper
+    with _scraper_lock:
+        if scraper is None:
+            import cloudscraper
+            scraper = cloudscraper.create_scraper(browser={'browser': 'chrome', 'platform': 'windows', 'desktop': True})
+        return scraper
+
+# --- CACHÉ HTTP ---
+_http_cache = None
+
+def get_http_cache():
+    """Caché HTTP en disco (None si está desactivada en la configuración)."""
+    global _http_cache
+    if not HTTP_CACHE_ENABLED: return None
+    with _scraper_lock:
+        if _http_cache is None:
+            from src.http_cache import HttpCache
+            _http_cache = HttpCache()
+        return _http_cache
 
 def search_series(query):
     """Busca una serie en tvsubtitles.net y devuelve resultados."""
     try:
         # Hacemos una petición POST (como enviar un formulario) con el nombre de la serie.
-        resp = scraper.post("https://www.tvsubtitles.net/search.php", data={'qs': query})
+        # Con la caché HTTP, repetir la búsqueda de ayer no toca la red.
+        url, form = f"{TVSUBTITLES_BASE_URL}/search.php", {'qs': query}
+        http_cache = get_http_cache()
+        if http_cache:
+            cached = http_cache.fetch(get_scraper(), url, method="POST", data=form)
+            html = cached.read() if cached.ok else b""
+        else:
+            html = get_scraper().post(url, data=form).content
         
+        from bs4 import BeautifulSoup # Solo hace falta al buscar
         # BeautifulSoup parsea el HTML para que podamos buscar etiquetas <a> (enlaces).
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         
         # Buscamos todos los links que parezcan series ("/tvshow-123.html")
         results = []
@@ -51,26 +98,75 @@ def search_series(query):
         logger.error(f"Error buscando serie: {e}")
         return []
 
-def download_and_extract(url):
-    """Descarga el ZIP de subtítulos y lo descomprime en la carpeta de trabajo."""
-    # 1. Limpiar carpeta anterior
-    if os.path.exists(WORK_DIR): shutil.rmtree(WORK_DIR)
-    os.makedirs(os.path.join(WORK_DIR, "en"), exist_ok=True)
-    
-    # 2. Descargar
-    r = scraper.get(url)
-    if r.status_code != 200: return False # Si falló la descarga
-    
-    # 3. Guardar ZIP temporalmente
-    zip_path = os.path.join(WORK_DIR, "temp_subs.zip")
-    with open(zip_path, "wb") as f: f.write(r.content)
-    
-    # 4. Descomprimir
-    with zipfile.ZipFile(zip_path, 'r') as z:
-        z.extractall(os.path.join(WORK_DIR, "en"))
-        
-    # 5. Borrar el ZIP para no dejar basura
-    try: os.remove(zip_path)
-    except: pass
-    
-    return True
+def clean_series_name(display):
+    """Quita años y paréntesis del nombre mostrado para que cuadre con la URL de la web."""
+    return re.sub(r'\s*\(\d{4}-.*?\)', '', display).replace("(","").replace(")","").strip()
+
+def season_url(series_name, s_num, lang="en"):
+    """URL del ZIP de una temporada en "TVSubtitles.net" (lang: 'en' inglés, 'es' español)."""
+    return f"{TVSUBTITLES_BASE_URL}/files/seasons/{urllib.parse.quote(series_name)}%20-%20season%20{s_num}.{lang}.zip"
+
+# Extensiones de subtítulo que nos interesan dentro de los ZIP.
+SUBTITLE_EXTS = ('.srt', '.sub')
+
+def iter_zip_subtitles(fileobj):
+    """
+    Recorre un ZIP (ya en memoria) y va devolviendo (nombre, bytes) de cada subtítulo.
+    Lo que no es subtítulo (nfo, imágenes, carpetas...) se ignora sin descomprimirlo.
+    """
+    with zipfile.ZipFile(fileobj) as z:
+        for info in z.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(SUBTITLE_EXTS): continue
+            # Solo el nombre del archivo (algunos ZIP traen carpetas dentro).
+            yield os.path.basename(info.filename), z.read(info)
+
+def download_season(url):
+    """
+    Descarga el ZIP de subtítulos y devuelve una lista [(nombre, bytes)] con los subtítulos,
+    o None si falló la descarga.
+    Con la caché HTTP el ZIP se guarda (y se lee) en ella; sin caché, no toca el disco.
+    """
+    http_cache = get_http_cache()
+    if http_cache:
+        with METRICS.stage("download"):
+            resp = http_cache.fetch(get_scraper(), url)
+        if not resp.ok: return None
+        try:
+            with resp.open() as f, METRICS.stage("unzip"):
+                return list(iter_zip_subtitles(f))
+        except zipfile.BadZipFile:
+            logger.error(f"ZIP corrupto o no es un ZIP: {url}")
+            http_cache.invalidate(url) # Que no se quede guardado algo que no sirve
+            return None
+
+    # 1. Descargar en streaming (a trozos, sin cargar toda la respuesta de golpe)
+    with METRICS.stage("download"):
+        r = get_scraper().get(url, stream=True)
+        if r.status_code != 200: return None # Si falló la descarga
+
+        # 2. Guardar en un búfer "spooled": en RAM mientras sea pequeño,
+        #    y solo si pasa de ZIP_SPOOL_MAX_BYTES se vuelca a un temporal anónimo.
+        buf = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX_BYTES)
+        for chunk in r.iter_content(chunk_size=64 * 1024):
+            buf.write(chunk)
+            METRICS.count("download_bytes", len(chunk))
+        buf.seek(0)
+
+    with buf:
+        # 3. Leer los subtítulos directamente del ZIP en memoria
+        try:
+            with METRICS.stage("unzip"):
+                return list(iter_zip_subtitles(buf))
+        except zipfile.BadZipFile:
+            logger.error(f"ZIP corrupto o no es un ZIP: {url}")
+            return None
+
+def prefetch_season(url):
+    """
+    Sondea una temporada: la baja a la caché HTTP (sin leerla) y dice si existe.
+    Así varias temporadas se descargan a la vez y luego se leen del disco en orden.
+    """
+    http_cache = get_http_cache()
+    if not http_cache: return None # Sin caché no tiene sentido: se descarga al leerla
+    with METRICS.stage("download"):
+        return http_cache.fetch(get_scraper(), url).ok
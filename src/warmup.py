@@ -0,0 +1,127 @@
+import os
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Importaciones propias
+from src.config import OUT_BASE_DIR, WARMUP_WORKERS, SPLIT_SPEAKERS, logger
+from src.srt import parse_subtitle
+from src.normalize import normalize, split_segments
+
+# --- PRECALENTADO DE LA CACHÉ ---
+# Si se pierde la caché (o se estrena un equipo nuevo), todo lo ya traducido se volvería a pagar.
+# Pero las traducciones siguen ahí, dentro de los duales ya generados y de los pares EN/ES que tengamos:
+#   - subtitle_out/<Serie>/Season_N/*_Dual.srt: cada frase es "<font ...>INGLÉS</font>\nESPAÑOL".
+#   - Pares "Capitulo.en.srt" + "Capitulo.es.srt" en la misma carpeta: se alinean (src.align).
+# Este módulo los recorre en paralelo (pool de procesos), saca los pares inglés -> español,
+# los normaliza igual que la caché (misma clave, mismo núcleo) y los carga de golpe.
+
+# "<font color='#ffff00'>Inglés</font>\nEspañol"
+_DUAL_RE = re.compile(r"^<font[^>]*>(.*?)</font>\s*\n(.*)$", re.DOTALL)
+# "Nombre.en.srt" / "Nombre.es.srt" (también eng/spa y .sub)
+_LANG_RE = re.compile(r"^(.*)\.(en|eng|english|es|spa|spanish)\.(srt|sub)$", re.IGNORECASE)
+_ES_TAGS = ("es", "spa", "spanish")
+
+def find_sources(paths):
+    """
+    Recorre carpetas y devuelve (duales, pares) donde:
+    duales = [ruta de *_Dual.srt], pares = [(ruta inglés, ruta español)].
+    """
+    duals, by_stem = [], {}
+    for root_path in paths:
+        if os.path.isfile(root_path):
+            walk = [(os.path.dirname(root_path), [], [os.path.basename(root_path)])]
+        else:
+            walk = os.walk(root_path)
+        for folder, _, files in walk:
+            for name in files:
+                path = os.path.join(folder, name)
+                if name.endswith("_Dual.srt"):
+                    duals.append(path)
+                    continue
+                m = _LANG_RE.match(name)
+                if m:
+                    lang = "es" if m.group(2).lower() in _ES_TAGS else "en"
+                    by_stem.setdefault(os.path.join(folder, m.group(1).lower()), {})[lang] = path
+    pairs = [(p["en"], p["es"]) for p in by_stem.values() if "en" in p and "es" in p]
+    return sorted(duals), sorted(pairs)
+
+def cache_pairs(english, spanish):
+    """
+    Convierte una frase y su traducción en entradas de caché [(clave, traducción del núcleo)].
+    Las líneas de dos hablantes solo se aprovechan si las dos partes cuadran.
+    """
+    en_parts = split_segments(english, SPLIT_SPEAKERS, False)
+    es_parts = split_segments(spanish, SPLIT_SPEAKERS, False)
+    if len(en_parts) != len(es_parts): return []
+    out = []
+    for en, es in zip(en_parts, es_parts):
+        key, core, _ = normalize(en)
+        es_core = normalize(es)[1]
+        # Sin texto, sin traducir o marcas de error: no sirve.
+        if not key or not es_core or es_core.startswith(("[ERROR", "[Falta")): continue
+        if len(core.split()) >= 3 and es_core.lower() == core.lower(): continue
+        out.append((key, es_core))
+    return out
+
+def pairs_from_dual(path):
+    """Pares (clave, traducción) de un dual ya generado."""
+    with open(path, "rb") as f:
+        track = parse_subtitle(path, f.read())
+    out = []
+    for text in track.texts:
+        m = _DUAL_RE.match(text)
+        if m: out.extend(cache_pairs(m.group(1).strip(), m.group(2).replace("\n", " ").strip()))
+    return out
+
+def pairs_from_subtitles(en_path, es_path):
+    """Pares (clave, traducción) de dos subtítulos del mismo capítulo (inglés y español), alineándolos."""
+    from src.align import align_episode # Necesita NumPy
+    with open(en_path, "rb") as f:
+        en = parse_subtitle(en_path, f.read())
+    with open(es_path, "rb") as f:
+        es_name, es_data = es_path, f.read()
+    texts, _ = align_episode(list(en.starts), list(en.ends), es_name, es_data)
+    out = []
+    for english, spanish in zip(en.texts, texts):
+        if spanish: out.extend(cache_pairs(english.replace("\n", " ").strip(), spanish))
+    return out
+
+def _extract(source):
+    """Tarea del pool: ("dual", ruta) o ("pair", (inglés, español)) -> lista de pares."""
+    kind, arg = source
+    try:
+        return pairs_from_dual(arg) if kind == "dual" else pairs_from_subtitles(*arg)
+    except Exception as e:
+        logger.warning(f"No se pudo importar {arg}: {e}")
+        return []
+
+def warm_cache(cache, paths=None, workers=WARMUP_WORKERS, chunk=5000):
+    """
+    Importa a la caché las traducciones de duales y pares EN/ES de las carpetas indicadas.
+    Si una frase aparece con varias traducciones, se queda la más repetida.
+    Las claves que ya estaban en caché no se tocan.
+    Devuelve un resumen {archivos, pares, únicas, nuevas, conflictos}.
+    """
+    duals, pairs = find_sources(paths or [OUT_BASE_DIR])
+    sources = [("dual", p) for p in duals] + [("pair", p) for p in pairs]
+    votes = {} # {clave: Counter(traducciones)}
+    total = 0
+    if sources:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for found in pool.map(_extract, sources, chunksize=8):
+                total += len(found)
+                for key, value in found:
+                    votes.setdefault(key, Counter())[value] += 1
+
+    best = {k: c.most_common(1)[0][0] for k, c in votes.items()}
+    existing = cache.get_many(list(best))
+    new = [(k, v) for k, v in best.items() if k not in existing]
+    # Por lotes: una transacción por lote, como el importador del JSON antiguo.
+    for i in range(0, len(new), chunk):
+        cache.put_many(dict(new[i : i + chunk]))
+    return {
+        "files": len(duals) + 2 * len(pairs), "duals": len(duals), "pairs": len(pairs),
+        "lines": total, "unique": len(best), "added": len(new),
+        "conflicts": sum(1 for c in votes.values() if len(c) > 1),
+    }
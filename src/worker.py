@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+
+# Importaciones propias
+from src.config import (QUEUE_LEASE_SECONDS, QUEUE_POLL_SECONDS, PROGRESS_MAX_FPS, SEASON_PROBE_WORKERS,
+                        TARGET_LANGUAGES, OUTPUT_FORMATS, logger)
+from src.workqueue import WorkQueue
+from src.utils import download_season, prefetch_season, season_url, save_cache
+
+# --- TRABAJADORES DE LA COLA ---
+# Un trabajador es un proceso que saca temporadas de la cola (src.workqueue) y las procesa con
+# la misma tubería de siempre. Varios trabajadores (en esta máquina o en otras que compartan
+# la carpeta) se reparten el catálogo: cada uno con su propio GIL y su propio motor de peticiones,
+# pero todos leyendo y escribiendo la MISMA caché de traducciones en SQLite.
+
+def discover_seasons(series_name, limit):
+    """
+    Temporadas que existen de una serie (1, 2, 3... hasta la primera que falte),
+    sondeando varias a la vez. Sirve para encolar el modo "todas".
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    def exists(s_num):
+        url = season_url(series_name, s_num)
+        found = prefetch_season(url)
+        return bool(download_season(url)) if found is None else found # Sin caché HTTP: descarga normal
+
+    seasons = []
+    with ThreadPoolExecutor(max_workers=SEASON_PROBE_WORKERS) as pool:
+        for start in range(1, limit + 1, SEASON_PROBE_WORKERS):
+            numbers = range(start, min(limit, start + SEASON_PROBE_WORKERS - 1) + 1)
+            for s_num, ok in zip(numbers, pool.map(exists, numbers)):
+                if not ok: return seasons
+                seasons.append(s_num)
+    return seasons
+
+class _Heartbeat(threading.Thread):
+    """Renueva el alquiler del trabajo mientras se procesa (cada tercio del plazo)."""
+    def __init__(self, queue_path, job, owner):
+        super().__init__(name="lease-heartbeat", daemon=True)
+        self.queue_path, self.job, self.owner = queue_path, job, owner
+        self.stop = threading.Event()
+        self.lost = False
+
+    def run(self):
+        queue = WorkQueue(self.queue_path) # Conexión propia: SQLite no comparte conexiones entre hilos
+        try:
+            while not self.stop.wait(QUEUE_LEASE_SECONDS / 3):
+                if not queue.renew(self.job, self.owner):
+                    self.lost = True
+                    logger.warning(f"Alquiler perdido: {self.job.series} T{self.job.season}")
+                    return
+        finally:
+            queue.close()
+
+def run_worker(queue_path, threads, events, out=None, owner=None, wait=False,
+               langs=TARGET_LANGUAGES, formats=OUTPUT_FORMATS):
+    """
+    Bucle de un trabajador: alquila una temporada, la procesa y la marca hecha (o fallida).
+    wait=False: termina cuando la cola se vacía. wait=True: se queda esperando trabajos nuevos.
+    langs / formats: idiomas y formatos de salida de cada capítulo.
+    Devuelve cuántos trabajos completó.
+    """
+    from src.engine import get_engine
+    from src.pipeline import SeasonPipeline
+
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(queue_path)
+    engine = get_engine(threads)
+    pump = out.pump if out else (lambda: None)
+    completed = 0
+    try:
+        while True:
+            job = queue.lease(owner)
+            if job is None:
+                if not wait: break
+                pump()
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+
+            events.emit("job_leased", worker=owner, series=job.series, season=job.season, attempt=job.attempts)
+            heartbeat = _Heartbeat(queue_path, job, owner)
+            heartbeat.start()
+            try:
+                pipeline = SeasonPipeline(engine, job.series, [job.season], threads, events,
+                                          langs=langs, formats=formats)
+                done = pipeline.run(on_tick=pump, tick=1.0 / PROGRESS_MAX_FPS)
+                if heartbeat.lost:
+                    # El alquiler caducó y puede que otro trabajador ya la tenga: no la cerramos nosotros.
+                    logger.warning(f"Trabajo {job.series} T{job.season} sin alquiler: no se marca")
+                    events.emit("job_lost", worker=owner, series=job.series, season=job.season)
+                elif job.season in done:
+                    queue.complete(job, owner)
+                    completed += 1
+                    events.emit("job_done", worker=owner, series=job.series, season=job.season)
+                else:
+                    queue.fail(job, owner, "temporada no disponible o sin terminar")
+                    events.emit("job_failed", worker=owner, series=job.series, season=job.season,
+                                error="temporada no disponible o sin terminar")
+            except Exception as e:
+                logger.error(f"Error en el trabajo {job.series} T{job.season}: {e}")
+                if not heartbeat.lost: queue.fail(job, owner, e)
+                events.emit("job_failed", worker=owner, series=job.series, season=job.season, error=str(e))
+            finally:
+                heartbeat.stop.set()
+                save_cache()
+                pump()
+    finally:
+        queue.close()
+    return completed
+
+def spawn_workers(count, threads, main_script, wait=False, langs=TARGET_LANGUAGES, formats=OUTPUT_FORMATS):
+    """
+    Lanza 'count' procesos trabajadores en esta máquina (main.py --worker) y espera a que acaben.
+    Cada uno escribe sus eventos JSON por su cuenta en la misma salida (y añade al mismo log).
+    """
+    args = [sys.executable, main_script, "--worker", "--threads", str(threads),
+            "--langs", ",".join(langs), "--formats", ",".join(formats)] + (["--wait"] if wait else [])
+    env = {**os.environ, "SUBSYNC_LOG_MODE": "a"}
+    procs = [subprocess.Popen(args, env=env) for _ in range(count)]
+    return [p.wait() for p in procs]
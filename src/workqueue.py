@@ -0,0 +1,128 @@
+import time
+import sqlite3
+
+# Importaciones propias
+from src.config import QUEUE_DB_FILE, QUEUE_LEASE_SECONDS, QUEUE_MAX_ATTEMPTS, SQLITE_WAL
+
+# --- COLA DE TRABAJO DURADERA ---
+# Para traducir catálogos enteros con varios procesos (o varias máquinas que comparten carpeta),
+# los trabajos se apuntan en una base SQLite en vez de vivir en la memoria de un solo main.py.
+# Cada trabajo es una TEMPORADA de una serie: es la unidad que el planificador ya aprovecha
+# (frases repetidas entre capítulos se piden una sola vez), y los capítulos ya hechos se saltan
+# solos gracias al manifiesto de la serie.
+#
+# Ciclo de vida de un trabajo:
+#   pending -> leased (un trabajador lo "alquila" durante QUEUE_LEASE_SECONDS y lo va renovando)
+#           -> done
+#           -> pending otra vez si falla (o si el trabajador muere y el alquiler caduca)
+#           -> failed tras QUEUE_MAX_ATTEMPTS intentos
+
+class Job:
+    __slots__ = ("id", "series", "season", "attempts")
+
+    def __init__(self, id, series, season, attempts):
+        self.id = id
+        self.series = series
+        self.season = season
+        self.attempts = attempts
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_DB_FILE, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # timeout: si otro proceso está escribiendo, esperamos en vez de fallar al momento.
+        # isolation_level=None: las transacciones las abrimos nosotros (BEGIN IMMEDIATE).
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        # WAL no funciona en carpetas de red (NFS/SMB): allí se usa el diario clásico.
+        self.conn.execute(f"PRAGMA journal_mode={'WAL' if SQLITE_WAL else 'DELETE'}")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                series TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL,
+                last_error TEXT,
+                updated REAL,
+                UNIQUE (series, season)
+            )""")
+
+    def _write(self, sql, params=()):
+        """Una escritura atómica (BEGIN IMMEDIATE: nadie más escribe mientras tanto)."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = self.conn.execute(sql, params)
+            self.conn.execute("COMMIT")
+            return cur.rowcount
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, series, season):
+        """Apunta una temporada. Si ya estaba terminada o fallida, vuelve a quedar pendiente."""
+        return self._write("""
+            INSERT INTO jobs (series, season, updated) VALUES (?, ?, ?)
+            ON CONFLICT (series, season) DO UPDATE
+                SET state = 'pending', attempts = 0, owner = NULL, lease_until = NULL, last_error = NULL,
+                    updated = excluded.updated
+                WHERE state IN ('done', 'failed')""", (series, season, time.time()))
+
+    def lease(self, owner):
+        """
+        Alquila el siguiente trabajo disponible (pendiente, o alquilado pero caducado).
+        Devuelve un Job o None si no hay nada que hacer.
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Alquileres caducados que ya agotaron sus intentos: se dan por fallidos.
+            self.conn.execute("""
+                UPDATE jobs SET state = 'failed', owner = NULL, last_error = 'alquiler caducado', updated = ?
+                WHERE state = 'leased' AND lease_until < ? AND attempts >= ?""", (now, now, self.max_attempts))
+            row = self.conn.execute("""
+                SELECT id, series, season, attempts FROM jobs
+                WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?)
+                ORDER BY id LIMIT 1""", (now,)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute("""
+                UPDATE jobs SET state = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1, updated = ?
+                WHERE id = ?""", (owner, now + self.lease_seconds, now, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return Job(row[0], row[1], row[2], row[3] + 1)
+
+    def renew(self, job, owner):
+        """Alarga el alquiler. False si ya no es nuestro (caducó y lo cogió otro)."""
+        now = time.time()
+        return self._write("""
+            UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND owner = ? AND state = 'leased'""",
+            (now + self.lease_seconds, now, job.id, owner)) == 1
+
+    def complete(self, job, owner):
+        return self._write("""
+            UPDATE jobs SET state = 'done', owner = NULL, lease_until = NULL, last_error = NULL, updated = ?
+            WHERE id = ? AND owner = ?""", (time.time(), job.id, owner)) == 1
+
+    def fail(self, job, owner, error):
+        """Devuelve el trabajo a la cola (o lo marca fallido si ya no le quedan intentos)."""
+        return self._write("""
+            UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                            owner = NULL, lease_until = NULL, last_error = ?, updated = ?
+            WHERE id = ? AND owner = ?""", (self.max_attempts, str(error)[:500], time.time(), job.id, owner)) == 1
+
+    def stats(self):
+        """{estado: número de trabajos}"""
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+
+    def failed_jobs(self):
+        return self.conn.execute(
+            "SELECT series, season, attempts, last_error FROM jobs WHERE state = 'failed' ORDER BY id").fetchall()
+
+    def close(self):
+        self.conn.close()